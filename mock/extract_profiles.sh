@@ -0,0 +1,15 @@
+#!/bin/bash
+# Mock extract_profiles.sh <m3dc1_profiles file> for the local backend:
+# write smooth profile_ne, profile_te, and profile_omega on psi = 0 to 1.1
+if [ ! -e "$1" ]; then
+    echo "extract_profiles.sh (mock): no $1" >&2
+    exit 1
+fi
+profile() {
+    awk -v a=$1 -v b=$2 -v m=$3 'BEGIN {for (i = 0; i <= 110; i++) {
+        p = i/100.; v = a - b*p*p; if (v < m) v = m;
+        printf "%.6e   %.6e\n", p, v}}'
+}
+profile 0.6 0.45 0.05 > profile_ne
+profile 2.0 1.9 0.01 > profile_te
+profile 20. 18. 0. > profile_omega
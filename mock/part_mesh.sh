@@ -0,0 +1,4 @@
+#!/bin/bash
+# Mock part_mesh.sh <mesh> <nparts> for the local backend: the mock
+# m3dc1_2d does not read the partitioned mesh, so nothing is written
+echo "part_mesh.sh (mock): $1 into $2 parts"
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+artifact_store
+
+Content-addressed store for the read-only inputs that every run folder gets
+(meshes, geqdsk, profiles, coil files). Each distinct file is kept once under
+<working directory>/.autoC1_store/<sha1[:2]>/<sha1[2:]> and run folders get a
+hard link, reflink, or symbolic link to it instead of a fresh copy. If none
+of those work (e.g., across file systems), the file is copied.
+
+Stored files are made read-only, so a program writing into a linked file in
+one run folder fails instead of silently changing it in every folder.
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import shutil
+import hashlib
+import fcntl
+
+store_name = '.autoC1_store'
+methods = ['hardlink','reflink','symlink','copy']
+
+FICLONE = 0x40049409
+
+# (path, size, mtime, inode) -> sha1, so a file is only hashed once
+_hashes = {}
+
+
+def file_hash(filename):
+
+    st = os.stat(filename)
+    key = (os.path.abspath(filename), st.st_size, st.st_mtime_ns, st.st_ino)
+    if key not in _hashes:
+        h = hashlib.sha1()
+        with open(filename,'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        _hashes[key] = h.hexdigest()
+    return _hashes[key]
+
+
+def put(filename, store):
+    """
+    Add filename to the store (if it is not already there) and return the
+    path of the stored copy
+    """
+
+    digest = file_hash(filename)
+    stored = os.path.join(store, digest[:2], digest[2:])
+    if not os.path.exists(stored):
+        sub = os.path.dirname(stored)
+        if not os.path.isdir(sub):
+            os.makedirs(sub)
+        tmp = stored+'.tmp%d'%os.getpid()
+        shutil.copyfile(filename, tmp)
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, stored)
+        # the stored copy has the same bytes, so it has the same hash
+        st = os.stat(stored)
+        _hashes[(stored, st.st_size, st.st_mtime_ns, st.st_ino)] = digest
+    return stored
+
+
+def materialize(src, dst, store, method=None):
+    """
+    Make dst hold the contents of src via the store. method forces one of
+    'hardlink', 'reflink', 'symlink', or 'copy'; by default they are tried
+    in that order. Returns the method used.
+    """
+
+    stored = put(src, store)
+
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
+    if method is None:
+        tries = methods
+    else:
+        tries = [method]
+
+    # build the link next to dst and rename it over, so an existing (and
+    # possibly read-only, linked) dst is replaced rather than written into
+    tmp = dst+'.tmp%d'%os.getpid()
+    for m in tries:
+        try:
+            _link[m](stored, tmp)
+        except OSError:
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+            continue
+        os.replace(tmp, dst)
+        # renaming a hard link over another link to the same file does
+        # nothing, so tmp is still there if dst was already linked
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        return m
+
+    raise OSError('Could not materialize '+src+' as '+dst)
+
+
+def prune(store):
+    """
+    Remove stored files that no run folder links to any more.
+    Files reached only through symbolic links or copies are not tracked,
+    so only use this if hard links are in use.
+    """
+
+    removed = 0
+    for sub in os.listdir(store):
+        subdir = os.path.join(store, sub)
+        for name in os.listdir(subdir):
+            stored = os.path.join(subdir, name)
+            if os.stat(stored).st_nlink == 1:
+                os.remove(stored)
+                removed += 1
+    return removed
+
+
+def _hardlink(stored, dst):
+    os.link(stored, dst)
+
+
+def _reflink(stored, dst):
+    with open(stored,'rb') as fin:
+        with open(dst,'wb') as fout:
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+
+
+def _symlink(stored, dst):
+    os.symlink(os.path.abspath(stored), dst)
+
+
+def _copy(stored, dst):
+    shutil.copyfile(stored, dst)
+
+
+_link = {'hardlink':_hardlink,
+         'reflink':_reflink,
+         'symlink':_symlink,
+         'copy':_copy}
@@ -10,19 +10,26 @@ Date edited:
 """
 
 import os
-import sys
-import copy
-from subprocess import call, check_output, Popen
-from time import sleep
+from subprocess import call
 import matplotlib.pyplot as plt
 
 import my_shutil as mysh
 from extend_profile import extend_profile
 from load_equil import load_equil
-from move_iter import move_iter
-from mod_C1input import mod_C1input
+from move_iter import move_iter, next_iter
 from extract_profiles import extract_profiles
-from sedpy import sedpy
+import profile_fit
+from stages import stage_options, stage_C1input, prep_C1input_base, prep_run
+from stages import write_command, def_folder, free_folder, calc_options
+from job_array import submit_runs
+from slurm import sbatch, scancel, COMPLETED
+from job_watch import wait_for
+from gs_monitor import watch_gs
+from current_iter import iterate
+from equil_check import check_equil
+from growth_rate import scan_growth, find_stab
+from registry import machine_info
+from preflight import preflight, check_profiles
 
 def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
            interactive=True, OMFIT=False,
@@ -32,7 +39,10 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
            C1input_mod=None, C1input_base='C1input_base',rot='eb',
            saturn_partition='batch',nersc_repo='atom',
            time_factor=1.0,C1_version='1.9',mesh_type='rw',mesh_resolution='normal',
-           adapt_coil_file=None,adapt_current_file=None,adapt_coil_delta=None):
+           adapt_coil_file=None,adapt_current_file=None,adapt_coil_delta=None,
+           auto_extend=False,resources=False,auto_iterate=False,
+           max_equil_iter=10,current_tol=1e-3,accel='anderson',
+           equil_check=True):
 
     if task == 'all':
         task = 'setup'
@@ -44,6 +54,21 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
     if parallel_adapt:
         raise ValueError('Parallel mesh adaption not yet functional')
 
+    # check everything before any folder is made or job submitted
+    problems = preflight(task=task, machine=machine, calcs=calcs,
+                         setup_folder=setup_folder, adapted_mesh=adapted_mesh,
+                         uniform_mesh=uniform_mesh, mesh_model=mesh_model,
+                         mesh_type=mesh_type, mesh_resolution=mesh_resolution,
+                         C1input_mod=C1input_mod, C1input_base=C1input_base,
+                         adapt_coil_file=adapt_coil_file,
+                         adapt_current_file=adapt_current_file,
+                         adapt_coil_delta=adapt_coil_delta,
+                         time_factor=time_factor, resources=resources,
+                         OMFIT=OMFIT, max_equil_iter=max_equil_iter,
+                         auto_iterate=auto_iterate)
+    if len(problems) > 0:
+        return
+
     template = os.environ.get('AUTOC1_HOME')+'/templates/'+ machine + '/'
 
 
@@ -52,449 +77,17 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
 
     # Setup C1input
 
-    if not os.path.exists(C1input_base):
-        mysh.cp(template+'/C1input_base',C1input_base)
-        try:
-            if float(C1_version) < 1.9:
-                # before version 1.9, z_ion was called zeff
-                sedpy('z_ion','zeff',C1input_base)
-        except ValueError:
-            # devel versions should have z_ion
-            pass
-
-    iread_eqdsks = {'DIII-D':{'rw':'3','fw':1},
-                    'NSTX-U':{'rw':'3'},
-                    'AUG':{'rw':'1'},
-                    'KSTAR':{'rw':'3','fw':1},
-                    'EAST':{'rw':'3'},
-                    'JET':{'rw':'3','fw':1},
-                    'ITER':{'rw':'3','fw':1}}
-    idevices     = {'rw':'-1','fw':'1'}
-    icsubtracts  = {'rw':'1','fw':'0'}
-    imulti_regions = {'rw':'1','fw':'0'}
-
-    uni_smb  = {'DIII-D':{'rw':'diiid0.02.smb',
-                          'fw':'analytic-8K.smb'},
-                'NSTX-U':{'rw':'nstxu0.02.smb'},
-                'AUG':   {'rw':'aug0.02.smb'},
-                'KSTAR': {'rw':'kstar-0.02-3.00-4.00-7K.smb',
-                          'fw':'analytic-10K.smb'},
-                'EAST':  {'rw':'east-0.02-2.50-4.00-6K.smb'},
-                'JET':   {'rw':'jet-0.02-2.5-4.0-13K.smb',
-                          'fw':'analytic-10K.smb'},
-                'ITER':  {'rw':'iter-0.05-6.0-9.0-19K.smb',
-                          'fw':'analytic-10K.smb'}}
-
-    uni0_smb = {'DIII-D':{'rw':'diiid0.020.smb',
-                          'fw':'analytic-8K0.smb'},
-                'NSTX-U':{'rw':'nstxu0.020.smb'},
-                'AUG':   {'rw':'aug0.020.smb'},
-                'KSTAR': {'rw':'kstar-0.02-3.00-4.00-7K0.smb',
-                          'fw':'analytic-10K0.smb'},
-                'EAST':  {'rw':'east-0.02-2.50-4.00-6K0.smb'},
-                'JET':   {'rw':'jet-0.02-2.5-4.0-13K0.smb',
-                          'fw':'analytic-10K0.smb'},
-                'ITER':  {'rw':'iter-0.05-6.0-9.0-19K0.smb',
-                          'fw':'analytic-10K0.smb'}}
-        
-    uni_txt  = {'DIII-D':{'rw':'diiid0.02.txt',
-                          'fw':'analytic.txt'},
-                'NSTX-U':{'rw':'nstxu0.02.txt'},
-                'AUG':   {'rw':'aug0.02.txt'},
-                'KSTAR': {'rw':'kstar-0.02-3.00-4.00.txt',
-                          'fw':'analytic.txt'},
-                'EAST':  {'rw':'east-0.02-2.50-4.00.txt'},
-                'JET':   {'rw':'jet-0.02-2.5-4.0.txt',
-                          'fw':'analytic.txt'},
-                'ITER':  {'rw':'iter-0.05-6.0-9.0.txt',
-                          'fw':'analytic.txt'}}
-    if mesh_type[0] == 'c':
-        uni_txt[machine].update({mesh_type:mesh_model})
-        if uniform_mesh is not None:
-            uni0_smb[machine].update({mesh_type:uniform_mesh})
-            uni_mesh = uniform_mesh[:-5]+'.smb'
-            uni_smb[machine].update({mesh_type:uni_mesh})
-        else:
-            uni0_smb[machine].update({mesh_type: uni0_smb[machine][mesh_type[-2:]]})
-            uni_smb[machine].update({mesh_type:uni_smb[machine][mesh_type[-2:]]})
-        
-
-    coils = {'DIII-D':['iu','il'],
-             'NSTX-U':['iu','il'],
-             'AUG':   ['iu','il'],
-             'KSTAR': ['tfec','mfec','bfec'],
-             'EAST':  ['iu','il'],
-             'JET':   [],
-             'ITER':  []}
-
-    C1input_options = {'efit':{'ntimemax':'0',
-                               'ntimepr':'1',
-                               'iread_eqdsk':'1',
-                               'irmp':'0',
-                               'extsubtract':'0',
-                               'max_ke':'0',
-                               'itime_independent':'1',
-                               'idevice':'4',
-                               'eps':'0',
-                               'db_fac':'0.0',
-                               'mesh_filename':"'part.smb'",
-                               'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
-                               'icsubtract':'0',
-                               'imulti_region':imulti_regions[mesh_type[-2:]],
-                               'igs':'0',
-                               'ntor':'0'},
-                       'uni_equil':{'ntimemax':'0',
-                                    'ntimepr':'1',
-                                    'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
-                                    'irmp':'0',
-                                    'extsubtract':'0',
-                                    'max_ke':'0',
-                                    'itime_independent':'1',
-                                    'idevice':idevices[mesh_type[-2:]],
-                                    'eps':'0',
-                                    'db_fac':'0.0',
-                                    'mesh_filename':"'part.smb'",
-                                    'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
-                                    'icsubtract':icsubtracts[mesh_type[-2:]],
-                                    'imulti_region':imulti_regions[mesh_type[-2:]],
-                                    'ntor':'0'},
-                       'adapt':{'ntimemax':'0',
-                                'ntimepr':'1',
-                                'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
-                                'irmp':'0',
-                                'extsubtract':'0',
-                                'iadapt':'1',
-                                'adapt_smooth':'0.02',
-                                'max_ke':'0',
-                                'itime_independent':'1',
-                                'idevice':idevices[mesh_type[-2:]],
-                                'eps':'0',
-                                'db_fac':'0.0',
-                                'mesh_filename':"'%s'"%uni_smb[machine][mesh_type],
-                                'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
-                                'icsubtract':icsubtracts[mesh_type[-2:]],
-                                'imulti_region':imulti_regions[mesh_type[-2:]],
-                                'ntor':'0'},
-                       'equilibrium':{'ntimemax':'0',
-                                      'ntimepr':'1',
-                                      'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
-                                      'irmp':'0',
-                                      'extsubtract':'0',
-                                      'max_ke':'0',
-                                      'itime_independent':'1',
-                                      'idevice':idevices[mesh_type[-2:]],
-                                      'eps':'0',
-                                      'db_fac':'0.0',
-                                      'mesh_filename':"'part.smb'",
-                                      'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
-                                      'icsubtract':icsubtracts[mesh_type[-2:]],
-                                      'imulti_region':imulti_regions[mesh_type[-2:]],
-                                      'ntor':'0'},
-                       'stability':{'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
-                                    'irmp':'0',
-                                    'extsubtract':'0',
-                                    'max_ke':'1',
-                                    'itime_independent':'0',
-                                    'idevice':idevices[mesh_type[-2:]],
-                                    'eps':'1e-8',
-                                    'mesh_filename':"'part.smb'",
-                                    'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
-                                    'icsubtract':icsubtracts[mesh_type[-2:]],
-                                    'imulti_region':imulti_regions[mesh_type[-2:]]},
-                       'response':{'ntimemax':'1',
-                                   'ntimepr':'1',
-                                   'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
-                                   'irmp':'1',
-                                   'extsubtract':'1',
-                                   'max_ke':'0',
-                                   'itime_independent':'1',
-                                   'idevice':idevices[mesh_type[-2:]],
-                                   'eps':'0',
-                                   'mesh_filename':"'part.smb'",
-                                   'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
-                                   'icsubtract':icsubtracts[mesh_type[-2:]],
-                                   'imulti_region':imulti_regions[mesh_type[-2:]]}}
-
-    if adapt_coil_delta is not None:
-        C1input_options['adapt']['adapt_coil_delta'] = adapt_coil_delta
-
-    # Setup batch file and slurm command
-    bash_commands = {'efit':'part_mesh.sh '+uni_smb[machine][mesh_type]+' $SLURM_NTASKS',
-                     'uni_equil':'part_mesh.sh '+uni_smb[machine][mesh_type]+' $SLURM_NTASKS',
-                     'adapt':'echo $SLURM_JOB_ID > job_id.txt',
-                     'equilibrium':'part_mesh.sh adapted.smb $SLURM_NTASKS',
-                     'stability':'part_mesh.sh adapted.smb $SLURM_NTASKS',
-                     'response':'part_mesh.sh adapted.smb $SLURM_NTASKS'}
-    if parallel_adapt:
-        bash_commands['adapt'] += '\n'+'part_mesh.sh '+uni_smb[machine][mesh_type]+' $SLURM_NTASKS'
-
-    exec_commands = {'sunfire':'mpiexec --bind-to none -np ',
-                     'iris': 'srun --mpi=pmi2 -n ',
-                     'saturn': 'srun --mpi=pmi2 -n ',
-                     'cori-haswell':'srun -c 2 --cpu_bind=cores -n ',
-                     'cori-knl':'srun -c 4 --cpu_bind=cores -n '}
-
-    real_ea    = '$SLURM_NTASKS m3dc1_2d -pc_factor_mat_solver_type mumps -mat_mumps_icntl_14 200 >& C1stdout'
-    complex_ea = '$SLURM_NTASKS m3dc1_2d_complex -pc_factor_mat_solver_type mumps -mat_mumps_icntl_14 200 >& C1stdout'
-    adapt_ea = {False:'1 m3dc1_2d -pc_factor_mat_solver_type mumps -mat_mumps_icntl_14 200 >& C1stdout',
-                True: real_ea}
-    exec_args = {'efit':real_ea,
-                 'uni_equil':real_ea,
-                 'adapt':adapt_ea[parallel_adapt],
-                 'equilibrium':real_ea,
-                 'stability':complex_ea,
-                 'response':complex_ea}
-
-    if 10*time_factor <= 30:
-        iris_small = 'short'
-    else:
-        iris_small = 'medium'
-    Psmall = {'sunfire':'m3dc1',
-              'iris':iris_small,
-              'saturn':saturn_partition,
-              'cori-haswell':'debug',
-              'cori-knl':'debug'}
-
-    Plarge = {'sunfire':'m3dc1',
-              'iris':'medium',
-              'saturn':saturn_partition,
-              'cori-haswell':'regular',
-              'cori-knl':'regular'}
-
-    Padapt = copy.deepcopy(Plarge)
-    if not parallel_adapt:
-        Padapt['cori-haswell']='shared'
-
-    slurm_options = {'sunfire':{'efit':['--partition='+Psmall['sunfire'],
-                                        '--nodes=1',
-                                        '--ntasks=16',
-                                        '--time=0:%d:00'%(10*time_factor),
-                                        '--mem-per-cpu=2000',
-                                        '--job-name=m3dc1_efit'],
-                                'uni_equil':['--partition='+Psmall['sunfire'],
-                                             '--nodes=1',
-                                             '--ntasks=16',
-                                             '--time=0:%d:00'%(10*time_factor),
-                                             '--mem-per-cpu=2000',
-                                             '--job-name=m3dc1_eq'],
-                                'adapt':{False:['--partition='+Padapt['sunfire'],
-                                                '--ntasks=1',
-                                                '--time=%d:00:00'%(4*time_factor),
-                                                '--mem-per-cpu=60000',
-                                                '--job-name=m3dc1_adapt'],
-                                         True:['--partition='+Plarge['sunfire'],
-                                               '--ntasks=32',
-                                               '--time=%d:00:00'%(1*time_factor),
-                                               '--mem-per-cpu=7500',
-                                               '--job-name=m3dc1_adapt']},
-                                'equilibrium':['--partition='+Plarge['sunfire'],
-                                               '--ntasks=16',
-                                               '--time=%d:00:00'%(1*time_factor),
-                                               '--mem-per-cpu=7500',
-                                               '--job-name=m3dc1_equil'],
-                                'stability':['--partition='+Plarge['sunfire'],
-                                             '--ntasks=32',
-                                             '--time=%d:00:00'%max(12*time_factor,48),
-                                             '--mem-per-cpu=7500',
-                                             '--job-name=m3dc1_stab'],
-                                'response':['--partition='+Plarge['sunfire'],
-                                            '--ntasks=32',
-                                            '--time=%d:00:00'%(4*time_factor),
-                                            '--mem-per-cpu=7500']},
-                     'iris': {'efit':['--partition='+Psmall['iris'],
-                                      '--nodes=1',
-                                      '--ntasks=16',
-                                      '--time=0:%d:00'%(10*time_factor),
-                                      '--mem=32000',
-                                      '--job-name=m3dc1_efit'],
-                              'uni_equil':['--partition='+Psmall['iris'],
-                                           '--nodes=1',
-                                           '--ntasks=16',
-                                           '--time=0:%d:00'%(10*time_factor),
-                                           '--mem=32000',
-                                           '--job-name=m3dc1_eq'],
-                              'adapt':{False:['--partition='+Padapt['iris'],
-                                              '--nodes=1',
-                                              '--ntasks=1',
-                                              '--time=%d:00:00'%(4*time_factor),
-                                              '--mem=60000',
-                                              '--job-name=m3dc1_adapt'],
-                                       True:['--partition='+Plarge['iris'],
-                                             '--nodes=1',
-                                             '--ntasks=16',
-                                             '--time=%d:00:00'%(1*time_factor),
-                                             '--mem=120000',
-                                             '--job-name=m3dc1_adapt']},
-                              'equilibrium':['--partition='+Plarge['iris'],
-                                             '--nodes=1',
-                                             '--ntasks=16',
-                                             '--time=%d:00:00'%(2*time_factor),
-                                             '--mem=120000',
-                                             '--job-name=m3dc1_equil'],
-                              'stability':['--partition='+Plarge['iris'],
-                                           '--nodes=2',
-                                           '--ntasks=16',
-                                           '--tasks-per-node=8',
-                                           '--time=%d:00:00'%max(8*time_factor,24),
-                                           '--mem=120000',
-                                           '--job-name=m3dc1_stab'],
-                              'response':['--partition='+Plarge['iris'],
-                                          '--nodes=2',
-                                          '--ntasks=16',
-                                          '--tasks-per-node=8',
-                                          '--time=%d:00:00'%(4*time_factor),
-                                          '--mem=120000']},
-                     'saturn': {'efit':['--partition='+Psmall['saturn'],
-                                        '--nodes=1',
-                                        '--ntasks=16',
-                                        '--time=0:%d:00'%(10*time_factor),
-                                        '--mem=120000',
-                                        '--job-name=m3dc1_efit'],
-                                'uni_equil':['--partition='+Psmall['saturn'],
-                                             '--nodes=1',
-                                             '--ntasks=16',
-                                             '--time=0:%d:00'%(10*time_factor),
-                                             '--mem=120000',
-                                             '--job-name=m3dc1_eq'],
-                                'adapt':{False:['--partition='+Padapt['saturn'],
-                                                '--nodes=1',
-                                                '--ntasks=1',
-                                                '--time=%d:00:00'%(4*time_factor),
-                                                '--mem=120000',
-                                                '--job-name=m3dc1_adapt'],
-                                         True:['--partition='+Plarge['saturn'],
-                                               '--nodes=2',
-                                               '--ntasks=32',
-                                               '--tasks-per-node=16',
-                                               '--time=%d:00:00'%(1*time_factor),
-                                               '--mem=120000',
-                                               '--job-name=m3dc1_adapt']},
-                                'equilibrium':['--partition='+Plarge['saturn'],
-                                               '--nodes=1',
-                                               '--ntasks=16',
-                                               '--time=%d:00:00'%(2*time_factor),
-                                               '--mem=120000',
-                                               '--job-name=m3dc1_equil'],
-                                'stability':['--partition='+Plarge['saturn'],
-                                             '--nodes=2',
-                                             '--ntasks=32',
-                                             '--tasks-per-node=16',
-                                             '--time=%d:00:00'%max(8*time_factor,24),
-                                             '--mem=120000',
-                                             '--job-name=m3dc1_stab'],
-                                'response':['--partition='+Plarge['saturn'],
-                                            '--nodes=2',
-                                            '--ntasks=32',
-                                            '--tasks-per-node=16',
-                                            '--time=%d:00:00'%(4*time_factor),
-                                            '--mem=120000']},
-                     'cori-haswell':{'efit':['--qos='+Psmall['cori-haswell'],
-                                             '--constraint=haswell',
-                                             '--account='+nersc_repo,
-                                             '--nodes=1',
-                                             '--ntasks=32',
-                                             '--time=0:%d:00'%max(10*time_factor,30),
-                                             '--job-name=m3dc1_efit'],
-                                     'uni_equil':['--qos='+Psmall['cori-haswell'],
-                                                  '--constraint=haswell',
-                                                  '--account='+nersc_repo,
-                                                  '--nodes=1',
-                                                  '--ntasks=32',
-                                                  '--time=0:%d:00'%max(20*time_factor,30),
-                                                  '--job-name=m3dc1_eq'],
-                                     'adapt':{False:['--qos='+Padapt['cori-haswell'],
-                                                     '--constraint=haswell',
-                                                     '--account='+nersc_repo,
-                                                     '--ntasks=1',
-                                                     '--time=%d:00:00'%(4*time_factor),
-                                                     '--mem=60000',
-                                                     '--job-name=m3dc1_adapt'],
-                                              True:['--qos='+Plarge['cori-haswell'],
-                                                    '--constraint=haswell',
-                                                    '--account='+nersc_repo,
-                                                    '--nodes=2',
-                                                    '--ntasks=64',
-                                                    '--time=%d:00:00'%(1*time_factor),
-                                                    '--job-name=m3dc1_adapt']},
-                                     'equilibrium':['--qos='+Plarge['cori-haswell'],
-                                                    '--constraint=haswell',
-                                                    '--account='+nersc_repo,
-                                                    '--nodes=4',
-                                                    '--ntasks=128',
-                                                    '--time=0:%d:00'%(5*time_factor),
-                                                    '--job-name=m3dc1_equil'],
-                                     'stability':['--qos='+Plarge['cori-haswell'],
-                                                  '--constraint=haswell',
-                                                  '--account='+nersc_repo,
-                                                  '--nodes=16',
-                                                  '--ntasks=512',
-                                                  '--time=%d:00:00'%(2*time_factor),
-                                                  '--job-name=m3dc1_stab'],
-                                     'response':['--qos='+Plarge['cori-haswell'],
-                                                 '--constraint=haswell',
-                                                 '--account='+nersc_repo,
-                                                 '--nodes=16',
-                                                 '--ntasks=512',
-                                                 '--time=%d:00:00'%(1*time_factor)]},
-                     'cori-knl':{'efit':['--qos='+Psmall['cori-knl'],
-                                         '--constraint=knl,quad,cache',
-                                         '--account='+nersc_repo,
-                                         '--nodes=1',
-                                         '--ntasks=64',
-                                         '--time=0:%d:00'%max(5*time_factor,30),
-                                         '--job-name=m3dc1_efit'],
-                                 'uni_equil':['--qos='+Psmall['cori-knl'],
-                                              '--constraint=knl,quad,cache',
-                                              '--account='+nersc_repo,
-                                              '--nodes=1',
-                                              '--ntasks=64',
-                                              '--time=0:%d:00'%max(10*time_factor,30),
-                                              '--job-name=m3dc1_eq'],
-                                 'adapt':{False:['--qos='+Padapt['cori-knl'],
-                                                 '--constraint=knl,quad,cache',
-                                                 '--account='+nersc_repo,
-                                                 '--ntasks=1',
-                                                 '--time=%d:00:00'%(1*time_factor),
-                                                 '--mem=60000',
-                                                 '--job-name=m3dc1_adapt'],
-                                          True:['--qos='+Plarge['cori-knl'],
-                                                '--constraint=knl,quad,cache',
-                                                '--account='+nersc_repo,
-                                                '--nodes=1',
-                                                '--ntasks=64',
-                                                '--time=%d:00:00'%(1*time_factor),
-                                                '--job-name=m3dc1_adapt']},
-                                 'equilibrium':['--qos='+Plarge['cori-knl'],
-                                                '--constraint=knl,quad,cache',
-                                                '--account='+nersc_repo,
-                                                '--nodes=2',
-                                                '--ntasks=128',
-                                                '--time=0:%d:00'%(10*time_factor),
-                                                '--job-name=m3dc1_equil'],
-                                 'stability':['--qos='+Plarge['cori-knl'],
-                                              '--constraint=knl,quad,cache',
-                                              '--account='+nersc_repo,
-                                              '--nodes=8',
-                                              '--ntasks=512',
-                                              '--time=%d:00:00'%(2*time_factor),
-                                              '--job-name=m3dc1_stab'],
-                                 'response':['--qos='+Plarge['cori-knl'],
-                                             '--constraint=knl,quad,cache',
-                                             '--account='+nersc_repo,
-                                             '--nodes=8',
-                                             '--ntasks=512',
-                                             '--time=%d:00:00'%(1*time_factor)]}
-    }
-
-
-    base_files = [template+'batch_slurm', template+'coil.dat']
-    if mesh_type[0] == 'c':
-        base_files += [os.getcwd() + '/' + uni_txt[machine][mesh_type]]
-        if mesh_type in uni0_smb[machine]:
-            base_files += [os.getcwd() + '/' + uni0_smb[machine][mesh_type]]
-    else:
-        base_files += [template + uni0_smb[machine][mesh_type]]
-        base_files += [template + uni_txt[machine][mesh_type]]
+    prep_C1input_base(C1input_base,template,C1_version=C1_version)
+
+    opts = stage_options(machine=machine, mesh_type=mesh_type,
+                         uniform_mesh=uniform_mesh, mesh_model=mesh_model,
+                         parallel_adapt=parallel_adapt,
+                         saturn_partition=saturn_partition,
+                         nersc_repo=nersc_repo, time_factor=time_factor,
+                         adapt_coil_delta=adapt_coil_delta, C1arch=C1arch,
+                         resources=resources)
+    coils = opts['coils']
+    efit_jobid = None
 
     if task == 'setup':
 
@@ -509,7 +102,7 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
             mysh.cp(r'g*.*','geqdsk')
             extract_profiles(machine=machine)
 
-        if (mesh_type=='rw') and (machine in ['DIII-D','NSTX-U','KSTAR','EAST','ITER']):
+        if (mesh_type=='rw') and machine_info(machine)['a2cc']:
 
             fc = open('current.dat','w')
             mysh.cp(r'a*.*','a0.0')
@@ -518,7 +111,30 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
             os.remove('a0.0')
 
 
-        if interactive:
+        if auto_extend:
+            print('Extending profile_ne and profile_te automatically')
+            failed = []
+            for name, minval in [('profile_ne',1e-2),('profile_te',1e-4)]:
+                if profile_fit.auto_extend(name,minval=minval,psimax=1.1) is not None:
+                    os.rename(name+'.extpy',name)
+                else:
+                    failed.append((name,minval))
+            print()
+
+            if (len(failed) > 0) and not interactive:
+                print('*** Could not extend '+' and '.join(f[0] for f in failed)+
+                      ' automatically ***')
+                os.chdir('..')
+                return
+            # fall back to choosing the parameters by hand
+            for name, minval in failed:
+                print("Trying: extend_profile('"+name+"',minval="+str(minval)+",psimax=1.1,psimin=0.95,center=0.98,width=0.01,smooth=None)")
+                loop_extprof(name,minval=minval,psimax=1.1,psimin=0.95,
+                             center=0.98,width=0.01,smooth=None)
+                os.rename(name+'.extpy',name)
+                print()
+
+        elif interactive:
             next = '-'
 
             while next not in ['Y','N']:
@@ -546,6 +162,12 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
 
         os.chdir('..')
 
+        problems = check_profiles(setup_folder)
+        if len(problems) > 0:
+            for p in problems:
+                print('*** '+p+' ***')
+            return
+
         if adapted_mesh is None:
             task = 'efit'
         else:
@@ -570,32 +192,25 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
         efit_folder = 'uni_efit'
         if os.path.isdir(efit_folder):
             print('Warning:  '+efit_folder+' exists and may be overwritten')
-        os.mkdir(efit_folder)
-
-        # load necessary files
-        for f in base_files:
-            mysh.cp(f,efit_folder+'/'+os.path.basename(f))
-        load_equil(setup_folder,efit_folder)
-        mysh.cp(C1input_base,efit_folder+'/C1input')
+            
+        # load necessary files, then modify C1input and batch_slurm
+        C1input_efit = stage_C1input(task,opts,C1input_mod=C1input_mod)
+        submit_batch = prep_run(efit_folder,task,opts,C1input=C1input_efit,
+                                C1input_base=C1input_base,
+                                equil_folder=setup_folder)
         os.chdir(efit_folder)
 
-        # modify C1input file
-        C1input_efit = dict(C1input_options[task])
-        if C1input_mod is not None:
-            C1input_efit.update(C1input_mod)
-        mod_C1input(C1input_efit)
-
-        # modify and sumbit batch_slurm
-        sedpy('BASH_COMMAND',bash_commands[task],'batch_slurm')
-        sedpy('EXEC_COMMAND',exec_commands[C1arch]+exec_args[task],'batch_slurm')
-        submit_batch = ['sbatch']+slurm_options[C1arch][task]+['batch_slurm']
+        # sumbit batch_slurm
         write_command(submit_batch)
-        call(submit_batch)
+        jobid = sbatch(submit_batch)
+        efit_jobid = jobid
         print()
 
         if machine in ['AUG']:
-            while not os.path.exists('time_000.h5'):
-                sleep(10)
+            if wait_for('time_000.h5',jobid=jobid) != COMPLETED:
+                print('*** EFIT job failed to produce time_000.h5 ***')
+                os.chdir('..')
+                return
             mysh.cp(template+'get_aug_currents.pro','./get_aug_currents.pro')
             call("\idl -e '@get_aug_currents'",shell=True)
 
@@ -620,25 +235,27 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
         uni_equil_folder = 'uni_equil'
         if os.path.isdir(uni_equil_folder):
             print('Warning:  '+uni_equil_folder+' exists and may be overwritten')
-        os.mkdir(uni_equil_folder)
 
-        for f in base_files:
-            mysh.cp(f,uni_equil_folder+'/'+os.path.basename(f))
-        load_equil(setup_folder,uni_equil_folder)
-        mysh.cp(C1input_base,uni_equil_folder+'/C1input')
+        C1input_uni_equil = stage_C1input(task,opts,C1input_mod=C1input_mod)
+        submit_batch = prep_run(uni_equil_folder,task,opts,
+                                C1input=C1input_uni_equil,
+                                C1input_base=C1input_base,
+                                equil_folder=setup_folder)
         os.chdir(uni_equil_folder)
 
-
-        C1input_uni_equil = dict(C1input_options[task])
-        if C1input_mod is not None:
-            C1input_uni_equil.update(C1input_mod)
-        mod_C1input(C1input_uni_equil)
-
-        sedpy('BASH_COMMAND',bash_commands[task],'batch_slurm')
-        sedpy('EXEC_COMMAND',exec_commands[C1arch]+exec_args[task],'batch_slurm')
-        submit_batch = ['sbatch']+slurm_options[C1arch][task]+['batch_slurm']
-
-        if interactive:
+        if auto_iterate:
+            # iterate on current.dat until the coil currents converge
+            first = next_iter()
+            converged, iter = iterate('.',submit_batch,max_iter=max_equil_iter,
+                                      tol=current_tol,method=accel,first=first)
+            if iter < first:
+                os.chdir('..')
+                return
+            if not (converged or interactive or equil_check):
+                print('*** Currents not converged, stopping before mesh adaptation ***')
+                os.chdir('..')
+                return
+        elif interactive:
             while True:
                 min_iter = raw_input('>>> Please enter minimum iteration number: ')
 
@@ -653,58 +270,67 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
         else:
             min_iter = 1
 
-        iter = 0
-        for iter in range(1,min_iter):
+        if not auto_iterate:
 
-            write_command(submit_batch)
-            call(submit_batch)
-            print()
-            while not os.path.exists('time_000.h5'):
-                sleep(10)
-            print('>>> iter '+str(iter)+' time_000.h5 created')
-            print(check_output('grep "Final error in GS solution" C1stdout',shell=True))
+            # continue numbering after any iter_<i> left by an earlier run
+            iter = next_iter()-1
+            for iter in range(iter+1,iter+min_iter):
 
-            os.mkdir('iter_'+str(iter))
-            move_iter('iter_'+str(iter)+'/')
+                write_command(submit_batch)
+                jobid = sbatch(submit_batch)
+                print()
+                state, monitor = watch_gs(jobid=jobid)
+                if state != COMPLETED:
+                    print('*** iter '+str(iter)+' failed to produce time_000.h5 ***')
+                    os.chdir('..')
+                    return
+                print('>>> iter '+str(iter)+' time_000.h5 created')
+                print('>>> '+monitor.summary())
 
-        next = 'Y'
-        iter += 1
+                os.mkdir('iter_'+str(iter))
+                move_iter('iter_'+str(iter)+'/')
 
-        while next != 'N':
+            next = 'Y'
+            iter += 1
 
-            write_command(submit_batch)
-            call(submit_batch)
-            print()
-            while not os.path.exists('time_000.h5'):
-                sleep(10)
-            print()
-            print('>>> iter '+str(iter)+' time_000.h5 created')
-            print(check_output('grep "Final error in GS solution" C1stdout',shell=True))
-            os.mkdir('iter_'+str(iter))
-            move_iter('iter_'+str(iter)+'/')
+            while next != 'N':
 
-            if interactive:
+                write_command(submit_batch)
+                jobid = sbatch(submit_batch)
+                print()
+                state, monitor = watch_gs(jobid=jobid)
+                if state != COMPLETED:
+                    print('*** iter '+str(iter)+' failed to produce time_000.h5 ***')
+                    os.chdir('..')
+                    return
+                print()
+                print('>>> iter '+str(iter)+' time_000.h5 created')
+                print('>>> '+monitor.summary())
+                os.mkdir('iter_'+str(iter))
+                move_iter('iter_'+str(iter)+'/')
 
-                print('>>> Check the equilibrium match for iter_'+str(iter))
+                if interactive:
 
-                next = '-'
+                    print('>>> Check the equilibrium match for iter_'+str(iter))
 
-                while next not in ['Y','N']:
+                    next = '-'
 
-                    next = raw_input('>>> Would you like to do another iteration? (Y/N) ')
+                    while next not in ['Y','N']:
 
-                    if next == 'Y':
-                        iter += 1
-                    elif next == 'N':
-                        break
-                    else:
-                        print('*** Improper response ***')
-            else:
-                next = 'N'
+                        next = raw_input('>>> Would you like to do another iteration? (Y/N) ')
 
-        else:
-            print('>>> Continuing to mesh adaptation')
-            print('>>> Check the equilibrium match for iter_'+str(iter))
+                        if next == 'Y':
+                            iter += 1
+                        elif next == 'N':
+                            break
+                        else:
+                            print('*** Improper response ***')
+                else:
+                    next = 'N'
+
+            else:
+                print('>>> Continuing to mesh adaptation')
+                print('>>> Check the equilibrium match for iter_'+str(iter))
 
 
         print()
@@ -731,8 +357,20 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
 
         else:
 
-            plot_script = os.environ.get('AUTOC1_HOME')+'/python/plot_equil_check.py'
-            Popen([sys.executable,'-u',plot_script])
+            if equil_check:
+                # the EFIT job submitted above may still be running
+                if (efit_jobid is not None) and \
+                   (wait_for('time_000.h5',folder='uni_efit',jobid=efit_jobid) != COMPLETED):
+                    print('*** EFIT job failed to produce time_000.h5 ***')
+                    return
+                try:
+                    report = check_equil(uni_equil_folder+'/iter_'+str(iter),'uni_efit')
+                except (IOError, KeyError) as e:
+                    print('*** Could not check the equilibrium: '+str(e)+' ***')
+                    return
+                if not report['pass']:
+                    print('*** Equilibrium does not match EFIT, stopping before mesh adaptation ***')
+                    return
             mysh.cp(uni_equil_folder+'/iter_'+str(iter)+'/current.dat',
                     uni_equil_folder+'/current.dat.good')
 
@@ -748,61 +386,57 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
 
     if task == 'adapt':
 
-        adapt_folder = def_folder(mesh_type,'adapt')
-        os.mkdir(adapt_folder)
+        adapt_folder = free_folder(mesh_type,'adapt',output='adapted0.smb')
+        if not os.path.isdir(adapt_folder):
+            os.mkdir(adapt_folder)
 
         print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
         print('Adapting mesh to equilibrium in %s/'%adapt_folder)
         print('%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%')
         print()
 
-        for f in base_files:
-            mysh.cp(f,adapt_folder+'/'+os.path.basename(f))
-        load_equil(setup_folder,adapt_folder)
-
         if adapted_mesh is None:
-            mysh.cp(template+'sfp_'+mesh_resolution,adapt_folder+'/sizefieldParam')
-
-            mysh.cp(uni_equil_folder+'/current.dat.good',
-                    adapt_folder+'/current.dat')
-
+            files = [(template+'sfp_'+mesh_resolution,'sizefieldParam'),
+                     (uni_equil_folder+'/current.dat.good','current.dat')]
 
             # Perform mesh adaptation
-            mysh.cp(C1input_base,adapt_folder+'/C1input')
-            if adapt_coil_delta > 0.:
-                mysh.cp(adapt_coil_file,adapt_folder+'/adapt_coil.dat')
-                mysh.cp(adapt_current_file,adapt_folder+'/adapt_current.dat')
+            if (adapt_coil_delta is not None) and (adapt_coil_delta > 0.):
+                files += [(adapt_coil_file,'adapt_coil.dat'),
+                          (adapt_current_file,'adapt_current.dat')]
+
+            C1input_adapt = stage_C1input(task,opts,C1input_mod=C1input_mod)
+            submit_batch = prep_run(adapt_folder,task,opts,C1input=C1input_adapt,
+                                    C1input_base=C1input_base,
+                                    equil_folder=setup_folder,files=files)
             os.chdir(adapt_folder)
 
-            C1input_adapt = dict(C1input_options[task])
-            if C1input_mod is not None:
-                C1input_adapt.update(C1input_mod)
-            mod_C1input(C1input_adapt)
-
-            sedpy('BASH_COMMAND',bash_commands[task],'batch_slurm')
-            sedpy('EXEC_COMMAND',exec_commands[C1arch]+exec_args[task],'batch_slurm')
-            submit_batch = ['sbatch']+slurm_options[C1arch][task][parallel_adapt]+['batch_slurm']
             write_command(submit_batch)
-            call(submit_batch)
+            jobid = sbatch(submit_batch)
             print()
 
             print('>>> Wait for adapted0.smb to be created')
-            while not (os.path.exists('adapted0.smb') or os.path.exists('ts0-adapted0.smb')):
-                sleep(10)
+            if wait_for(['adapted0.smb','ts0-adapted0.smb'],jobid=jobid) != COMPLETED:
+                print('*** Mesh adaptation failed to produce adapted0.smb ***')
+                os.chdir('..')
+                return
 
             if os.path.exists('ts0-adapted0.smb'):
                 mysh.cp('ts0-adapted0.smb', 'adapted0.smb')
 
             print('>>> Mesh adaptation complete')
 
-            with open('job_id.txt','r') as f:
-                jobid = f.read().rstrip('\n')
+            if jobid is None:
+                with open('job_id.txt','r') as f:
+                    jobid = f.read().rstrip('\n')
             print('>>> Killing m3dc1_adapt job #'+jobid)
-            call(['scancel',jobid])
+            scancel(jobid)
 
             os.chdir('..')
 
         else:
+            for f in opts['base_files']:
+                mysh.cp(f,adapt_folder+'/'+os.path.basename(f))
+            load_equil(setup_folder,adapt_folder)
             mysh.cp(setup_folder+'/current.dat',
                      adapt_folder+'/current.dat')
             mysh.cp(adapted_mesh, adapt_folder+'/adapted0.smb')
@@ -824,12 +458,6 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
     else:
         ncalc = 0
 
-    opts = {'0':'exit',
-            '1':'equilibrium',
-            '2':'stability',
-            '3':'response',
-            '4':'examine'}
-
     while True:
 
         if task == 'calculation':
@@ -848,19 +476,19 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
 
                 option = '-'
 
-                while option not in opts:
+                while option not in calc_options:
                     option = raw_input('>>> Please enter the desired option (1-4, 0 to exit): ')
-                    if option not in opts:
+                    if option not in calc_options:
                         print('*** Improper response ***')
 
                 print()
 
-                task = opts[option]
+                task = calc_options[option]
 
             else:
 
                 if ncalc == len(calcs):
-                    task = exit
+                    task = 'exit'
                 else:
 
                     if len(calcs[ncalc]) == 3:
@@ -874,7 +502,7 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
                         ncalc += 1
                         continue
 
-                    task = opts[option]
+                    task = calc_options[option]
                     print(task + ' calculation')
                     if ntor is not None:
                         print('   n='+ntor)
@@ -896,24 +524,15 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
             equil_folder = def_folder(mesh_type,'equil')
             os.mkdir(equil_folder)
 
-            for f in base_files:
-                mysh.cp(f,equil_folder+'/'+os.path.basename(f))
-            load_equil(adapt_folder,equil_folder)
-            mysh.cp(C1input_base,equil_folder+'/C1input')
-            mysh.cp(adapt_folder+'/adapted0.smb',
-                    equil_folder+'/adapted0.smb')
+            C1input_equil = stage_C1input(task,opts,C1input_mod=C1input_mod)
+            files = [(adapt_folder+'/adapted0.smb','adapted0.smb')]
+            submit_batch = prep_run(equil_folder,task,opts,C1input=C1input_equil,
+                                    C1input_base=C1input_base,
+                                    equil_folder=adapt_folder,files=files)
             os.chdir(equil_folder)
 
-            C1input_equil = dict(C1input_options[task])
-            if C1input_mod is not None:
-                C1input_equil.update(C1input_mod)
-            mod_C1input(C1input_equil)
-
-            sedpy('BASH_COMMAND',bash_commands[task],'batch_slurm')
-            sedpy('EXEC_COMMAND',exec_commands[C1arch]+exec_args[task],'batch_slurm')
-            submit_batch = ['sbatch']+slurm_options[C1arch][task]+['batch_slurm']
             write_command(submit_batch)
-            call(submit_batch)
+            jobid = sbatch(submit_batch)
             print()
 
             print('>>> Job m3dc1_equil submitted')
@@ -966,35 +585,17 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
             stab_folder = def_folder(rot,nflu+'f_stab')
             os.mkdir(stab_folder)
 
-            for f in base_files:
-                print(f)
-                mysh.cp(f,stab_folder+'/'+os.path.basename(f))
-            load_equil('../'+adapt_folder,stab_folder)
-            mysh.cp('../'+C1input_base,stab_folder+'/C1input')
-            mysh.cp('../'+adapt_folder+'/adapted0.smb',
-                    stab_folder+'/adapted0.smb')
+            C1input_stab = stage_C1input(task,opts,C1input_mod=C1input_mod,
+                                         ntor=ntor,nflu=nflu,
+                                         C1_version=C1_version)
+            files = [('../'+adapt_folder+'/adapted0.smb','adapted0.smb')]
+            submit_batch = prep_run(stab_folder,task,opts,C1input=C1input_stab,
+                                    C1input_base='../'+C1input_base,
+                                    equil_folder='../'+adapt_folder,files=files)
             os.chdir(stab_folder)
 
-            C1input_stab = dict(C1input_options[task])
-            C1input_stab.update({'ntor':ntor})
-            if nflu == '1':
-                C1input_stab.update({'db_fac':'0.0'})
-            elif nflu == '2':
-                C1input_stab.update({'db_fac':'1.0'})
-                try:
-                    if float(C1_version) > 1.7:
-                        C1input_stab.update({'igs_extend_diamag':'1'})
-                except ValueError:
-                    C1input_stab.update({'igs_extend_diamag':'1'})
-            if C1input_mod is not None:
-                C1input_stab.update(C1input_mod)
-            mod_C1input(C1input_stab)
-
-            sedpy('BASH_COMMAND',bash_commands[task],'batch_slurm')
-            sedpy('EXEC_COMMAND',exec_commands[C1arch]+exec_args[task],'batch_slurm')
-            submit_batch = ['sbatch']+slurm_options[C1arch][task]+['batch_slurm']
             write_command(submit_batch)
-            call(submit_batch)
+            jobid = sbatch(submit_batch)
             print()
             print('>>> Job m3dc1_stab submitted')
 
@@ -1043,77 +644,53 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
                 os.mkdir(ndir)
             os.chdir(ndir)
 
-            C1input_resp = dict(C1input_options[task])
-            C1input_resp.update({'ntor':ntor})
-            if nflu == '1':
-                C1input_resp.update({'db_fac':'0.0'})
-            elif nflu == '2':
-                C1input_resp.update({'db_fac':'1.0'})
-                try:
-                    if float(C1_version) > 1.7:
-                        C1input_stab.update({'igs_extend_diamag':'1'})
-                except ValueError:
-                    C1input_stab.update({'igs_extend_diamag':'1'})
-            if C1input_mod is not None:
-                C1input_resp.update(C1input_mod)
+            C1input_resp = stage_C1input(task,opts,C1input_mod=C1input_mod,
+                                         ntor=ntor,nflu=nflu,
+                                         C1_version=C1_version)
 
             if extra == None:
-                # Using M3D-C1 window pane model
+                # Using M3D-C1 window pane model, one job array for all coils
+                runs = []
                 for coil in coils[machine]:
                     resp_folder = def_folder(rot,nflu+'f_'+coil)
                     os.mkdir(resp_folder)
 
-                    for f in base_files:
-                        mysh.cp(f,resp_folder+'/'+os.path.basename(f))
-                    mysh.cp(template+'rmp_coil_'+coil+'.dat',
-                            resp_folder+'/rmp_coil.dat')
-                    mysh.cp(template+'rmp_current_'+coil+'.dat',
-                            resp_folder+'/rmp_current.dat')
-                    load_equil('../'+adapt_folder,resp_folder)
-                    mysh.cp('../'+C1input_base,resp_folder+'/C1input')
-                    mysh.cp('../'+adapt_folder+'/adapted0.smb',
-                            resp_folder+'/adapted0.smb')
-                    os.chdir(resp_folder)
-
-                    mod_C1input(C1input_resp)
-
                     job_name = 'm3dc1_'+coil
-                    sedpy('BASH_COMMAND',bash_commands[task],'batch_slurm')
-                    sedpy('EXEC_COMMAND',exec_commands[C1arch]+exec_args[task],'batch_slurm')
-                    submit_batch = ['sbatch']+slurm_options[C1arch][task]
-                    submit_batch += ['--job-name='+job_name]+['batch_slurm']
-                    write_command(submit_batch)
-                    call(submit_batch)
-
-                    os.chdir('..')
-                    print('>>> Job ' + job_name + ' submitted')
+                    files = [(template+'rmp_coil_'+coil+'.dat','rmp_coil.dat'),
+                             (template+'rmp_current_'+coil+'.dat','rmp_current.dat'),
+                             ('../'+adapt_folder+'/adapted0.smb','adapted0.smb')]
+                    submit_batch = prep_run(resp_folder,task,opts,
+                                            C1input=C1input_resp,
+                                            C1input_base='../'+C1input_base,
+                                            equil_folder='../'+adapt_folder,
+                                            files=files,job_name=job_name)
+                    runs.append((resp_folder,submit_batch))
+
+                jobids = submit_runs(runs,name='m3dc1_'+nflu+'f_response')
+                for folder, submit_batch in runs:
+                    print('>>> Job ' + str(jobids[folder]) + ' submitted in ' + folder)
 
             else:
                 # assuming extra is the PROBE_G filename
                 resp_folder = def_folder(rot,nflu+'f_probeg')
                 os.mkdir(resp_folder)
 
-                for f in base_files:
-                    mysh.cp(f,resp_folder+'/'+os.path.basename(f))
-                load_equil('../'+adapt_folder,resp_folder)
-                mysh.cp('../'+C1input_base,resp_folder+'/C1input')
-                mysh.cp('../'+adapt_folder+'/adapted0.smb',
-                        resp_folder+'/adapted0.smb')
-                os.chdir(resp_folder)
-
-                os.symlink('../../'+extra,'error_field')
                 C1input_resp.update({'irmp':'0'})
                 C1input_resp.update({'iread_ext_field':'1'})
                 C1input_resp.update({'extsubtract':'1'})
-                mod_C1input(C1input_resp)
 
                 job_name = 'm3dc1_probeg'
-                sedpy('BASH_COMMAND',bash_commands[task],'batch_slurm')
-                sedpy('EXEC_COMMAND',exec_commands[C1arch]+exec_args[task],'batch_slurm')
-                submit_batch = ['sbatch']+slurm_options[C1arch][task]
-                submit_batch += ['--job-name='+job_name]+['batch_slurm']
+                files = [('../'+adapt_folder+'/adapted0.smb','adapted0.smb')]
+                submit_batch = prep_run(resp_folder,task,opts,
+                                        C1input=C1input_resp,
+                                        C1input_base='../'+C1input_base,
+                                        equil_folder='../'+adapt_folder,
+                                        files=files,job_name=job_name)
+                os.chdir(resp_folder)
+
+                os.symlink('../../'+extra,'error_field')
                 write_command(submit_batch)
-                call(submit_batch)
+                jobid = sbatch(submit_batch)
 
                 os.chdir('..')
                 print('>>> Job ' + job_name + ' submitted')
@@ -1138,6 +715,11 @@ def autoC1(task='all', machine='DIII-D', calcs=[(0,0,0)],
             print(">>> Does 'ne', 'te', 'ti', or 'p' go negative anywhere?")
             print()
 
+            if len(find_stab()) > 0:
+                print('>>> Growth rates of the stability runs (growth_rates.txt):')
+                scan_growth('.')
+                print()
+
             if interactive:
                 next = '-'
 
@@ -1236,26 +818,3 @@ def loop_extprof(filename,minval=0.,psimax=1.05,psimin=0.95,center=0.98,
     plt.close('all')
 
     return
-
-
-def write_command(submit_batch):
-
-    with open("submit_command","w") as h:
-        h.write(' '.join(submit_batch))
-        h.write('\n')
-    return
-
-def def_folder(pre,post):
-
-    i = 1
-
-    while True:
-
-        folder = pre+str(i)+'_'+post
-
-        if os.path.isdir(folder):
-            i += 1
-        else:
-            break
-
-    return folder
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+batch_setup
+
+Non-interactive setup stage for many time slices at once
+
+Each efit folder (one per shot/time slice, holding the g-, a-, and p-files)
+gets geqdsk, the profiles, and current.dat as in the autoC1 setup task. With
+extend=True, profile_ne and profile_te of all slices are then extended with the
+automatic parameter search (profile_fit.search_batch) around the minval
+autoC1 suggests, without plotting. The slices are set up in a process
+pool and a summary table is printed and written to setup_summary.txt.
+
+    from batch_setup import batch_setup
+    batch_setup(gfiles='158103/*/efit/g158103.*',machine='DIII-D',extend=True)
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import time
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from stages import prep_setup
+from profile_fit import search_batch, extend_fit
+
+# Profile extension parameters, around those suggested in autoC1
+extend_options = {'profile_ne':{'minvals':[1e-3,1e-2,1e-1],'psimax':1.1},
+                  'profile_te':{'minvals':[1e-5,1e-4,1e-3],'psimax':1.1}}
+
+
+def batch_setup(folders=[], gfiles=None, machine='DIII-D', mesh_type='rw',
+                extend=False, max_workers=None, summary='setup_summary.txt'):
+    """
+    Set up every efit folder in folders, plus the folder of every g-file
+    matching the glob gfiles. Returns a list with one result dict per
+    slice (folder, ok, message, time, and fits).
+    """
+
+    folders = [os.path.abspath(f) for f in folders]
+    if gfiles is not None:
+        folders += [os.path.dirname(os.path.abspath(g))
+                    for g in sorted(glob(gfiles))]
+
+    # several g-files in one folder would all be copied onto one geqdsk
+    unique = []
+    for f in folders:
+        if f not in unique:
+            unique.append(f)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(setup_slice, unique,
+                                [machine]*len(unique),
+                                [mesh_type]*len(unique)))
+
+    if extend:
+        extend_slices([r for r in results if r['ok']])
+
+    lines = summary_table(results)
+    for line in lines:
+        print(line)
+    if summary is not None:
+        with open(summary,'w') as h:
+            h.write('\n'.join(lines)+'\n')
+
+    return results
+
+
+def setup_slice(folder, machine='DIII-D', mesh_type='rw'):
+    """
+    Set up a single efit folder and return its result dict
+    """
+
+    result = {'folder':folder,
+              'ok':False,
+              'message':'',
+              'time':0.,
+              'fits':{}}
+
+    start = time.time()
+    try:
+        if len(glob(folder+'/g*.*')) != 1:
+            result['message'] = 'expected one g-file'
+        elif not prep_setup(folder, machine=machine, mesh_type=mesh_type):
+            result['message'] = 'prep_setup failed'
+        else:
+            result['ok'] = True
+    except Exception as e:
+        result['message'] = repr(e)
+    result['time'] = time.time() - start
+
+    return result
+
+
+def extend_slices(results):
+    """
+    Pick the extension of profile_ne and profile_te of every slice
+    automatically, overwriting the files and storing
+    (center, width, height, slope) in result['fits']
+    """
+
+    for name in ['profile_ne','profile_te']:
+        opts = extend_options[name]
+        profs = [np.loadtxt(r['folder']+'/'+name) for r in results]
+        fits = search_batch([prof[:,0] for prof in profs],
+                            [prof[:,1] for prof in profs],
+                            [opts['minvals']]*len(profs),
+                            psimax=opts['psimax'])
+
+        for r, prof, fit in zip(results, profs, fits):
+            if fit['popt'] is None:
+                r['ok'] = False
+                r['message'] = 'could not fit '+name
+                continue
+            psi4, prof4, prof5 = extend_fit(prof[:,0],prof[:,1],fit['popt'],
+                                            minval=fit['minval'],
+                                            psimax=opts['psimax'],
+                                            smooth=fit['smooth'])
+            np.savetxt(r['folder']+'/'+name,np.column_stack((psi4,prof4)),
+                       delimiter="    ",fmt='%1.6f')
+            popt = fit['popt']
+            r['fits'][name] = (popt[0], 1./popt[1], popt[2], popt[3])
+
+    return
+
+
+def summary_table(results):
+
+    fmt = '%-40s %-4s %8s  %-34s %-34s %s'
+    lines = [fmt%('folder','ok','time(s)','ne fit (center width height slope)',
+                  'te fit (center width height slope)','message')]
+    for r in results:
+        fits = []
+        for name in ['profile_ne','profile_te']:
+            fit = r['fits'].get(name)
+            if fit is None:
+                fits.append('-')
+            else:
+                fits.append(' '.join('%.3g'%p for p in fit))
+        lines.append(fmt%(os.path.relpath(r['folder']), 'Y' if r['ok'] else 'N',
+                          '%.2f'%r['time'], fits[0], fits[1], r['message']))
+
+    nok = sum(r['ok'] for r in results)
+    lines.append('%d of %d slices set up'%(nok,len(results)))
+    return lines
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+benchmark
+
+Time the orchestration done by autoC1 itself, with no cluster and no
+M3D-C1, for response scans of 10, 100, and 1000 cases, and compare the
+times with a saved baseline
+
+A case is one run folder of an ntor x coil x C1input_mod scan on DIII-D
+(coils iu and il, ntor 1 to 10, and as many C1input_mod variants as are
+needed). Every size is run in a fresh temporary working directory, holding
+an adapted mesh, geqdsk, profiles, and current.dat, and each phase is timed:
+    render       - C1input text of every case (stage_C1input + Namelist)
+    template     - batch_slurm of every case (write_batch)
+    materialize  - run folders made by prep_calc: def_folder, links into
+                   the content-addressed store, C1input, batch_slurm
+    submit       - one sbatch per run folder, to a LocalCluster whose jobs
+                   never start (queue_delay is huge)
+    submit_array - the same runs as job arrays (job_array.submit_runs)
+The best of repeat runs is kept. Results are written as JSON with the
+python version, host, and CPU count. The temporary directories are made in
+$TMPDIR; a memory file system (e.g. TMPDIR=/dev/shm) keeps disk noise out
+of the times. compare() flags every phase and size that got slower than the
+baseline by more than tolerance (relative) and min_delta seconds; run as a
+script, a regression makes the exit status 1.
+
+    python benchmark.py                    # run, compare with the baseline
+    python benchmark.py --save             # run and save it as the baseline
+    python benchmark.py 10 100 --repeat=5 --tolerance=0.5
+        --baseline=<file>  (default: benchmark_baseline.json)
+        --results=<file>   (default: benchmark_results.json)
+
+    from benchmark import run_benchmarks, compare
+    results = run_benchmarks(sizes=[10,100])
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import io
+import sys
+import json
+import math
+import shutil
+import socket
+import platform
+import tempfile
+import itertools
+from time import perf_counter, strftime
+from contextlib import redirect_stdout
+
+import numpy as np
+
+home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AUTOC1_HOME', home)
+
+import slurm
+from namelist import Namelist
+from stages import stage_options, stage_C1input, prep_C1input_base, prep_calc
+from stages import write_batch, write_command
+from job_array import submit_runs
+from local_cluster import LocalCluster
+
+phases = ['render','template','materialize','submit','submit_array']
+sizes = [10, 100, 1000]
+machine = 'DIII-D'
+arch = 'saturn'
+ntors = list(range(1,11))
+
+baseline_name = 'benchmark_baseline.json'
+results_name = 'benchmark_results.json'
+tolerance = 0.5
+min_delta = 0.005
+
+
+def run_benchmarks(sizes=sizes, repeat=3, verbose=True):
+    """
+    {'meta':{...}, 'results':{phase:{size:seconds}}} with the best time of
+    repeat runs of every phase
+    """
+
+    results = dict((phase, {}) for phase in phases)
+    for n in sizes:
+        for r in range(repeat):
+            times = run_scan(n)
+            for phase, t in times.items():
+                key = str(n)
+                results[phase][key] = min(results[phase].get(key, t), t)
+        if verbose:
+            print('%5d cases: '%n + '  '.join('%s %.4f s'%(p, results[p][str(n)])
+                                              for p in phases))
+    return {'meta':meta(), 'results':results}
+
+
+def run_scan(n):
+    """
+    Seconds taken by each phase for a scan of n cases, in a temporary
+    working directory that is removed afterwards
+    """
+
+    root = tempfile.mkdtemp(prefix='autoC1_bench_')
+    previous = slurm.get_backend()
+    try:
+        make_root(root)
+        # nothing is printed while timing
+        with redirect_stdout(io.StringIO()):
+            opts = stage_options(machine=machine, root=root, C1arch=arch)
+            C1input_base = os.path.join(root,'C1input_base')
+            prep_C1input_base(C1input_base, opts['template'])
+            calcs = scan_calcs(n, opts)
+            times = {}
+            times['render'] = time_render(calcs, opts, C1input_base)
+            times['template'] = time_template(calcs, opts, root)
+            runs, times['materialize'] = time_materialize(calcs, opts, root,
+                                                          C1input_base)
+            cluster = slurm.set_backend(LocalCluster(queue_delay=1e9,
+                                                     spool=os.path.join(root,'spool')))
+            times['submit'] = time_submit(runs)
+            times['submit_array'] = time_submit_array(runs, root)
+            for jobid in list(cluster.jobs):
+                cluster.scancel(jobid)
+    finally:
+        slurm.set_backend(previous)
+        shutil.rmtree(root, ignore_errors=True)
+    return times
+
+
+def scan_calcs(n, opts):
+    """
+    [(ntor, C1input_mod),...] of the response calculations of n cases; each
+    gives one case per coil (the last may give fewer cases than coils)
+    """
+
+    coils = len(opts['coils'][machine])
+    nmods = int(math.ceil(n/float(coils*len(ntors))))
+    mods = [{'eta0':'%.3e'%(1e-6*(1+i)), 'ntimemax':str(10+i)} for i in range(nmods)]
+    calcs = list(itertools.product(mods, ntors))
+    return [(str(ntor), mod) for mod, ntor in calcs[:int(math.ceil(n/float(coils)))]]
+
+
+def time_render(calcs, opts, C1input_base):
+
+    with open(C1input_base,'r') as h:
+        lines = h.readlines()
+    start = perf_counter()
+    nl = Namelist(lines)
+    for ntor, mod in calcs:
+        C1input = stage_C1input('response', opts, C1input_mod=mod, ntor=ntor,
+                                nflu='1')
+        for coil in opts['coils'][machine]:
+            nl.render(C1input, verbose=False)
+    return perf_counter() - start
+
+
+def time_template(calcs, opts, root):
+
+    folder = os.path.join(root,'templates')
+    os.mkdir(folder)
+    template = opts['template']+'batch_slurm'
+    replacements = {'BASH_COMMAND':opts['bash_commands']['response'],
+                    'EXEC_COMMAND':opts['exec_commands'][arch]+opts['exec_args']['response']}
+    start = perf_counter()
+    i = 0
+    for ntor, mod in calcs:
+        for coil in opts['coils'][machine]:
+            write_batch(template, os.path.join(folder,'batch_slurm_%d'%i),
+                        replacements)
+            i += 1
+    return perf_counter() - start
+
+
+def time_materialize(calcs, opts, root, C1input_base):
+
+    runs = []
+    start = perf_counter()
+    for ntor, mod in calcs:
+        runs += prep_calc(('3',ntor,'1'), opts, root=root,
+                          adapt_folder='rw1_adapt', C1input_base=C1input_base,
+                          C1input_mod=mod)
+    return runs, perf_counter() - start
+
+
+def time_submit(runs):
+
+    start = perf_counter()
+    for folder, submit_batch in runs:
+        write_command(submit_batch, folder=folder)
+        slurm.sbatch(submit_batch, folder=folder)
+    return perf_counter() - start
+
+
+def time_submit_array(runs, root):
+
+    start = perf_counter()
+    submit_runs(runs, root=root, name='bench')
+    return perf_counter() - start
+
+
+def make_root(root):
+    """
+    A working directory with an adapted mesh and the equilibrium files of
+    the DIII-D template
+    """
+
+    template = os.path.join(os.environ['AUTOC1_HOME'],'templates',machine)
+    adapt = os.path.join(root,'rw1_adapt')
+    os.mkdir(adapt)
+    shutil.copyfile(os.path.join(template,'diiid0.020.smb'),
+                    os.path.join(adapt,'adapted0.smb'))
+    shutil.copyfile(os.path.join(template,'efit','g158103.03796'),
+                    os.path.join(adapt,'geqdsk'))
+    psi = np.linspace(0., 1.1, 111)
+    for name, center in [('profile_ne',0.6),('profile_te',2.0),('profile_omega',20.)]:
+        np.savetxt(os.path.join(adapt,name),
+                   np.column_stack([psi, center*np.maximum(1.-0.9*psi**2, 0.01)]),
+                   fmt='%.6e', delimiter='   ')
+    with open(os.path.join(adapt,'current.dat'),'w') as h:
+        for k in range(1,19):
+            h.write(' %d  %.6E\n'%(k, 100.*k))
+
+
+def meta():
+    return {'date':strftime('%Y-%m-%dT%H:%M:%S'),
+            'host':socket.gethostname(),
+            'python':platform.python_version(),
+            'cpus':os.cpu_count()}
+
+
+def save(results, filename):
+
+    with open(filename,'w') as h:
+        json.dump(results, h, indent=1, sort_keys=True)
+        h.write('\n')
+
+
+def load(filename):
+
+    with open(filename,'r') as h:
+        return json.load(h)
+
+
+def compare(results, baseline, tolerance=tolerance, min_delta=min_delta,
+            verbose=True):
+    """
+    Regressions of results against baseline, as [(phase, size, seconds,
+    baseline seconds),...]: slower by more than tolerance (relative) and
+    min_delta seconds. Phases or sizes missing from either are skipped.
+    """
+
+    lines = ['%-13s %6s %11s %13s %11s %7s'%('phase','cases','time [s]',
+                                             'per case [us]','baseline','ratio')]
+    regressions = []
+    for phase in phases:
+        for n, t in sorted(results['results'].get(phase,{}).items(),
+                           key=lambda kv: int(kv[0])):
+            base = baseline['results'].get(phase,{}).get(n)
+            if base is None:
+                lines.append('%-13s %6s %11.4f %13.1f %11s %7s'
+                             %(phase, n, t, 1e6*t/int(n), '-', '-'))
+                continue
+            slower = (t > base*(1.+tolerance)) and (t - base > min_delta)
+            if slower:
+                regressions.append((phase, int(n), t, base))
+            lines.append('%-13s %6s %11.4f %13.1f %11.4f %7.2f%s'
+                         %(phase, n, t, 1e6*t/int(n), base, t/base,
+                           '  *** SLOWER ***' if slower else ''))
+
+    if verbose:
+        print('\n'.join(lines))
+        if baseline['meta'].get('host') != results['meta'].get('host'):
+            print('Note: the baseline was taken on '+str(baseline['meta'].get('host')))
+    return regressions
+
+
+def main(argv=sys.argv):
+
+    options = {'repeat':'3', 'tolerance':str(tolerance),
+               'baseline':baseline_name, 'results':results_name}
+    save_baseline = False
+    run_sizes = []
+    for arg in argv[1:]:
+        if arg == '--save':
+            save_baseline = True
+        elif arg.startswith('--') and ('=' in arg):
+            key, value = arg[2:].split('=',1)
+            if key not in options:
+                print('*** Unknown option '+arg+' ***')
+                return 2
+            options[key] = value
+        else:
+            run_sizes.append(int(arg))
+
+    results = run_benchmarks(sizes=run_sizes or sizes,
+                             repeat=int(options['repeat']))
+    save(results, options['results'])
+    print('Results written to '+options['results'])
+
+    if save_baseline:
+        save(results, options['baseline'])
+        print('Baseline written to '+options['baseline'])
+        return 0
+    if not os.path.exists(options['baseline']):
+        print('No baseline '+options['baseline']+' to compare with (save one with --save)')
+        return 0
+
+    regressions = compare(results, load(options['baseline']),
+                          tolerance=float(options['tolerance']))
+    if len(regressions) > 0:
+        print('*** %d benchmark regressions against %s ***'
+              %(len(regressions), options['baseline']))
+        for phase, n, t, base in regressions:
+            print('***   %s with %d cases: %.4f s, baseline %.4f s ***'%(phase, n, t, base))
+        return 1
+    print('No regressions against '+options['baseline'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
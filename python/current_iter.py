@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+current_iter
+
+Non-interactive control of the uni_equil iterations on current.dat
+
+Each uni_equil job reads the coil currents in current.dat and writes the
+currents that match the equilibrium better to current.dat.out, i.e. one
+step x -> G(x) of a fixed-point iteration. After every job, iteration i is
+moved to iter_<i> (move_iter) together with a copy of G(x) as
+iter_<i>/current.dat.out, and the iteration stops once
+    |G(x) - x| <= tol*|x|   and   GS error <= gs_tol (if given)
+Otherwise the next current.dat is extrapolated from the iterations of this
+run so far (iter_<first> on; folders left by earlier runs are not used):
+    'picard'   - G(x), as the interactive loop does
+    'anderson' - Anderson acceleration over the last depth iterations
+                 (depth=1 is the vector Aitken/secant step)
+so that fewer queued jobs are needed.
+
+Only the real numbers in current.dat are currents; the rest of the file
+(integers, text) is kept as it is, and the currents are written back in the
+same number format.
+
+    from current_iter import iterate
+    ok, niter = iterate('uni_equil', submit_batch, max_iter=8, tol=1e-3)
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import re
+import glob
+
+import numpy as np
+
+import my_shutil as mysh
+from move_iter import move_iter, next_iter
+from slurm import sbatch, COMPLETED
+from stages import write_command
+from gs_monitor import watch_gs
+
+real = re.compile(r'[-+]?(?:\d+\.\d*|\.\d+)(?:[EeDd][-+]?\d+)?|[-+]?\d+[EeDd][-+]?\d+')
+
+methods = ['picard','anderson']
+
+
+def iterate(folder, submit_batch, max_iter=10, tol=1e-3, gs_tol=None,
+            method='anderson', depth=3, first=None, verbose=True):
+    """
+    Run uni_equil jobs in folder until the currents converge or max_iter
+    jobs have run, numbering them from first (default: after the iter_<i>
+    already there). Returns (converged, number of the last iteration),
+    which is first-1 if no iteration finished.
+    """
+
+    if method not in methods:
+        raise ValueError('Unknown current.dat iteration method: '+str(method))
+
+    if first is None:
+        first = next_iter(folder)
+    i = first-1
+    for n in range(max_iter):
+        i += 1
+        write_command(submit_batch, folder=folder)
+        jobid = sbatch(submit_batch, folder=folder)
+        state, monitor = watch_gs(folder=folder, jobid=jobid, verbose=verbose,
+                                  tol=gs_tol)
+        if state != COMPLETED:
+            print('*** iter '+str(i)+' failed to produce time_000.h5 ***')
+            return False, i-1
+        print('>>> iter '+str(i)+' time_000.h5 created')
+        print('>>> '+monitor.summary())
+
+        done, change = step(folder, i, monitor.final, tol=tol, gs_tol=gs_tol,
+                            method=method, depth=depth, first=first)
+        print('>>> iter %d: relative change in currents %.3e'%(i, change))
+        if done:
+            print('>>> Currents converged after iter '+str(i))
+            return True, i
+
+    print('*** Currents not converged after '+str(max_iter)+' iterations ***')
+    return False, i
+
+
+def step(folder, i, gs_error=None, tol=1e-3, gs_tol=None, method='anderson',
+         depth=3, first=1):
+    """
+    Move the finished iteration i to iter_<i> and, unless it converged,
+    write the next current.dat from iterations first to i. Returns
+    (converged, relative change).
+    """
+
+    iter_folder = folder+'/iter_'+str(i)
+    os.mkdir(iter_folder)
+    move_iter('iter_'+str(i)+'/', folder=folder)
+    # keep G(x) with its x, since current.dat may be overwritten below
+    mysh.cp(folder+'/current.dat', iter_folder+'/current.dat.out')
+
+    x, g = read_iteration(iter_folder)
+    change = np.linalg.norm(g - x)/max(np.linalg.norm(x), np.finfo(float).tiny)
+    done = change <= tol
+    if gs_tol is not None:
+        done = done and (gs_error is not None) and (gs_error <= gs_tol)
+
+    if (not done) and (method != 'picard'):
+        xs, gs = history(folder, first=first)
+        write_currents(folder+'/current.dat', anderson(xs, gs, depth=depth),
+                       like=iter_folder+'/current.dat.out')
+    return done, change
+
+
+def read_iteration(iter_folder):
+    """
+    (x, G(x)): currents in and out of the iteration in iter_folder
+    """
+
+    return (read_currents(iter_folder+'/current.dat'),
+            read_currents(iter_folder+'/current.dat.out'))
+
+
+def history(folder, first=1):
+    """
+    Currents in and out of every iter_<i> in folder with i >= first (that
+    has both), as arrays (niter, ncurrents) in iteration order
+    """
+
+    iters = []
+    for f in glob.glob(folder+'/iter_*'):
+        name = os.path.basename(f)[len('iter_'):]
+        if name.isdigit() and (int(name) >= first) and \
+           os.path.exists(f+'/current.dat.out'):
+            iters.append(int(name))
+    xs, gs = [], []
+    for i in sorted(iters):
+        x, g = read_iteration(folder+'/iter_'+str(i))
+        if (len(xs) > 0) and (len(x) != len(xs[0])):
+            continue
+        xs.append(x)
+        gs.append(g)
+    return np.array(xs), np.array(gs)
+
+
+def anderson(xs, gs, depth=3, beta=1.0):
+    """
+    Next iterate of x = G(x) by Anderson acceleration from the last depth+1
+    iterations (xs, gs with one row per iteration)
+    """
+
+    f = gs - xs
+    m = min(depth, len(xs)-1)
+    if m < 1:
+        return gs[-1]
+    dF = np.diff(f[-m-1:], axis=0).T
+    dG = np.diff(gs[-m-1:], axis=0).T
+    dX = np.diff(xs[-m-1:], axis=0).T
+    gamma = np.linalg.lstsq(dF, f[-1], rcond=None)[0]
+    x = xs[-1] - dX @ gamma
+    g = gs[-1] - dG @ gamma
+    return x + beta*(g - x)
+
+
+def read_currents(filename):
+
+    with open(filename,'r') as h:
+        text = h.read()
+    return np.array([_float(m.group()) for m in real.finditer(text)])
+
+
+def write_currents(filename, currents, like=None):
+    """
+    Write currents into the real numbers of the file like (default:
+    filename), keeping its layout and number formats
+    """
+
+    if like is None:
+        like = filename
+    with open(like,'r') as h:
+        text = h.read()
+
+    matches = list(real.finditer(text))
+    if len(matches) != len(currents):
+        raise ValueError(like+' has %d currents, not %d'%(len(matches),len(currents)))
+
+    out = []
+    last = 0
+    for m, value in zip(matches, currents):
+        out.append(text[last:m.start()])
+        out.append(_format(value, m.group()))
+        last = m.end()
+    out.append(text[last:])
+
+    with open(filename,'w') as h:
+        h.write(''.join(out))
+    return
+
+
+def _float(token):
+    return float(token.replace('D','E').replace('d','e'))
+
+
+def _format(value, token):
+    # same style as token: exponent or fixed, same number of decimals
+    mantissa = re.split(r'[EeDd]', token)[0]
+    decimals = len(mantissa.split('.')[1]) if '.' in mantissa else 0
+    if re.search(r'[EeDd]', token):
+        s = '%.*E'%(decimals, value)
+        if 'D' in token.upper() and 'E' not in token.upper():
+            s = s.replace('E','D')
+    else:
+        s = '%.*f'%(max(decimals,1), value)
+    return s
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+dag_submit
+
+Submit the whole autoC1 stage chain to Slurm at once, letting the scheduler
+order the jobs with --dependency=afterok:<jobid> instead of waiting in Python
+
+Stage graph:
+    efit                  (no dependencies, reference EFIT run)
+    uni_equil             (no dependencies, one GS iteration)
+    adapt                 afterok:uni_equil
+    equilibrium, stability, response
+                          afterok:adapt
+
+Files produced by earlier jobs are picked up by the batch scripts themselves:
+uni_equil files its output into the next iter_<i>/ as move_iter() does, the adapt job
+stops M3D-C1 once adapted0.smb is written and succeeds only if the mesh
+exists, and each calculation links (or copies) adapted0.smb from the adapt
+folder before partitioning it. Calculations with the same sbatch options
+(e.g., all coils and ntor of the responses) are submitted as one job array.
+With --kill-on-invalid-dep=yes, a failed job removes everything downstream
+of it from the queue.
+
+The job ids and dependencies are written to dag_jobs.txt in the working
+directory. Any program called sbatch found first in PATH is used, so a
+fake sbatch that records its arguments can stand in for Slurm.
+
+    from dag_submit import submit_chain
+    submit_chain(machine='DIII-D',calcs=[('1',None,None),('3','3','1')])
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import shlex
+
+import my_shutil as mysh
+from load_equil import load_equil
+from stages import stage_options, stage_C1input, prep_C1input_base, prep_setup
+from stages import prep_run, prep_calc, write_command, def_folder, free_folder
+from slurm import sbatch
+from job_array import group_runs, array_name, prepare_array
+from job_array import write_array_command
+from preflight import preflight, check_profiles
+
+stage_order = ['setup','efit','uni_equil','adapt','calculation']
+
+# Stop M3D-C1 once the adapted mesh has been written, as autoC1 does with scancel
+adapt_prologue = ('( until [ -e adapted0.smb ] || [ -e ts0-adapted0.smb ]; '
+                  'do sleep 10; done; sleep 10; pkill -P $$ -f m3dc1_2d ) &\n'
+                  'watcher=$!')
+adapt_epilogue = ('kill $watcher 2> /dev/null\n'
+                  'if [ -e ts0-adapted0.smb ]; then cp ts0-adapted0.smb adapted0.smb; fi\n'
+                  'test -e adapted0.smb')
+
+# Same bookkeeping as move_iter() and the current.dat.good copy in autoC1,
+# into the first free iter_<i> as next_iter() finds it
+uni_equil_epilogue = ('test -e time_000.h5 || exit 1\n'
+                      'i=1; while [ -d iter_$i ]; do i=$((i+1)); done\n'
+                      'mkdir iter_$i\n'
+                      'mv *.h5 C1ke C1stdout current.dat slurm-*.out iter_$i/\n'
+                      'if [ -e current.dat.out ]; then mv current.dat.out current.dat; fi\n'
+                      'if [ -e iter_$i/current.dat ]; then cp iter_$i/current.dat current.dat.good; fi')
+
+
+def submit_chain(root='.', task='all', machine='DIII-D', calcs=[],
+                 setup_folder='efit', adapted_mesh=None, C1input_mod=None,
+                 C1input_base='C1input_base', rot='eb', C1_version='1.9',
+                 mesh_type='rw', mesh_resolution='normal',
+                 adapt_coil_file=None, adapt_current_file=None,
+                 adapt_coil_delta=None, **options):
+    """
+    Prepare every run folder and submit all jobs with dependencies.
+    Returns the list of job nodes (dicts with name, folder, after, jobid),
+    or None if the graph could not be built.
+    """
+
+    root = os.path.abspath(root)
+
+    if task == 'all':
+        task = 'setup'
+    if task not in stage_order:
+        print('*** Unknown task '+task+' ***')
+        return None
+    stages = stage_order[stage_order.index(task):]
+    if adapted_mesh is not None:
+        stages = [s for s in stages if s not in ['efit','uni_equil','adapt']]
+
+    if (machine in ['AUG']) and ('efit' in stages):
+        print('*** AUG needs IDL (get_aug_currents) after the EFIT job, ***')
+        print('*** so it cannot be submitted as a single chain          ***')
+        return None
+
+    problems = preflight(root=root, task=task, machine=machine, calcs=calcs,
+                         setup_folder=setup_folder, adapted_mesh=adapted_mesh,
+                         mesh_type=mesh_type, mesh_resolution=mesh_resolution,
+                         C1input_mod=C1input_mod, C1input_base=C1input_base,
+                         adapt_coil_file=adapt_coil_file,
+                         adapt_current_file=adapt_current_file,
+                         adapt_coil_delta=adapt_coil_delta, **options)
+    if len(problems) > 0:
+        return None
+
+    opts = stage_options(machine=machine, root=root, mesh_type=mesh_type,
+                         adapt_coil_delta=adapt_coil_delta, **options)
+    if opts['parallel_adapt']:
+        print('*** Parallel mesh adaption not yet functional ***')
+        return None
+
+    setup_folder = os.path.join(root,setup_folder)
+    C1input_base = os.path.join(root,C1input_base)
+    prep_C1input_base(C1input_base,opts['template'],C1_version=C1_version)
+
+    if 'setup' in stages:
+        print('Setting up equilibrium files in '+setup_folder)
+        if not prep_setup(setup_folder, machine=machine, mesh_type=mesh_type):
+            print('*** Setup failed, nothing submitted ***')
+            return None
+        problems = check_profiles(setup_folder)
+        if len(problems) > 0:
+            for p in problems:
+                print('*** '+p+' ***')
+            return None
+
+    nodes = []
+
+    if 'efit' in stages:
+        folder = os.path.join(root,'uni_efit')
+        C1input = stage_C1input('efit',opts,C1input_mod=C1input_mod)
+        submit_batch = prep_run(folder,'efit',opts,C1input=C1input,
+                                C1input_base=C1input_base,
+                                equil_folder=setup_folder)
+        nodes.append(_node('efit',folder,submit_batch,[]))
+
+    if 'uni_equil' in stages:
+        folder = os.path.join(root,'uni_equil')
+        C1input = stage_C1input('uni_equil',opts,C1input_mod=C1input_mod)
+        submit_batch = prep_run(folder,'uni_equil',opts,C1input=C1input,
+                                C1input_base=C1input_base,
+                                equil_folder=setup_folder,
+                                epilogue=uni_equil_epilogue)
+        nodes.append(_node('uni_equil',folder,submit_batch,[]))
+
+    if 'adapt' in stages:
+        adapt_folder = free_folder(mesh_type,'adapt',root=root,
+                                   output='adapted0.smb')
+        folder = os.path.join(root,adapt_folder)
+        # a single GS iteration leaves current.dat.good equal to the
+        # setup current.dat, so it can be copied now
+        files = [(opts['template']+'sfp_'+mesh_resolution,'sizefieldParam'),
+                 (setup_folder+'/current.dat','current.dat')]
+        if (adapt_coil_delta is not None) and (adapt_coil_delta > 0.):
+            files += [(adapt_coil_file,'adapt_coil.dat'),
+                      (adapt_current_file,'adapt_current.dat')]
+        C1input = stage_C1input('adapt',opts,C1input_mod=C1input_mod)
+        submit_batch = prep_run(folder,'adapt',opts,C1input=C1input,
+                                C1input_base=C1input_base,
+                                equil_folder=setup_folder,files=files,
+                                prologue=adapt_prologue,
+                                epilogue=adapt_epilogue)
+        after = ['uni_equil'] if 'uni_equil' in stages else []
+        nodes.append(_node('adapt',folder,submit_batch,after))
+    elif adapted_mesh is not None:
+        adapt_folder = free_folder(mesh_type,'adapt',root=root,
+                                   output='adapted0.smb')
+        folder = os.path.join(root,adapt_folder)
+        if not os.path.isdir(folder):
+            os.mkdir(folder)
+        for f in opts['base_files']:
+            mysh.cp(f,folder+'/'+os.path.basename(f))
+        load_equil(setup_folder,folder)
+        mysh.cp(setup_folder+'/current.dat',folder+'/current.dat')
+        mysh.cp(os.path.join(root,adapted_mesh),folder+'/adapted0.smb')
+    else:
+        # use the most recent existing adapt folder
+        adapt_folder = def_folder(mesh_type,'adapt',root=root)
+        i = int(adapt_folder[len(mesh_type):-len('_adapt')])
+        adapt_folder = mesh_type+str(max(i-1,1))+'_adapt'
+
+    if 'calculation' in stages:
+        after = ['adapt'] if 'adapt' in stages else []
+        mesh = shlex.quote(os.path.join(root,adapt_folder)+'/adapted0.smb')
+        prologue = 'ln -f '+mesh+' . || cp '+mesh+' . || exit 1'
+        runs = []
+        for calc in calcs:
+            calc_runs = prep_calc(calc, opts, root=root,
+                                  adapt_folder=adapt_folder,
+                                  C1input_base=C1input_base,
+                                  C1input_mod=C1input_mod,
+                                  mesh_type=mesh_type, rot=rot,
+                                  C1_version=C1_version, prologue=prologue)
+            if calc_runs is not None:
+                runs += calc_runs
+        # runs with the same sbatch options go in one job array
+        for folders, submit_batch in group_runs(runs):
+            if len(folders) == 1:
+                name = os.path.relpath(folders[0],root)
+                nodes.append(_node(name,folders[0],submit_batch,after))
+            else:
+                name = array_name(root,'m3dc1_calcs')
+                submit_batch = prepare_array(folders,submit_batch,root=root,
+                                             name=name)
+                nodes.append(_node(name,root,submit_batch,after,array=True))
+
+    submit_graph(nodes)
+    write_jobs(nodes, root+'/dag_jobs.txt')
+
+    return nodes
+
+
+def submit_graph(nodes):
+    """
+    Submit nodes in order (every node must come after the nodes it
+    depends on), adding --dependency=afterok:<jobid> for each dependency
+    """
+
+    jobids = {}
+    for node in nodes:
+        deps = [jobids.get(name) for name in node['after']]
+        if None in deps:
+            print('*** Not submitting '+node['name']+
+                  ' because a job it depends on was not submitted ***')
+            continue
+
+        submit_batch = list(node['submit_batch'])
+        if len(deps) > 0:
+            submit_batch = (submit_batch[:-1] +
+                            ['--dependency=afterok:'+':'.join(deps),
+                             '--kill-on-invalid-dep=yes'] +
+                            submit_batch[-1:])
+
+        if node['array']:
+            write_array_command(submit_batch, node['folder'], node['name'])
+        else:
+            write_command(submit_batch, folder=node['folder'])
+        node['jobid'] = sbatch(submit_batch, folder=node['folder'])
+        jobids[node['name']] = node['jobid']
+
+    return jobids
+
+
+def write_jobs(nodes, filename):
+
+    with open(filename,'w') as h:
+        h.write('%-24s %-12s %-24s %s\n'%('name','jobid','afterok','folder'))
+        for node in nodes:
+            h.write('%-24s %-12s %-24s %s\n'%(node['name'],node['jobid'],
+                                              ','.join(node['after']) or '-',
+                                              node['folder']))
+    return
+
+
+def _node(name, folder, submit_batch, after, array=False):
+    return {'name':name,
+            'folder':folder,
+            'submit_batch':submit_batch,
+            'after':after,
+            'array':array,
+            'jobid':None}
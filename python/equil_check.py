@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+equil_check
+
+Score the match of a uni_equil iteration to the EFIT equilibrium from the two
+C1.h5 files, without a display, instead of judging plot_equil_check.py by eye
+
+The fields are evaluated on the reduced quintic elements of each mesh at a
+few points per element (no interpolation between meshes), and
+    shape      - largest distance [m] between the two last closed flux
+                 surfaces (psi_N = 1), along rays from the magnetic axis
+    jy         - rms difference of the flux-averaged toroidal current
+                 density profiles, each normalized to its largest value
+    ne, te, ti - smallest value anywhere on the mesh (must not be negative)
+are compared to thresholds. The report is written to equil_check.txt.
+
+    from equil_check import check_equil
+    report = check_equil('uni_equil/iter_3', 'uni_efit')
+    report['pass'], report['metrics']
+
+or, from a shell (exits with 1 if the check fails)
+    python equil_check.py uni_equil/iter_3 uni_efit
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import sys
+
+import numpy as np
+import h5py
+
+from move_iter import next_iter
+
+# powers of xi and eta in the 20 terms of the reduced quintic element
+mi = np.array([0,1,0,2,1,0,3,2,1,0,4,3,2,1,0,5,3,2,1,0])
+ni = np.array([0,0,1,0,1,2,0,1,2,3,0,1,2,3,4,0,2,3,4,5])
+
+shape_tol = 0.02
+jy_tol = 0.1
+min_values = {'ne':0., 'te':0., 'ti':0.}
+field_names = {'ne':'den', 'te':'te', 'ti':'ti'}
+
+order = 4
+nbins = 40
+nangles = 180
+
+report_name = 'equil_check.txt'
+
+
+class C1Equil(object):
+    """
+    Equilibrium fields of a C1.h5 file (slice=-1: the equilibrium, otherwise
+    time slice number slice) sampled at the points of an order-n triangular
+    grid in every element
+    """
+
+    def __init__(self, filename, slice=-1, n=order):
+
+        self.filename = filename
+        with h5py.File(filename,'r') as h5:
+            group = h5[_group(h5, slice)]
+            elements = group['mesh/elements'][()]
+            self.coefs = {}
+            for name in group['fields']:
+                self.coefs[name] = group['fields/'+name][()][:,:20]
+            self.psimin = _scalar(h5, 'psimin')
+            self.psilim = _scalar(h5, 'psi_lcfs')
+            self.xmag = _scalar(h5, 'xmag')
+            self.zmag = _scalar(h5, 'zmag')
+
+        a, b, c, theta, x, z = [elements[:,k] for k in range(6)]
+        self.nelms = len(a)
+        self._co = np.cos(theta)[:,None]
+        self._sn = np.sin(theta)[:,None]
+
+        # barycentric grid of order n in every element, in local coordinates
+        self.grid = [(i,j) for i in range(n+1) for j in range(n+1-i)]
+        l2 = np.array([i for i,j in self.grid])/float(n)
+        l3 = np.array([j for i,j in self.grid])/float(n)
+        l1 = 1. - l2 - l3
+        self.xi = -b[:,None]*l1 + a[:,None]*l2
+        self.eta = c[:,None]*l3
+        self.R = x[:,None] + (self.xi + b[:,None])*self._co - self.eta*self._sn
+        self.Z = z[:,None] + (self.xi + b[:,None])*self._sn + self.eta*self._co
+
+        # element area shared equally by its points, for averages
+        area = 0.5*(a + b)*c
+        self.weight = np.repeat(area[:,None]/len(self.grid), len(self.grid), axis=1)
+
+        self._edges = _grid_edges(self.grid, n)
+        self._cache = {}
+
+    def has(self, name):
+        return name in self.coefs
+
+    def field(self, name, dxi=0, deta=0):
+        """
+        name (or its local derivative) at the sample points, (nelms, npoints)
+        """
+
+        key = (name, dxi, deta)
+        if key not in self._cache:
+            c = self.coefs[name]
+            f = np.zeros(self.xi.shape)
+            for k in range(20):
+                m, n = mi[k]-dxi, ni[k]-deta
+                if m < 0 or n < 0:
+                    continue
+                factor = _falling(mi[k], dxi)*_falling(ni[k], deta)
+                f += factor*c[:,k:k+1]*self.xi**m*self.eta**n
+            self._cache[key] = f
+        return self._cache[key]
+
+    def psin(self):
+        return (self.field('psi') - self.psimin)/(self.psilim - self.psimin)
+
+    def jy(self):
+        """
+        Toroidal current density -Delta* psi / R
+        """
+
+        psi_R = self._co*self.field('psi',1,0) - self._sn*self.field('psi',0,1)
+        lap = self.field('psi',2,0) + self.field('psi',0,2)
+        return -(lap - psi_R/self.R)/self.R
+
+    def flux_average(self, f, bins=nbins):
+        """
+        Volume average of f (sample points) in bins of psi_N in [0,1];
+        returns (psi_N bin centers, average) with NaN in empty bins
+        """
+
+        psin = self.psin()
+        inside = self._closed(psin)
+        edges = np.linspace(0., 1., bins+1)
+        k = np.digitize(psin[inside], edges) - 1
+        w = (self.weight*self.R)[inside]
+        keep = (k >= 0) & (k < bins)
+        num = np.bincount(k[keep], weights=(w*f[inside])[keep], minlength=bins)
+        den = np.bincount(k[keep], weights=w[keep], minlength=bins)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return 0.5*(edges[1:]+edges[:-1]), num/den
+
+    def boundary(self, angles=nangles, center=None):
+        """
+        Distance from center (default: the magnetic axis) to psi_N = 1 at
+        angles equally spaced poloidal angles (NaN where none was found)
+        """
+
+        if center is None:
+            center = (self.xmag, self.zmag)
+
+        psin = self.psin()
+        i, j = self._edges[:,0], self._edges[:,1]
+        p1, p2 = psin[:,i], psin[:,j]
+        cross = (p1 - 1.)*(p2 - 1.) < 0.
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(cross, (1. - p1)/(p2 - p1), 0.)
+        R = self.R[:,i] + t*(self.R[:,j] - self.R[:,i])
+        Z = self.Z[:,i] + t*(self.Z[:,j] - self.Z[:,i])
+        R, Z = R[cross] - center[0], Z[cross] - center[1]
+
+        # the closed surface is the nearest crossing in every direction;
+        # separatrix legs and the private flux region are further out
+        r = np.hypot(R, Z)
+        k = ((np.arctan2(Z, R) + np.pi)/(2.*np.pi)*angles).astype(int) % angles
+        rmin = np.full(angles, np.inf)
+        np.minimum.at(rmin, k, r)
+        rmin[np.isinf(rmin)] = np.nan
+        return rmin
+
+    def domain(self):
+        """
+        ([Rmin,Rmax], [Zmin,Zmax]) of the mesh
+        """
+        return [self.R.min(), self.R.max()], [self.Z.min(), self.Z.max()]
+
+    def _closed(self, psin):
+        # inside psi_N = 1 and no further from the axis than the boundary
+        # in that direction, which excludes the private flux region
+        rb = self.boundary()
+        angles = len(rb)
+        R, Z = self.R - self.xmag, self.Z - self.zmag
+        k = ((np.arctan2(Z, R) + np.pi)/(2.*np.pi)*angles).astype(int) % angles
+        with np.errstate(invalid='ignore'):
+            return (psin <= 1.) & (np.hypot(R, Z) <= rb[k]*(1. + 1e-6))
+
+
+def check_equil(equil_folder=None, efit_folder='uni_efit', slice=-1,
+                shape_tol=shape_tol, jy_tol=jy_tol, min_values=min_values,
+                write=True, verbose=True):
+    """
+    Score the equilibrium in equil_folder (default: the last iteration in
+    uni_equil/) against the one in efit_folder. Returns a report
+    {'pass':bool, 'metrics':[(name, value, threshold, passed), ...], ...}
+    and writes it to equil_folder/equil_check.txt if write.
+    """
+
+    if equil_folder is None:
+        equil_folder = latest_iter()
+    equil = C1Equil(os.path.join(equil_folder,'C1.h5'), slice=slice)
+
+    metrics = []
+    efit_file = os.path.join(efit_folder,'C1.h5')
+    if os.path.exists(efit_file):
+        efit = C1Equil(efit_file, slice=slice)
+        metrics.append(('shape', shape_distance(equil, efit), shape_tol))
+        metrics.append(('jy', jy_mismatch(equil, efit), jy_tol))
+    else:
+        # nothing to compare with, so the match fails
+        print('*** '+efit_file+' not found ***')
+        metrics.append(('shape', np.nan, shape_tol))
+        metrics.append(('jy', np.nan, jy_tol))
+
+    for name, minval in sorted(min_values.items()):
+        field = field_names.get(name, name)
+        if equil.has(field):
+            metrics.append(('min_'+name, equil.field(field).min(), minval))
+
+    report = {'equil':equil_folder, 'efit':efit_folder, 'metrics':[]}
+    for name, value, threshold in metrics:
+        if name.startswith('min_'):
+            passed = bool(value >= threshold)
+        else:
+            passed = bool(value <= threshold)
+        report['metrics'].append((name, float(value), threshold, passed))
+    report['pass'] = all(m[3] for m in report['metrics'])
+
+    if write:
+        write_report(report, os.path.join(equil_folder,report_name))
+    if verbose:
+        print(format_report(report))
+    return report
+
+
+def shape_distance(equil, efit, angles=nangles):
+    """
+    Largest distance between the psi_N = 1 surfaces of two equilibria,
+    measured from the magnetic axis of efit
+    """
+
+    r1 = efit.boundary(angles)
+    r2 = equil.boundary(angles, center=(efit.xmag, efit.zmag))
+    d = np.abs(r2 - r1)
+    if np.all(np.isnan(d)):
+        return np.inf
+    return np.nanmax(d)
+
+
+def jy_mismatch(equil, efit, bins=nbins):
+    """
+    rms difference of the normalized flux-averaged jy profiles
+    """
+
+    psin, j1 = efit.flux_average(efit.jy(), bins)
+    psin, j2 = equil.flux_average(equil.jy(), bins)
+    keep = np.isfinite(j1) & np.isfinite(j2)
+    if not np.any(keep):
+        return np.inf
+    j1 = j1[keep]/np.max(np.abs(j1[keep]))
+    j2 = j2[keep]/np.max(np.abs(j2[keep]))
+    return np.sqrt(np.mean((j2 - j1)**2))
+
+
+def latest_iter(folder='uni_equil'):
+
+    i = next_iter(folder)-1
+    if i == 0:
+        raise IOError('No iter_<i> folders in '+folder)
+    return folder+'/iter_'+str(i)
+
+
+def format_report(report):
+
+    lines = ['Equilibrium check of '+str(report['equil'])+' against '+str(report['efit'])]
+    for name, value, threshold, passed in report['metrics']:
+        lines.append('%-8s %12.4e %12.4e  %s'%(name, value, threshold,
+                                               'pass' if passed else 'FAIL'))
+    lines.append('Result: '+('pass' if report['pass'] else 'FAIL'))
+    return '\n'.join(lines)
+
+
+def write_report(report, filename):
+
+    with open(filename,'w') as h:
+        h.write(format_report(report)+'\n')
+    return
+
+
+def _group(h5, slice):
+    if slice == -1:
+        return 'equilibrium' if 'equilibrium' in h5 else 'time_000'
+    return 'time_%03d'%slice
+
+
+def _scalar(h5, name):
+    if 'scalars/'+name not in h5:
+        raise KeyError(name+' not found in scalars of '+h5.filename)
+    return float(h5['scalars/'+name][-1])
+
+
+def _falling(p, d):
+    # p*(p-1)*...*(p-d+1)
+    f = 1
+    for k in range(d):
+        f *= p - k
+    return f
+
+
+def _grid_edges(grid, n):
+    # pairs of neighbouring grid points, whose sub-triangles tile the element
+    index = {ij:k for k,ij in enumerate(grid)}
+    edges = []
+    for (i,j), k in index.items():
+        for di, dj in [(1,0),(0,1),(-1,1)]:
+            other = (i+di, j+dj)
+            if other in index:
+                edges.append((k, index[other]))
+    return np.array(edges)
+
+
+if __name__ == '__main__':
+
+    args = sys.argv[1:]
+    report = check_equil(*args[:2])
+    sys.exit(0 if report['pass'] else 1)
@@ -9,108 +9,135 @@ Date created: Tue Oct 25
 """
 
 import os
+import re
 from subprocess import call
 from glob import glob
 import my_shutil as mysh
 import numpy as np
 from scipy.interpolate import interp1d
 
-def extract_profiles(machine='DIII-D',profile='all'):
+# Block header in an Osborne p-file, e.g. "256 psinorm ne(10^20/m^3) dne/dpsiN"
+pfile_block = re.compile(r'^\s*(\d+)\s+psinorm\s+([A-Za-z0-9_]+)(\S*)\s+(\S+)')
+
+# p-file blocks written as M3D-C1 profiles (omega in kRad/s)
+pfile_profiles = [('ne','profile_ne'),
+                  ('te','profile_te'),
+                  ('omeg','profile_omega.Ctor'),
+                  ('omgeb','profile_omega.ExB')]
+
+def read_pfile(filename):
+    """
+    Read every "N psinorm name(units) deriv" block of an Osborne p-file.
+    Returns {name:array} where each array has columns psinorm, value,
+    and derivative (e.g., pfile['ne'][:,1] is ne in 10^20/m^3).
+    Other blocks (like the ion species table) are skipped.
+    """
+
+    with open(filename,'r') as f:
+        lines = f.readlines()
+
+    pfile = {}
+    i = 0
+    while i < len(lines):
+        m = pfile_block.match(lines[i])
+        if m is None:
+            i += 1
+            continue
+        n = int(m.group(1))
+        block = ' '.join(lines[i+1:i+1+n]).split()
+        pfile[m.group(2)] = np.array(block,dtype=float).reshape(n,-1)
+        i += n+1
+
+    return pfile
+
+def extract_profiles(machine='DIII-D',profile='all',folder='.'):
     
     if machine in ['DIII-D','NSTX-U']:
     
         profile = 'all'
         print('Extracting all profiles from single file')
         
-        if len(glob(r'm3dc1_profiles_*.txt')) != 0:
-            mysh.cp(r'm3dc1_profiles_*.txt','m3dc1_profiles_0.txt')
+        pfiles = [p for p in glob(os.path.join(folder,'p*.*'))
+                  if not os.path.basename(p).startswith('profile')]
+        
+        if len(glob(os.path.join(folder,'m3dc1_profiles_*.txt'))) != 0:
+            mysh.cp(os.path.join(folder,'m3dc1_profiles_*.txt'),
+                    os.path.join(folder,'m3dc1_profiles_0.txt'))
             prof = 'm3dc1_profiles_0.txt'
-        elif len(glob(r'p*.*')) != 0:
-            mysh.cp(r'p*.*','p0.0')
-            prof = 'p0.0'
+            # extract profiles using Nate's utility
+            call(['extract_profiles.sh', prof],cwd=folder)
+            os.remove(os.path.join(folder,prof))
+        elif len(pfiles) != 0:
+            pfile = read_pfile(pfiles[0])
+            for name, out in pfile_profiles:
+                if name in pfile:
+                    np.savetxt(os.path.join(folder,out),pfile[name][:,:2],
+                               fmt='%.6e',delimiter='   ')
+            if 'omgeb' in pfile:
+                mysh.cp(os.path.join(folder,'profile_omega.ExB'),
+                        os.path.join(folder,'profile_omega'))
         else:
             print('Error: EFIT profiles file not found')
             return
-        
-        # extract profiles using Nate's utility        
-        call(['extract_profiles.sh', prof])
-        
-        if prof == 'p0.0':
-            # extact the Carbon toroidal rotation from the p-file
-            with open('p0.0','r') as fin:
-                iprint = False
-                for line in fin:
-                    if not iprint:
-                        if 'psinorm omeg' in line:
-                            iprint = True
-                            fout = open('profile_omega.Ctor','w')
-                    else:
-                        if 'psinorm'  not in line:
-                            fout.write(line)
-                        else:
-                            iprint = False
-                            fout.close()
-    
-        os.remove(prof)
     
     elif machine in ['AUG']:
         
         print('Extracting profile '+profile)
         
         if profile in ['all','ne']:
-            if len(glob(r'neprof_*.asc')) != 0:
-                mysh.cp(r'neprof_*.asc','neprof_0.asc')
+            if len(glob(os.path.join(folder,'neprof_*.asc'))) != 0:
+                mysh.cp(os.path.join(folder,'neprof_*.asc'),os.path.join(folder,'neprof_0.asc'))
                 prof = 'neprof_0.asc'
-                ne = np.loadtxt('neprof_0.asc')
+                ne = np.loadtxt(os.path.join(folder,'neprof_0.asc'))
                 ne[:,0] = ne[:,0]**2
                 ne[:,1] = ne[:,1]*1e-20
                 ne = ne[ne[:,0]<=1.0]
-                np.savetxt('profile_ne',ne,fmt='%.6e',delimiter='   ')
-                os.remove(prof)
+                np.savetxt(os.path.join(folder,'profile_ne'),ne,fmt='%.6e',delimiter='   ')
+                os.remove(os.path.join(folder,prof))
         
         if profile in ['all','te','Te']:
-            if len(glob(r'Teprof_*.asc')) != 0:
-                mysh.cp(r'Teprof_*.asc','Teprof_0.asc')
+            if len(glob(os.path.join(folder,'Teprof_*.asc'))) != 0:
+                mysh.cp(os.path.join(folder,'Teprof_*.asc'),os.path.join(folder,'Teprof_0.asc'))
                 prof = 'Teprof_0.asc'
-                Te = np.loadtxt('Teprof_0.asc')
+                Te = np.loadtxt(os.path.join(folder,'Teprof_0.asc'))
                 Te[:,0] = Te[:,0]**2
                 Te[:,1] = Te[:,1]*1e-3
                 Te = Te[Te[:,0]<=1.0]
-                np.savetxt('profile_te',Te,fmt='%.6e',delimiter='   ')
-                os.remove(prof)
+                np.savetxt(os.path.join(folder,'profile_te'),Te,fmt='%.6e',delimiter='   ')
+                os.remove(os.path.join(folder,prof))
             
         if profile in ['all','vt','vtor']:
-            if len(glob(r'vtprof_*.asc')) != 0:
-                mysh.cp(r'vtprof_*.asc','vtprof_0.asc')
+            if len(glob(os.path.join(folder,'vtprof_*.asc'))) != 0:
+                mysh.cp(os.path.join(folder,'vtprof_*.asc'),os.path.join(folder,'vtprof_0.asc'))
                 prof = 'vtprof_0.asc'
-                vt = np.loadtxt('vtprof_0.asc')
+                vt = np.loadtxt(os.path.join(folder,'vtprof_0.asc'))
                 vt[:,0] = vt[:,0]**2
                 vt[:,1] = vt[:,1]*1e-3
                 vt = vt[vt[:,0]<=1.0]
-                np.savetxt('profile_omega.Btor',vt,fmt='%.6e',delimiter='   ')
-                os.remove(prof)
-                mysh.cp(r'profile_omega.Btor','profile_omega')
+                np.savetxt(os.path.join(folder,'profile_omega.Btor'),vt,fmt='%.6e',delimiter='   ')
+                os.remove(os.path.join(folder,prof))
+                mysh.cp(os.path.join(folder,'profile_omega.Btor'),os.path.join(folder,'profile_omega'))
         
         if profile in ['all','omgeb','ExB']:
-            if len(glob(r'omgeb_*.asc')) != 0:
-                mysh.cp(r'omgeb_*.asc','omgeb_0.asc')
+            if len(glob(os.path.join(folder,'omgeb_*.asc'))) != 0:
+                mysh.cp(os.path.join(folder,'omgeb_*.asc'),os.path.join(folder,'omgeb_0.asc'))
                 prof = 'omgeb_0.asc'
-                omgeb = np.loadtxt('omgeb_0.asc')
+                omgeb = np.loadtxt(os.path.join(folder,'omgeb_0.asc'))
                 omgeb[:,0] = omgeb[:,0]**2
                 omgeb[:,1] = omgeb[:,1]*1e-3
                 omgeb = omgeb[omgeb[:,0]<=1.0]
                 
                 # interpolate profile omega onto Te grid
-                if len(glob(r'profile_te')) != 0:
-                    Te = np.loadtxt('profile_te')
+                if len(glob(os.path.join(folder,'profile_te'))) != 0:
+                    Te = np.loadtxt(os.path.join(folder,'profile_te'))
                     Pte = Te[:,0]
                     O = interp1d(omgeb[:,0],omgeb[:,1],fill_value='extrapolate')
                     om2 = O(Pte)
                     omgeb = np.transpose(np.array([Pte,om2]))
                 
-                np.savetxt('profile_omega.ExB',omgeb,fmt='%.6e',delimiter='   ')
-                os.remove(prof)
-                mysh.cp(r'profile_omega.ExB','profile_omega')
+                np.savetxt(os.path.join(folder,'profile_omega.ExB'),omgeb,fmt='%.6e',delimiter='   ')
+                os.remove(os.path.join(folder,prof))
+                mysh.cp(os.path.join(folder,'profile_omega.ExB'),os.path.join(folder,'profile_omega'))
 
 
     elif machine in ['AUG']:
@@ -118,33 +145,33 @@ def extract_profiles(machine='DIII-D',profile='all'):
         print('Extracting profile '+profile)
         
         if profile in ['all','ne','NE']:
-            if len(glob(r'NE_*.dat')) != 0:
-                mysh.cp(r'NE_*.dat','NE_0.dat')
+            if len(glob(os.path.join(folder,'NE_*.dat'))) != 0:
+                mysh.cp(os.path.join(folder,'NE_*.dat'),os.path.join(folder,'NE_0.dat'))
                 prof = 'NE_0.dat'
-                ne = np.loadtxt('NE_0.dat',skiprows=2,usecols=(1,2))
+                ne = np.loadtxt(os.path.join(folder,'NE_0.dat'),skiprows=2,usecols=(1,2))
                 ne[:,1] = ne[:,1]*1e-1
                 ne = ne[ne[:,0]<=1.0]
-                np.savetxt('profile_ne',ne,fmt='%.6e',delimiter='   ')
-                os.remove(prof)
+                np.savetxt(os.path.join(folder,'profile_ne'),ne,fmt='%.6e',delimiter='   ')
+                os.remove(os.path.join(folder,prof))
         
         if profile in ['all','te','Te','TE']:
-            if len(glob(r'TE_*.dat')) != 0:
-                mysh.cp(r'TE_*.dat','TE_0.dat')
+            if len(glob(os.path.join(folder,'TE_*.dat'))) != 0:
+                mysh.cp(os.path.join(folder,'TE_*.dat'),os.path.join(folder,'TE_0.dat'))
                 prof = 'TE_0.dat'
-                Te = np.loadtxt('TE_0.dat',skiprows=2,usecols=(1,2))
+                Te = np.loadtxt(os.path.join(folder,'TE_0.dat'),skiprows=2,usecols=(1,2))
                 Te = Te[Te[:,0]<=1.0]
-                np.savetxt('profile_te',Te,fmt='%.6e',delimiter='   ')
-                os.remove(prof)
+                np.savetxt(os.path.join(folder,'profile_te'),Te,fmt='%.6e',delimiter='   ')
+                os.remove(os.path.join(folder,prof))
             
         if profile in ['all','vt','vtor','VT']:
-            if len(glob(r'VT_*.dat')) != 0:
-                mysh.cp(r'VT_*.dat','VT_0.dat')
+            if len(glob(os.path.join(folder,'VT_*.dat'))) != 0:
+                mysh.cp(os.path.join(folder,'VT_*.dat'),os.path.join(folder,'VT_0.dat'))
                 prof = 'VT_0.dat'
-                vt = np.loadtxt('VT_0.dat',skiprows=2,usecols=(1,2))
+                vt = np.loadtxt(os.path.join(folder,'VT_0.dat'),skiprows=2,usecols=(1,2))
                 vt[:,1] = vt[:,1]*1e3
                 vt = vt[vt[:,0]<=1.0]
-                np.savetxt('profile_vphi',vt,fmt='%.6e',delimiter='   ')
-                os.remove(prof)
+                np.savetxt(os.path.join(folder,'profile_vphi'),vt,fmt='%.6e',delimiter='   ')
+                os.remove(os.path.join(folder,prof))
         
     return
         
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+geqdsk
+
+Read and write EFIT G-EQDSK files
+
+The file is split into its records in one pass when it is read, but the
+5e16.9 number blocks are only converted to NumPy arrays (all at once, with
+no per-number float() calls) the first time they are used. Blocks that were
+never used are written back exactly as they were read, and used blocks are
+written in the same Fortran format, so reading and writing a file gives an
+identical file.
+
+    from geqdsk import read_geqdsk
+    g = read_geqdsk('efit/g158103.03796')
+    g.psirz.shape     # (nh, nw)
+    g.qpsi[-1]        # q at the boundary
+    g.boundary        # (nbbbs, 2) array of R,Z
+    g.write('geqdsk')
+
+Date created: Sun Oct 18 2026
+"""
+
+import re
+import numpy as np
+
+# Names of the 20 scalars in the four lines after the header
+scalar_names = ['rdim','zdim','rcentr','rleft','zmid',
+                'rmaxis','zmaxis','simag','sibry','bcentr',
+                'current','simag2','xdum1','rmaxis2','xdum2',
+                'zmaxis2','xdum3','sibry2','xdum4','xdum5']
+
+profile_names = ['fpol','pres','ffprim','pprime']
+
+_number = re.compile(rb'[-+]?\d*\.?\d+(?:[eEdD][-+]?\d+)?')
+
+
+def read_geqdsk(filename):
+    return Geqdsk(filename)
+
+
+class Geqdsk(object):
+    """
+    Lazily decoded G-EQDSK file. Arrays are attributes:
+    fpol, pres, ffprim, pprime, qpsi (nw), psirz (nh,nw),
+    boundary (nbbbs,2), limiter (limitr,2), plus the scalars in
+    scalar_names and description, nw, nh.
+    """
+
+    def __init__(self, filename):
+
+        with open(filename,'rb') as f:
+            lines = f.read().split(b'\n')
+        if lines[-1] == b'':
+            lines = lines[:-1]
+
+        self.filename = filename
+        self._header = lines[0]
+        self.description = lines[0][:48].decode()
+        words = lines[0][48:].split()
+        self.idum = int(words[-3])
+        self.nw = int(words[-2])
+        self.nh = int(words[-1])
+
+        # (name, number of values, shape) for each block of 5e16.9 lines
+        blocks = [('scalars',20,None)]
+        blocks += [(name,self.nw,None) for name in profile_names]
+        blocks += [('psirz',self.nw*self.nh,(self.nh,self.nw)),
+                   ('qpsi',self.nw,None)]
+
+        self._raw = {}
+        self._shape = {}
+        self._count = {}
+        self._arrays = {}
+        i = 1
+        for name, n, shape in blocks:
+            i = self._block(lines, i, name, n, shape)
+
+        # boundary and limiter follow a line with their sizes
+        self._sizes = lines[i]
+        if len(lines[i].split()) >= 2:
+            nbbbs, limitr = [int(w) for w in lines[i].split()[:2]]
+            i += 1
+            i = self._block(lines, i, 'boundary', 2*nbbbs, (nbbbs,2))
+            i = self._block(lines, i, 'limiter', 2*limitr, (limitr,2))
+        else:
+            i += 1
+
+        # anything else (rotation, mass, etc.) is kept as it is
+        self._tail = lines[i:]
+
+    def _block(self, lines, i, name, n, shape):
+        nlines = (n + 4)//5
+        self._raw[name] = lines[i:i+nlines]
+        self._count[name] = n
+        self._shape[name] = shape
+        return i + nlines
+
+    def _get(self, name):
+        if name not in self._arrays:
+            self._arrays[name] = _decode(self._raw[name], self._count[name],
+                                         self._shape[name])
+        return self._arrays[name]
+
+    def _set(self, name, value):
+        value = np.asarray(value, dtype=float)
+        if value.size != self._count[name]:
+            raise ValueError(name+' must have '+str(self._count[name])+
+                             ' values')
+        self._arrays[name] = value.reshape(self._get(name).shape)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in scalar_names:
+            return self._get('scalars')[scalar_names.index(name)]
+        if name in self._count:
+            return self._get(name)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in scalar_names:
+            self._get('scalars')[scalar_names.index(name)] = value
+        elif name in profile_names+['psirz','qpsi','boundary','limiter']:
+            self._set(name, value)
+        else:
+            object.__setattr__(self, name, value)
+
+    # Convenience grids
+
+    @property
+    def q(self):
+        return self.qpsi
+
+    @property
+    def psi_n(self):
+        """Normalized poloidal flux of the 1D profiles"""
+        return np.linspace(0.,1.,self.nw)
+
+    @property
+    def r(self):
+        return self.rleft + np.linspace(0.,self.rdim,self.nw)
+
+    @property
+    def z(self):
+        return self.zmid + np.linspace(-0.5*self.zdim,0.5*self.zdim,self.nh)
+
+    @property
+    def psirz_n(self):
+        """psirz normalized to 0 on axis and 1 on the boundary"""
+        return (self.psirz - self.simag)/(self.sibry - self.simag)
+
+    def write(self, filename):
+
+        out = [self._header]
+        for name in ['scalars']+profile_names+['psirz','qpsi']:
+            out += self._lines(name)
+        if 'boundary' in self._count:
+            out.append(self._sizes)
+            out += self._lines('boundary')
+            out += self._lines('limiter')
+        else:
+            out.append(self._sizes)
+        out += self._tail
+
+        with open(filename,'wb') as f:
+            f.write(b'\n'.join(out)+b'\n')
+        return
+
+    def _lines(self, name):
+        if name not in self._arrays:
+            return self._raw[name]
+        return _encode(self._arrays[name].ravel())
+
+
+def _decode(lines, n, shape):
+
+    data = b''.join(line.rstrip(b'\r') for line in lines)
+    if len(data) == 16*n:
+        # fixed width: every number takes exactly 16 characters
+        values = np.frombuffer(data, dtype='S16').astype(float)
+    else:
+        values = np.array(_number.findall(data.replace(b'D',b'E')
+                                              .replace(b'd',b'e')),
+                          dtype=float)
+    if values.size != n:
+        raise ValueError('Expected '+str(n)+' values but read '+
+                         str(values.size))
+    if shape is not None:
+        values = values.reshape(shape)
+    return values
+
+
+def _encode(values):
+
+    words = [_fortran_e(v) for v in values.tolist()]
+    return [''.join(words[i:i+5]).encode() for i in range(0,len(words),5)]
+
+
+def _fortran_e(x):
+    # Fortran e16.9: sign, '0.', nine digits, exponent
+    sign = '-' if (x < 0. or (x == 0. and np.signbit(x))) else ' '
+    if x == 0.:
+        return sign+'0.000000000E+00'
+    s = '%.8E'%abs(x)
+    return '%s0.%s%sE%+03d'%(sign, s[0], s[2:10], int(s[11:])+1)
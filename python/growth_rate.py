@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+growth_rate
+
+Growth rates of linear stability runs from the scalar time traces in C1.h5,
+without IDL or C1py
+
+Only the datasets needed from the /scalars group of each C1.h5 are read
+(time and the kinetic energy E_KP + E_KT + E_K3), in chunks of chunk_size
+samples. In the linear phase E ~ exp(2 gamma t), so gamma is half the slope
+of a least-squares fit of ln(E) over the last window fraction of the run.
+The fit over the window before that is compared to it, and the run counts as
+converged if the two agree to rtol. Times, and so growth rates, are in the
+M3D-C1 units (Alfven times).
+
+Stability runs have max_ke = 1, so the fields are scaled down whenever the
+kinetic energy exceeds 1 and ln(E) is a sawtooth. Its downward jumps (steps
+falling by more than jump_factor times the median step) are found, and only
+the continuous segment after the last one is fitted. If that segment has
+fewer than min_segment samples, gamma is instead the median of the
+instantaneous growth rate over the window, leaving out the jumps.
+
+All stability folders of an ntor scan (n=<ntor>/<rot><i>_<nflu>f_stab, and
+the cases of scan<i>_stability/) are read in a process pool and collected
+into one table, written to growth_rates.txt.
+
+    from growth_rate import scan_growth
+    rows = scan_growth('158103.03796')
+    [(r['ntor'], r['gamma']) for r in rows]
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import re
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import h5py
+
+ke_names = ['E_KP','E_KT','E_K3']
+chunk_size = 4096
+window = 0.25
+rtol = 0.05
+jump_factor = 3.
+min_segment = 10
+
+stab_patterns = ['n=*/*_stab', 'scan*_stability/case_*']
+table_name = 'growth_rates.txt'
+
+
+def read_scalars(filename, names=None, chunk=chunk_size):
+    """
+    {name:array} of the datasets names (default: all) in the /scalars group
+    of filename, read chunk samples at a time. Missing names are left out.
+    """
+
+    out = {}
+    with h5py.File(filename,'r') as h5:
+        scalars = h5['scalars']
+        if names is None:
+            names = list(scalars.keys())
+        for name in names:
+            if name not in scalars:
+                continue
+            dset = scalars[name]
+            n = dset.shape[0]
+            values = np.empty(n, dtype=float)
+            for start in range(0, n, chunk):
+                values[start:start+chunk] = dset[start:start+chunk]
+            out[name] = values
+    return out
+
+
+def kinetic_energy(filename, chunk=chunk_size):
+    """
+    (time, kinetic energy) traces of filename
+    """
+
+    s = read_scalars(filename, ['time']+ke_names, chunk=chunk)
+    if 'time' not in s:
+        raise KeyError('No time trace in '+filename)
+    parts = [s[name] for name in ke_names if name in s]
+    if len(parts) == 0:
+        raise KeyError('No kinetic energy traces in '+filename)
+    n = min(len(s['time']), min(len(p) for p in parts))
+    return s['time'][:n], np.sum([p[:n] for p in parts], axis=0)
+
+
+def fit_growth(time, energy, window=window, rtol=rtol, jump_factor=jump_factor,
+               min_segment=min_segment):
+    """
+    Growth rate of energy ~ exp(2 gamma t) from the last window fraction of
+    the trace (of its last segment if it was rescaled). Returns a dict with
+    gamma, its standard error, the growth rate fitted over the window before,
+    whether the two agree to rtol, and the number of rescalings.
+    """
+
+    ok = np.isfinite(time) & np.isfinite(energy) & (energy > 0.)
+    time, energy = time[ok], energy[ok]
+    result = {'gamma':np.nan, 'error':np.nan, 'previous':np.nan,
+              'converged':False, 'rescaled':0}
+    jumps = find_jumps(time, energy, factor=jump_factor)
+    result['rescaled'] = len(jumps)
+    if len(jumps) > 0:
+        if len(time) - jumps[-1] < min_segment:
+            result.update(_median_growth(time, energy, jumps, window, rtol))
+            return result
+        time, energy = time[jumps[-1]:], energy[jumps[-1]:]
+
+    n = len(time)
+    m = max(int(round(window*n)), 3)
+    if n < m:
+        return result
+
+    result['gamma'], result['error'] = _fit(time[-m:], np.log(energy[-m:]))
+    if n >= 2*m:
+        result['previous'] = _fit(time[-2*m:-m], np.log(energy[-2*m:-m]))[0]
+        change = abs(result['gamma'] - result['previous'])
+        result['converged'] = bool(change <= rtol*abs(result['gamma']))
+    return result
+
+
+def find_jumps(time, energy, factor=jump_factor):
+    """
+    Indices i where ln(E) falls from sample i-1 to i by more than factor
+    times the median step, i.e. where the fields were rescaled
+    """
+
+    d = np.diff(np.log(energy))
+    if len(d) == 0:
+        return np.zeros(0, dtype=int)
+    return np.nonzero(d < -factor*np.median(np.abs(d)))[0] + 1
+
+
+def growth_trace(time, energy, jumps=None):
+    """
+    Instantaneous growth rate 1/2 d ln(E)/dt, nan next to the jumps (default:
+    those found by find_jumps)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = 0.5*np.gradient(np.log(energy), time)
+        if jumps is None:
+            jumps = find_jumps(time, energy)
+    jumps = np.asarray(jumps, dtype=int)
+    gamma[jumps] = np.nan
+    gamma[jumps-1] = np.nan
+    return gamma
+
+
+def run_growth(folder, window=window, rtol=rtol, chunk=chunk_size):
+    """
+    Growth rate of the stability run in folder, as a table row
+    """
+
+    row = {'folder':folder, 'ntor':run_ntor(folder), 'nsteps':0,
+           'time':np.nan, 'gamma':np.nan, 'error':np.nan, 'previous':np.nan,
+           'converged':False, 'rescaled':0, 'message':''}
+    filename = os.path.join(folder,'C1.h5')
+    if not os.path.exists(filename):
+        row['message'] = 'no C1.h5'
+        return row
+    try:
+        time, energy = kinetic_energy(filename, chunk=chunk)
+    except (IOError, OSError, KeyError) as e:
+        row['message'] = str(e)
+        return row
+    row['nsteps'] = len(time)
+    if len(time) > 0:
+        row['time'] = time[-1]
+    row.update(fit_growth(time, energy, window=window, rtol=rtol))
+    if row['rescaled'] > 0:
+        row['message'] = '%d rescalings'%row['rescaled']
+    return row
+
+
+def run_ntor(folder):
+    """
+    ntor of the run in folder, from its C1input or else an n=<ntor> parent
+    """
+
+    C1input = os.path.join(folder,'C1input')
+    if os.path.exists(C1input):
+        with open(C1input,'r') as h:
+            for line in h:
+                m = re.match(r'\s*ntor\s*=\s*([-+]?\d+)', line)
+                if m is not None:
+                    return int(m.group(1))
+    m = re.search(r'n=([-+]?\d+)', folder)
+    if m is not None:
+        return int(m.group(1))
+    return None
+
+
+def find_stab(root='.', patterns=stab_patterns):
+
+    folders = []
+    for pattern in patterns:
+        folders += [f for f in glob(os.path.join(root,pattern)) if os.path.isdir(f)]
+    return sorted(set(folders))
+
+
+def scan_growth(roots='.', folders=None, window=window, rtol=rtol,
+                max_workers=None, table=table_name, verbose=True):
+    """
+    Growth rates of every stability run under roots (or of folders), sorted
+    by ntor. The table is printed and written to table in the first root
+    (unless table is None). Returns the rows.
+    """
+
+    if isinstance(roots, str):
+        roots = [roots]
+    if folders is None:
+        folders = []
+        for root in roots:
+            folders += find_stab(root)
+
+    n = len(folders)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        rows = list(pool.map(run_growth, folders, [window]*n, [rtol]*n))
+    rows.sort(key=lambda r: (r['ntor'] is None, r['ntor'], r['folder']))
+
+    lines = growth_table(rows)
+    if verbose:
+        print('\n'.join(lines))
+    if table is not None:
+        with open(os.path.join(roots[0],table),'w') as h:
+            h.write('\n'.join(lines)+'\n')
+    return rows
+
+
+def growth_table(rows):
+
+    fmt = '%-40s %5s %7s %11s %12s %11s %12s %-4s %s'
+    lines = [fmt%('folder','ntor','nsteps','time','gamma','error','previous',
+                  'conv','message')]
+    for r in rows:
+        lines.append(fmt%(os.path.relpath(r['folder']), r['ntor'], r['nsteps'],
+                          '%.5g'%r['time'], '%.5e'%r['gamma'], '%.2e'%r['error'],
+                          '%.5e'%r['previous'], 'Y' if r['converged'] else 'N',
+                          r['message']))
+    return lines
+
+
+def _fit(t, y):
+    # slope/2 of a straight line fit and its standard error
+    A = np.vstack([t, np.ones(len(t))]).T
+    coef, res, rank, sv = np.linalg.lstsq(A, y, rcond=None)
+    if len(t) > 2:
+        sigma2 = np.sum((y - A @ coef)**2)/(len(t) - 2)
+        cov = sigma2*np.linalg.pinv(A.T @ A)
+        err = np.sqrt(cov[0,0])
+    else:
+        err = np.nan
+    return 0.5*coef[0], 0.5*err
+
+
+def _median_growth(time, energy, jumps, window, rtol):
+    # median of the growth rate over the last window, and the one before
+    gamma = growth_trace(time, energy, jumps)
+    n = len(gamma)
+    m = max(int(round(window*n)), 3)
+    out = {}
+    last = gamma[-m:][np.isfinite(gamma[-m:])]
+    if len(last) == 0:
+        return out
+    out['gamma'] = np.median(last)
+    out['error'] = 1.4826*np.median(np.abs(last - out['gamma']))/np.sqrt(len(last))
+    if n >= 2*m:
+        prev = gamma[-2*m:-m][np.isfinite(gamma[-2*m:-m])]
+        if len(prev) > 0:
+            out['previous'] = np.median(prev)
+            change = abs(out['gamma'] - out['previous'])
+            out['converged'] = bool(change <= rtol*abs(out['gamma']))
+    return out
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+gs_monitor
+
+Follow the GS solver residuals in C1stdout while a uni_equil job runs, and
+(optionally) cancel the job as soon as the iteration stalls or diverges
+instead of letting it use its whole allocation
+
+GSMonitor reads only what was appended to C1stdout since its last read and
+parses the residual of each GS iteration (lines matched by
+residual_pattern, whose 'error' group is the residual and optional 'iter'
+group the iteration number) and the 'Final error in GS solution' line. The
+residuals so far are in monitor.iterations and monitor.residuals.
+monitor.verdict() is
+    'diverged' - the last residual is not finite, or is above tol and
+                 diverge_factor above the smallest one
+    'stalled'  - the last stall_window iterations did not bring the
+                 residual below tol or below stall_ratio times its
+                 earlier minimum
+    None       - otherwise
+where tol is the gs_tol of the run, or error_floor if it has none, so a
+residual that is already small enough never counts as stalled or diverged.
+watch_gs() (and the coroutine await_gs()) poll C1stdout until time_000.h5
+appears or the job fails. On a bad verdict they print a warning and keep
+watching, unless cancel=True, in which case the job is cancelled with
+scancel and FAILED is returned. Cancelling is off by default since
+residual_pattern has not yet been checked against C1stdout of every
+M3D-C1 version.
+
+    from gs_monitor import watch_gs
+    state, monitor = watch_gs('uni_equil', jobid=jobid)
+    monitor.final, monitor.residuals
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import re
+import asyncio
+from time import sleep, time
+
+import numpy as np
+
+from slurm import scancel, FAILED, COMPLETED
+from job_watch import _status, _due
+
+residual_pattern = (r'GS.*?error\W*?'
+                    r'(?P<error>[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[EeDd][-+]?\d+)?'
+                    r'|NaN|[-+]?Infinity)')
+iter_pattern = r'(?i)iter\w*\D*?(?P<iter>\d+)'
+final_pattern = 'Final error in GS solution'
+number = r'[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[EeDd][-+]?\d+)?'
+
+stall_window = 10
+stall_ratio = 0.99
+diverge_factor = 100.
+error_floor = 1e-6
+
+
+class GSMonitor(object):
+    """
+    Residuals of the GS iterations written so far to filename
+    """
+
+    def __init__(self, filename, pattern=residual_pattern):
+
+        self.filename = filename
+        self.pattern = re.compile(pattern)
+        self._iter = re.compile(iter_pattern)
+        self._offset = 0
+        self._partial = ''
+        self.iterations = []
+        self.residuals = []
+        self.final = None
+        self.flagged = None
+
+    def update(self):
+        """
+        Parse lines appended since the last update; returns how many
+        residuals were added
+        """
+
+        if not os.path.exists(self.filename):
+            return 0
+        if os.path.getsize(self.filename) < self._offset:
+            # C1stdout was started over (rm -f C1stdout in batch_slurm)
+            self.__init__(self.filename, self.pattern.pattern)
+        with open(self.filename,'r',errors='replace') as h:
+            h.seek(self._offset)
+            text = h.read()
+            self._offset = h.tell()
+
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        added = 0
+        for line in lines:
+            if final_pattern in line:
+                values = re.findall(number, line)
+                if len(values) > 0:
+                    self.final = _float(values[-1])
+                continue
+            m = self.pattern.search(line)
+            if m is None:
+                continue
+            if ('iter' in self.pattern.groupindex) and (m.group('iter') is not None):
+                it = m
+            else:
+                it = self._iter.search(line)
+            self.iterations.append(int(it.group('iter')) if it is not None
+                                   else len(self.iterations)+1)
+            self.residuals.append(_float(m.group('error')))
+            added += 1
+        return added
+
+    def series(self):
+        """
+        (iterations, residuals) so far as numpy arrays
+        """
+        return np.array(self.iterations), np.array(self.residuals)
+
+    def verdict(self, window=stall_window, ratio=stall_ratio,
+                factor=diverge_factor, tol=None):
+
+        if self.final is not None or len(self.residuals) == 0:
+            return None
+        if tol is None:
+            tol = error_floor
+        res = np.array(self.residuals)
+        if not np.isfinite(res[-1]):
+            return 'diverged'
+        if res[-1] <= tol:
+            return None
+        if res[-1] > factor*np.min(res):
+            return 'diverged'
+        if (len(res) > window) and (np.min(res[-window:]) > tol) and \
+           (np.min(res[-window:]) > ratio*np.min(res[:-window])):
+            return 'stalled'
+        return None
+
+    def summary(self):
+
+        if self.final is not None:
+            return 'Final error in GS solution: %.4e'%self.final
+        if len(self.residuals) == 0:
+            return 'No GS residuals in '+self.filename
+        return ('GS iteration %d: error %.4e (min %.4e)'
+                %(self.iterations[-1], self.residuals[-1], min(self.residuals)))
+
+
+def watch_gs(folder='.', jobid=None, files='time_000.h5', poll=2.,
+             timeout=None, cancel=False, state_interval=60., verbose=True,
+             **criteria):
+    """
+    Follow C1stdout in folder until one of files appears or the job ends.
+    If the GS iteration stalls or diverges this is printed, and with cancel
+    the job is cancelled and FAILED is returned. criteria are passed on to
+    monitor.verdict() (window, ratio, factor, tol). Returns (state, monitor).
+    """
+
+    monitor, files = _start(folder, files)
+    start = time()
+    last_query = None
+    state = None
+    while True:
+        query = _due(jobid, last_query, state_interval)
+        state = _status(files, folder, query, state, verbose)
+        if query is not None:
+            last_query = time()
+        state = _check(monitor, state, jobid, cancel, verbose, criteria)
+        if state in [FAILED, COMPLETED]:
+            return state, monitor
+        if (timeout is not None) and (time() - start > timeout):
+            return state, monitor
+        sleep(poll)
+
+
+async def await_gs(folder='.', jobid=None, files='time_000.h5', poll=2.,
+                   timeout=None, cancel=False, state_interval=60., verbose=True,
+                   **criteria):
+
+    monitor, files = _start(folder, files)
+    loop = asyncio.get_event_loop()
+    start = time()
+    last_query = None
+    state = None
+    while True:
+        query = _due(jobid, last_query, state_interval)
+        # squeue/sacct and scancel block, so keep them off the event loop
+        state = await loop.run_in_executor(None, _status, files, folder,
+                                           query, state, verbose)
+        if query is not None:
+            last_query = time()
+        state = await loop.run_in_executor(None, _check, monitor, state, jobid,
+                                           cancel, verbose, criteria)
+        if state in [FAILED, COMPLETED]:
+            return state, monitor
+        if (timeout is not None) and (time() - start > timeout):
+            return state, monitor
+        await asyncio.sleep(poll)
+
+
+def _start(folder, files):
+    if isinstance(files, str):
+        files = [files]
+    return GSMonitor(os.path.join(folder,'C1stdout')), files
+
+
+def _check(monitor, state, jobid, cancel, verbose, criteria):
+
+    if monitor.update() > 0 and verbose:
+        print('>>> '+monitor.summary())
+    if state == COMPLETED:
+        # the last lines may have been written with time_000.h5
+        monitor.update()
+        return state
+
+    verdict = monitor.verdict(**criteria)
+    if verdict is None:
+        return state
+    if verdict != monitor.flagged:
+        print('*** GS iteration '+verdict+': '+monitor.summary()+' ***')
+        monitor.flagged = verdict
+    if not cancel:
+        return state
+    if jobid is not None:
+        print('>>> Cancelling job '+str(jobid))
+        scancel(jobid)
+    return FAILED
+
+
+def _float(value):
+    try:
+        return float(value.replace('D','E').replace('d','e'))
+    except ValueError:
+        return np.nan
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+job_array
+
+Submit many prepared run folders as one Slurm job array
+
+Every folder must already hold its batch_slurm (as written by prep_run) and
+all folders of an array must use the same sbatch options; submit_runs groups
+runs by their options and submits one array per group. The array index of
+each folder is written to <name>_folders.txt in the submit directory, as
+tab-separated "index folder" lines, and the array script <name>.sh looks up
+its folder with $SLURM_ARRAY_TASK_ID, changes to it, and runs batch_slurm
+there with output in slurm-<jobid>_<index>.out. Task i of array job J can be
+queried or cancelled as J_i.
+
+    from job_array import submit_array
+    jobid = submit_array(folders, submit_batch, root='.', name='array_stab')
+    jobids = submit_runs(runs, root='.', name='m3dc1_calcs')
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+
+from slurm import sbatch
+from stages import write_command
+
+array_script = '''#!/bin/bash
+# One task of a job array: run batch_slurm in the folder listed for
+# $SLURM_ARRAY_TASK_ID in MAP_FILE
+folder=$(awk -F'\\t' -v i=$SLURM_ARRAY_TASK_ID '$1==i {print $2}' MAP_FILE)
+cd "$folder" || exit 1
+echo ${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID} > array_id.txt
+# run batch_slurm with the interpreter on its first line
+exec $(sed -n '1s/^#!//p' batch_slurm) batch_slurm > slurm-${SLURM_ARRAY_JOB_ID}_${SLURM_ARRAY_TASK_ID}.out 2>&1
+'''
+
+
+def submit_array(folders, submit_batch, root='.', name='array',
+                 max_running=None):
+    """
+    Submit folders as one job array with the sbatch options of submit_batch
+    (an sbatch command from prep_run; its --job-name and batch file are
+    replaced). At most max_running tasks run at once if it is given.
+    Returns the array job id, or None if submission failed.
+    """
+
+    if len(folders) == 0:
+        return None
+    root = os.path.abspath(root)
+    name = array_name(root, name)
+    submit_batch = prepare_array(folders, submit_batch, root=root, name=name,
+                                 max_running=max_running)
+    write_array_command(submit_batch, root, name)
+    return sbatch(submit_batch, folder=root)
+
+
+def submit_runs(runs, root='.', name='array', max_running=None):
+    """
+    Submit prepared runs [(folder, submit_batch),...], as one job array
+    for each set of runs with the same sbatch options and as a single job
+    otherwise. Returns {folder:jobid}, where task i of array job J is J_i.
+    """
+
+    jobids = {}
+    for folders, submit_batch in group_runs(runs):
+        if len(folders) == 1:
+            write_command(submit_batch, folder=folders[0])
+            jobids[folders[0]] = sbatch(submit_batch, folder=folders[0])
+            continue
+        jobid = submit_array(folders, submit_batch, root=root, name=name,
+                             max_running=max_running)
+        for i, folder in enumerate(folders):
+            jobids[folder] = None if jobid is None else jobid+'_'+str(i)
+    return jobids
+
+
+def group_runs(runs):
+    """
+    Group [(folder, submit_batch),...] by sbatch options (ignoring
+    --job-name) into [(folders, submit_batch),...], keeping their order
+    """
+
+    groups = []
+    keys = []
+    for folder, submit_batch in runs:
+        key = _options(submit_batch)
+        if key in keys:
+            groups[keys.index(key)][0].append(folder)
+        else:
+            keys.append(key)
+            groups.append(([folder], submit_batch))
+    return groups
+
+
+def prepare_array(folders, submit_batch, root='.', name='array',
+                  max_running=None):
+    """
+    Write the index-to-folder map and array script for folders in root
+    and return the sbatch command for the array (to be run in root)
+    """
+
+    root = os.path.abspath(root)
+    map_file = write_array_map(folders, root+'/'+name+'_folders.txt')
+    script = root+'/'+name+'.sh'
+    with open(script,'w') as h:
+        h.write(array_script.replace('MAP_FILE',"'"+map_file+"'"))
+
+    return array_command(submit_batch, len(folders), name=name,
+                         max_running=max_running,
+                         script=os.path.basename(script))
+
+
+def array_name(root, name):
+    # a pending array reads its map when each task starts, so never reuse one
+    base = name
+    i = 1
+    while os.path.exists(os.path.join(root,name+'_folders.txt')):
+        i += 1
+        name = base+'_'+str(i)
+    return name
+
+
+def write_array_command(submit_batch, root, name):
+
+    with open(os.path.join(root,name+'_command'),'w') as h:
+        h.write(' '.join(submit_batch))
+        h.write('\n')
+    return
+
+
+def array_command(submit_batch, ntasks, name='array', max_running=None,
+                  script='array.sh'):
+
+    options = _options(submit_batch)
+    array = '--array=0-%d'%(ntasks-1)
+    if max_running is not None:
+        array += '%%%d'%max_running
+    return ['sbatch'] + options + [array, '--job-name='+name, script]
+
+
+def write_array_map(folders, filename):
+
+    with open(filename,'w') as h:
+        for i, folder in enumerate(folders):
+            h.write('%d\t%s\n'%(i,os.path.abspath(folder)))
+    return os.path.abspath(filename)
+
+
+def read_array_map(filename):
+    """
+    Return the folders of a job array, in index order
+    """
+
+    with open(filename,'r') as h:
+        return [line.rstrip('\n').split('\t',1)[1] for line in h
+                if len(line.strip()) > 0]
+
+
+def _options(submit_batch):
+    return [o for o in submit_batch[1:-1] if not o.startswith('--job-name')]
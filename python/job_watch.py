@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+job_watch
+
+Wait for a batch job to produce an output file (e.g., time_000.h5 or
+adapted0.smb) without sleeping in fixed 10 second steps
+
+Backends:
+    'inotify' - Block on Linux inotify events for the run folder
+    'slurm'   - Check for the file with exponential backoff, starting over
+                at poll_min whenever squeue/sacct report a new job state
+    'poll'    - Check for the file with exponential backoff
+    'auto'    - inotify if available and the folder is on a local file
+                system, otherwise slurm if a job id is known, otherwise poll
+
+Every backend asks squeue/sacct for the job state at most once every
+state_interval seconds, and checks for the file in between.
+
+await_for() is a coroutine version of the 'poll' backend, so that many runs
+can be watched from a single asyncio event loop.
+
+wait_for() and await_for() return PENDING, RUNNING, FAILED, or COMPLETED.
+COMPLETED means one of the files exists, FAILED means the job ended without
+producing any of them, and PENDING/RUNNING are only returned on timeout.
+On a network file system a file can show up some time after the job ended,
+so the job only counts as FAILED once file_grace seconds passed without it.
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import re
+import select
+import asyncio
+import ctypes
+import ctypes.util
+from time import sleep, time
+
+from slurm import job_state, PENDING, RUNNING, FAILED, COMPLETED
+
+# inotify event masks from <sys/inotify.h>
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_CLOSE_WRITE = 0x00000008
+IN_NONBLOCK    = 0o4000
+IN_CLOEXEC     = 0o2000000
+
+# file systems whose changes on other nodes inotify does not see
+network_fs = ['nfs','nfs4','lustre','gpfs','beegfs','panfs','cifs','smb3',
+              'ceph','afs','glusterfs','fuse.glusterfs','fuse.sshfs']
+file_grace = 30.
+
+
+def wait_for(files, folder='.', jobid=None, backend='auto', timeout=None,
+             poll_min=0.5, poll_max=10., state_interval=60., verbose=True):
+
+    if isinstance(files, str):
+        files = [files]
+
+    if backend == 'auto':
+        if inotify_available() and local_fs(folder):
+            backend = 'inotify'
+        elif jobid is not None:
+            backend = 'slurm'
+        else:
+            backend = 'poll'
+
+    if backend not in backends:
+        raise ValueError('Unknown job_watch backend: '+str(backend))
+
+    return backends[backend](files, folder, jobid, timeout,
+                             poll_min, poll_max, state_interval, verbose)
+
+
+async def await_for(files, folder='.', jobid=None, timeout=None,
+                    poll_min=0.5, poll_max=10., state_interval=60.,
+                    verbose=True):
+
+    if isinstance(files, str):
+        files = [files]
+
+    loop = asyncio.get_event_loop()
+    start = time()
+    last_query = None
+    state = None
+    delay = poll_min
+    while True:
+        query = _due(jobid, last_query, state_interval)
+        if query is None:
+            state = _status(files, folder, None, state, verbose)
+        else:
+            # squeue/sacct block, so keep them off the event loop
+            state = await loop.run_in_executor(None, _status, files, folder,
+                                               query, state, verbose)
+            last_query = time()
+        if state in [FAILED, COMPLETED]:
+            return state
+
+        if timeout is not None:
+            left = timeout - (time() - start)
+            if left <= 0.:
+                return state
+            delay = min(delay, left)
+        await asyncio.sleep(delay)
+        delay = min(2.*delay, poll_max)
+
+
+def found(files, folder='.'):
+    for f in files:
+        if os.path.exists(os.path.join(folder, f)):
+            return f
+    return None
+
+
+def inotify_available():
+    return _libc() is not None
+
+
+def local_fs(folder='.'):
+    """
+    Whether folder is on a local file system, from /proc/mounts
+    (False if that cannot be read)
+    """
+
+    path = os.path.realpath(folder)
+    best, fstype = '', None
+    try:
+        with open('/proc/mounts','r') as h:
+            for line in h:
+                words = line.split()
+                if len(words) < 3:
+                    continue
+                # spaces and the like are octal escapes, e.g. \040
+                mount = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1),8)),
+                               words[1])
+                inside = (path == mount) or \
+                         path.startswith(mount.rstrip('/')+'/')
+                if inside and (len(mount) >= len(best)):
+                    best, fstype = mount, words[2]
+    except IOError:
+        return False
+    return (fstype is not None) and (fstype not in network_fs)
+
+
+def _watch_inotify(files, folder, jobid, timeout, poll_min, poll_max,
+                   state_interval, verbose):
+
+    libc = _libc()
+    fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    if fd < 0:
+        return _watch_poll(files, folder, jobid, timeout, poll_min, poll_max,
+                           state_interval, verbose)
+    try:
+        wd = libc.inotify_add_watch(fd, os.path.abspath(folder).encode(),
+                                    IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE)
+        if wd < 0:
+            return _watch_poll(files, folder, jobid, timeout, poll_min,
+                               poll_max, state_interval, verbose)
+
+        # Check only after the watch is in place so no event can be missed.
+        # Events from other nodes are not seen on network file systems,
+        # so also stat with backoff up to every poll_max seconds.
+        start = time()
+        last_query = None
+        state = None
+        delay = poll_min
+        while True:
+            query = _due(jobid, last_query, state_interval)
+            state = _status(files, folder, query, state, verbose)
+            if query is not None:
+                last_query = time()
+            if state in [FAILED, COMPLETED]:
+                return state
+
+            wait = delay
+            delay = min(2.*delay, poll_max)
+            if timeout is not None:
+                wait = min(wait, timeout - (time() - start))
+                if wait <= 0.:
+                    return state
+
+            ready, _, _ = select.select([fd], [], [], wait)
+            if ready:
+                try:
+                    os.read(fd, 4096)
+                except OSError:
+                    pass
+    finally:
+        os.close(fd)
+
+
+def _watch_slurm(files, folder, jobid, timeout, poll_min, poll_max,
+                 state_interval, verbose):
+
+    if jobid is None:
+        return _watch_poll(files, folder, jobid, timeout, poll_min, poll_max,
+                           state_interval, verbose)
+
+    start = time()
+    last_query = None
+    state = None
+    delay = poll_min
+    while True:
+        old = state
+        query = _due(jobid, last_query, state_interval)
+        state = _status(files, folder, query, state, verbose)
+        if query is not None:
+            last_query = time()
+        if state in [FAILED, COMPLETED]:
+            return state
+
+        # The file is most likely to appear soon after the job starts
+        if old != state:
+            delay = poll_min
+        if not _sleep(delay, start, timeout):
+            return state
+        delay = min(2.*delay, poll_max)
+
+
+def _watch_poll(files, folder, jobid, timeout, poll_min, poll_max,
+                state_interval, verbose):
+
+    start = time()
+    last_query = None
+    state = None
+    delay = poll_min
+    while True:
+        query = _due(jobid, last_query, state_interval)
+        state = _status(files, folder, query, state, verbose)
+        if query is not None:
+            last_query = time()
+        if state in [FAILED, COMPLETED]:
+            return state
+
+        if not _sleep(delay, start, timeout):
+            return state
+        delay = min(2.*delay, poll_max)
+
+
+backends = {'inotify':_watch_inotify,
+            'slurm':_watch_slurm,
+            'poll':_watch_poll}
+
+
+def _status(files, folder, jobid, last, verbose):
+
+    if found(files, folder) is not None:
+        return COMPLETED
+
+    if jobid is None:
+        return last or RUNNING
+
+    state = job_state(jobid)
+    if state is None:
+        # Not (yet) visible to squeue/sacct
+        state = last or PENDING
+    elif state == COMPLETED:
+        # Job ended, so the file may have landed just after our check
+        if _landed(files, folder):
+            return COMPLETED
+        state = FAILED
+
+    if verbose and (state != last):
+        print('>>> Job '+str(jobid)+' '+state)
+
+    return state
+
+
+def _landed(files, folder, grace=None):
+    # whether one of files shows up within grace seconds, which is only
+    # waited for on network file systems
+    if grace is None:
+        grace = 0. if local_fs(folder) else file_grace
+    start = time()
+    delay = 0.5
+    while found(files, folder) is None:
+        left = grace - (time() - start)
+        if left <= 0.:
+            return False
+        sleep(min(delay, left))
+        delay *= 2.
+    return True
+
+
+def _due(jobid, last_query, state_interval):
+    # Job id to query if a scheduler query is due, otherwise None
+    if jobid is None:
+        return None
+    if (last_query is None) or (time() - last_query >= state_interval):
+        return jobid
+    return None
+
+
+def _sleep(delay, start, timeout):
+    if timeout is not None:
+        left = timeout - (time() - start)
+        if left <= 0.:
+            return False
+        delay = min(delay, left)
+    sleep(delay)
+    return True
+
+
+_libc_cache = []
+def _libc():
+
+    if len(_libc_cache) == 0:
+        libc = None
+        name = ctypes.util.find_library('c')
+        if name is not None:
+            try:
+                libc = ctypes.CDLL(name, use_errno=True)
+                libc.inotify_init1
+                libc.inotify_add_watch.argtypes = [ctypes.c_int,
+                                                   ctypes.c_char_p,
+                                                   ctypes.c_uint32]
+            except (OSError, AttributeError):
+                libc = None
+        _libc_cache.append(libc)
+
+    return _libc_cache[0]
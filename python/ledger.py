@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""
+ledger
+
+SQLite ledger of finished M3D-C1 runs, for capacity planning and for
+choosing walltimes from real numbers
+
+harvest() finds the run folders under each working directory (folders with
+a C1input and a batch_slurm, and each iter_<i> of a uni_equil folder),
+matches them to their Slurm jobs, and stores one row per (folder, job) with
+    machine, stage, mesh, nelms, ntor, nflu    - from C1input and the mesh
+    partition, nodes, ntasks, req_mem, req_time - from the sbatch line
+    submit, start, end, queue_wait, wall_time,
+    max_rss, state                              - from sacct
+    gs_error                                    - from C1stdout
+The sbatch line is submit_command in the folder, or <name>_command next to
+the <name>_folders.txt map for job array tasks. The job is the one in
+array_id.txt or job_id.txt if there is one, the one of the slurm-<id>.out
+filed with an iteration, and otherwise the latest sacct job whose working
+directory is the folder. The stage is taken from the job name, else from
+the folder name (scan<i>_<task>, *_stab, ...), else from C1input.
+Harvesting again updates rows. Times are in seconds and memory in MB.
+
+    from ledger import harvest, query
+    harvest(['158103.03796','158103.04000'], db='runs.db')
+    query('runs.db', stage='stability', machine='DIII-D')
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import re
+import glob
+import sqlite3
+from datetime import datetime, timedelta
+
+from smb import smb_counts
+from slurm import sacct_jobs, slurm_states, time_seconds
+from registry import mesh_machines
+
+db_name = 'autoC1_runs.db'
+
+columns = [('folder','TEXT'), ('jobid','TEXT'), ('machine','TEXT'),
+           ('stage','TEXT'), ('mesh','TEXT'), ('nelms','INTEGER'),
+           ('ntor','INTEGER'), ('nflu','INTEGER'), ('partition','TEXT'),
+           ('nodes','INTEGER'), ('ntasks','INTEGER'), ('req_mem','REAL'),
+           ('req_time','INTEGER'), ('submit','TEXT'), ('start','TEXT'),
+           ('end','TEXT'), ('queue_wait','INTEGER'), ('wall_time','INTEGER'),
+           ('max_rss','REAL'), ('state','TEXT'), ('gs_error','REAL'),
+           ('submit_command','TEXT'), ('harvested','TEXT')]
+
+sacct_fields = ['JobID','WorkDir','State','Submit','Start','End',
+                'ElapsedRaw','MaxRSS']
+
+# job names given in slurm_options
+job_stages = {'m3dc1_efit':'efit',
+              'm3dc1_eq':'uni_equil',
+              'm3dc1_adapt':'adapt',
+              'm3dc1_equil':'equilibrium',
+              'm3dc1_stab':'stability'}
+
+# run folder names, e.g. rw1_equil, eb1_1f_stab, scan2_stability
+folder_stages = [(r'^uni_efit$','efit'), (r'^uni_equil$','uni_equil'),
+                 (r'^iter_\d+$','uni_equil'), (r'^scan\d+_(\w+)$',None),
+                 (r'_adapt$','adapt'), (r'_equil$','equilibrium'),
+                 (r'_stab$','stability')]
+
+gs_pattern = 'Final error in GS solution'
+
+
+def harvest(roots, db=db_name, start=None):
+    """
+    Add or update the ledger rows of every run folder under roots.
+    sacct is asked for jobs since start (default: a day before the oldest
+    folder). Returns the number of rows written.
+    """
+
+    runs = []
+    for root in roots:
+        runs += find_runs(root)
+    if len(runs) == 0:
+        return 0
+
+    if start is None:
+        oldest = min(os.path.getmtime(run['workdir']+'/C1input') for run in runs)
+        start = (datetime.fromtimestamp(oldest) - timedelta(days=1))
+        start = start.strftime('%Y-%m-%dT%H:%M:%S')
+    jobs = collect_jobs(sacct_jobs(sacct_fields, start=start))
+
+    # folder -> latest job run there that no iteration claims, for folders
+    # without an id file
+    claimed = set(run['jobid'] for run in runs)
+    by_folder = {}
+    for jobid, job in jobs.items():
+        if (job['WorkDir'] is not None) and (jobid not in claimed):
+            by_folder.setdefault(job['WorkDir'],[]).append(jobid)
+
+    rows = []
+    now = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+    for run in runs:
+        jobid = run['jobid']
+        if (jobid is None) and (run['folder'] in by_folder):
+            jobid = max(by_folder[run['folder']], key=_job_order)
+        row = run_row(run, jobs.get(jobid))
+        row['jobid'] = jobid
+        row['harvested'] = now
+        rows.append(row)
+
+    with connect(db) as con:
+        # NULL job ids never conflict, so replace those rows by hand
+        con.executemany('DELETE FROM runs WHERE folder = ? AND jobid IS NULL',
+                        [(row['folder'],) for row in rows])
+        names = [c for c, _ in columns]
+        con.executemany('INSERT OR REPLACE INTO runs ('+','.join(names)+
+                        ') VALUES ('+','.join('?'*len(names))+')',
+                        [[row.get(c) for c in names] for row in rows])
+    con.close()
+    print('Recorded '+str(len(rows))+' runs in '+db)
+    return len(rows)
+
+
+def connect(db=db_name):
+
+    con = sqlite3.connect(db)
+    con.execute('CREATE TABLE IF NOT EXISTS runs ('+
+                ', '.join(c+' '+t for c, t in columns)+
+                ', PRIMARY KEY (folder, jobid))')
+    return con
+
+
+def query(db=db_name, **where):
+    """
+    Ledger rows as [{column:value},...], e.g. query(db,stage='stability')
+    """
+
+    con = connect(db)
+    con.row_factory = sqlite3.Row
+    sql = 'SELECT * FROM runs'
+    if len(where) > 0:
+        sql += ' WHERE '+' AND '.join(k+' = ?' for k in where)
+    sql += ' ORDER BY submit'
+    rows = [dict(r) for r in con.execute(sql, list(where.values()))]
+    con.close()
+    return rows
+
+
+def stage_summary(db=db_name):
+    """
+    Number of runs and mean queue wait, wall time, and peak memory for
+    each machine and stage of completed runs
+    """
+
+    con = connect(db)
+    rows = con.execute('SELECT machine, stage, COUNT(*), AVG(queue_wait), '
+                       'AVG(wall_time), MAX(max_rss) FROM runs '
+                       "WHERE state = 'COMPLETED' "
+                       'GROUP BY machine, stage ORDER BY machine, stage'
+                       ).fetchall()
+    con.close()
+
+    print('%-10s %-12s %6s %12s %12s %10s'%('machine','stage','runs',
+                                             'wait [s]','wall [s]','rss [MB]'))
+    for machine, stage, n, wait, wall, rss in rows:
+        print('%-10s %-12s %6d %12.0f %12.0f %10.0f'
+              %(machine or '-', stage or '-', n, wait or 0, wall or 0, rss or 0))
+    return rows
+
+
+def find_runs(root):
+    """
+    Run folders under root as [{'folder','workdir','jobid','submit_command'},...]
+    where workdir holds the C1input (the parent of an iter_<i> folder)
+    """
+
+    root = os.path.abspath(root)
+
+    # array tasks have their sbatch line in the submit directory
+    array_commands = {}
+    for map_file in glob.glob(os.path.join(root,'**','*_folders.txt'),
+                              recursive=True):
+        command = map_file[:-len('_folders.txt')]+'_command'
+        if not os.path.exists(command):
+            continue
+        line = _first_line(command)
+        with open(map_file,'r') as h:
+            for entry in h:
+                if '\t' in entry:
+                    array_commands[entry.rstrip('\n').split('\t',1)[1]] = line
+
+    runs = []
+    for c1input in sorted(glob.glob(os.path.join(root,'**','C1input'),
+                                    recursive=True)):
+        folder = os.path.dirname(c1input)
+        if not os.path.exists(folder+'/batch_slurm'):
+            continue
+        command = None
+        if os.path.exists(folder+'/submit_command'):
+            command = _first_line(folder+'/submit_command')
+        command = array_commands.get(folder, command)
+        jobid = None
+        for f in ['array_id.txt','job_id.txt']:
+            if os.path.exists(folder+'/'+f):
+                jobid = _first_line(folder+'/'+f)
+                break
+
+        # every uni_equil iteration is a run of its own
+        iters = sorted((d for d in glob.glob(folder+'/iter_*')
+                        if re.match(r'iter_\d+$', os.path.basename(d))),
+                       key=_job_order)
+        for d in iters:
+            runs.append({'folder':d, 'workdir':folder, 'jobid':output_job(d),
+                         'submit_command':command})
+        # the folder itself only while an iteration is still in it
+        if (len(iters) == 0) or os.path.exists(folder+'/C1stdout'):
+            runs.append({'folder':folder, 'workdir':folder, 'jobid':jobid,
+                         'submit_command':command})
+    return runs
+
+
+def output_job(folder):
+    """
+    Job id of the latest slurm-<id>.out in folder, or None
+    """
+
+    ids = [m.group(1) for m in (re.match(r'slurm-(\d+(?:_\d+)?)\.out$', os.path.basename(f))
+                                for f in glob.glob(folder+'/slurm-*.out'))
+           if m is not None]
+    if len(ids) == 0:
+        return None
+    return max(ids, key=_job_order)
+
+
+def collect_jobs(records):
+    """
+    {jobid:job} from sacct records, with the job steps folded into their
+    job (peak MaxRSS over the steps)
+    """
+
+    jobs = {}
+    for rec in records:
+        jobid, _, step = rec['JobID'].partition('.')
+        if step == '':
+            job = jobs.setdefault(jobid, {'max_rss':None})
+            job.update(rec)
+            job['WorkDir'] = rec['WorkDir'] or None
+        else:
+            job = jobs.setdefault(jobid, {'max_rss':None, 'WorkDir':None})
+            rss = _megabytes(rec['MaxRSS'])
+            if (rss is not None) and ((job['max_rss'] is None) or (rss > job['max_rss'])):
+                job['max_rss'] = rss
+    return jobs
+
+
+def run_row(run, job):
+
+    folder = run['folder']
+    workdir = run.get('workdir', folder)
+    C1input = _read_C1input(workdir+'/C1input')
+    row = {'folder':folder, 'submit_command':run['submit_command']}
+
+    # the adapted mesh if there is one, otherwise the uniform mesh
+    meshes = sorted(glob.glob(workdir+'/*0.smb'))
+    if workdir+'/adapted0.smb' in meshes:
+        meshes = [workdir+'/adapted0.smb']
+    if len(meshes) > 0:
+        counts = smb_counts(meshes[0])
+        row['mesh'] = os.path.basename(meshes[0])
+        row['nelms'] = counts['triangle'] + counts['quad']
+    row['ntor'] = _int(C1input.get('ntor'))
+    row['nflu'] = 2 if C1input.get('db_fac','').strip() == '1.0' else 1
+    row['machine'] = machine_of(C1input.get('mesh_model','').strip("'\""))
+
+    options = {}
+    for word in (run['submit_command'] or '').split():
+        key, _, val = word.partition('=')
+        options[key] = val
+    row['stage'] = stage_of(options.get('--job-name'), C1input, folder=folder)
+    row['partition'] = options.get('--partition', options.get('--qos'))
+    row['nodes'] = _int(options.get('--nodes'))
+    row['ntasks'] = _int(options.get('--ntasks'))
+    if '--mem' in options:
+        row['req_mem'] = _megabytes(options['--mem']+'M')
+    elif ('--mem-per-cpu' in options) and (row['ntasks'] is not None):
+        row['req_mem'] = _megabytes(options['--mem-per-cpu']+'M')*row['ntasks']
+    row['req_time'] = time_seconds(options.get('--time'))
+
+    if job is not None:
+        row['submit'] = _timestamp(job.get('Submit'))
+        row['start'] = _timestamp(job.get('Start'))
+        row['end'] = _timestamp(job.get('End'))
+        if (row['submit'] is not None) and (row['start'] is not None):
+            row['queue_wait'] = int((_datetime(row['start']) -
+                                     _datetime(row['submit'])).total_seconds())
+        row['wall_time'] = _int(job.get('ElapsedRaw'))
+        row['max_rss'] = job['max_rss']
+        state = (job.get('State') or '').split(' ')[0].rstrip('+')
+        row['state'] = slurm_states.get(state, state or None)
+
+    row['gs_error'] = gs_error(folder+'/C1stdout')
+    return row
+
+
+def stage_of(job_name, C1input, folder=''):
+
+    if job_name in job_stages:
+        return job_stages[job_name]
+    # the folder or its parent, e.g. scan2_stability/case_003
+    for name in reversed(os.path.normpath(folder).split(os.sep)[-2:]):
+        for pattern, stage in folder_stages:
+            m = re.search(pattern, name)
+            if m is not None:
+                return stage or m.group(1)
+    if C1input.get('iadapt') == '1':
+        return 'adapt'
+    if C1input.get('igs') == '0':
+        return 'efit'
+    # response runs are named after their coil
+    if C1input.get('irmp') == '1' or C1input.get('iread_ext_field') == '1':
+        return 'response'
+    return None
+
+
+def machine_of(mesh_model):
+    """
+    Machine whose uniform mesh model is mesh_model, if only one has it
+    """
+
+    if (os.environ.get('AUTOC1_HOME') is None) or (mesh_model == ''):
+        return None
+    found = mesh_machines(mesh_model)
+    if len(found) != 1:
+        return None
+    return found[0]
+
+
+def gs_error(filename):
+    """
+    Last 'Final error in GS solution' value in C1stdout, or None
+    """
+
+    if not os.path.exists(filename):
+        return None
+    error = None
+    with open(filename,'r',errors='replace') as h:
+        for line in h:
+            if gs_pattern in line:
+                values = re.findall(r'[-+]?\d*\.?\d+(?:[eEdD][-+]?\d+)?', line)
+                if len(values) > 0:
+                    error = float(values[-1].replace('D','E').replace('d','e'))
+    return error
+
+
+def _read_C1input(filename):
+
+    C1input = {}
+    with open(filename,'r') as h:
+        for line in h:
+            spl = line.split('=',1)
+            if len(spl) == 2:
+                C1input[spl[0].strip()] = spl[1].split('!',1)[0].strip()
+    return C1input
+
+
+def _first_line(filename):
+    with open(filename,'r') as h:
+        return h.readline().strip()
+
+
+def _job_order(jobid):
+    # numeric order of '1234', '1234_5'
+    return [int(p) for p in re.findall(r'\d+', jobid)]
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _megabytes(value):
+    # sacct/sbatch memory such as 1234K, 120000M, 4000Mc, 2.5G
+    m = re.match(r'([\d.]+)([KMGT]?)', value or '')
+    if m is None:
+        return None
+    scale = {'':1./1024**2, 'K':1./1024, 'M':1., 'G':1024., 'T':1024.**2}
+    return float(m.group(1))*scale[m.group(2)]
+
+
+def _timestamp(value):
+    if (value is None) or (value in ['','Unknown','None']):
+        return None
+    return value
+
+
+def _datetime(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S')
@@ -0,0 +1,538 @@
+# -*- coding: utf-8 -*-
+"""
+local_cluster
+
+A Slurm stand-in that runs batch jobs as local subprocesses, so the whole
+autoC1 chain can run (and its orchestration be timed) on a laptop with the
+mock M3D-C1 tools in $AUTOC1_HOME/mock/
+
+Select it with AUTOC1_BACKEND=local (or slurm.set_backend('local')); sbatch,
+job_state, sacct_jobs, and scancel in slurm then go to a LocalCluster in
+this process instead of the Slurm commands. The cluster understands the
+sbatch options autoC1 uses:
+    --ntasks     - $SLURM_NTASKS of the job (default 1)
+    --job-name   - $SLURM_JOB_NAME and the JobName in sacct
+    --array      - tasks J_0, J_1, ... ('0-N%M', '1,3,5'), with
+                   $SLURM_ARRAY_JOB_ID and $SLURM_ARRAY_TASK_ID
+    --dependency - afterok:/afterany: job ids; a job whose afterok
+                   dependency failed is cancelled
+and ignores the others. A job waits queue_delay seconds (a number, or
+[min, max] for a uniformly random delay) after submission, then starts once
+its dependencies are met and fewer than max_running jobs run, and runs its
+script with the interpreter of its #! line in the submit folder, with
+output in slurm-<jobid>.out. The mock/ folder is put first on its PATH, so
+srun, mpiexec, part_mesh.sh, and m3dc1_2d are the mocks (see mock_c1).
+
+    AUTOC1_QUEUE_DELAY  - queue_delay, e.g. '2' or '1:5' (default 0)
+    AUTOC1_MAX_RUNNING  - max_running (default 4 per CPU)
+    AUTOC1_SPOOL        - folder of the job id counter and the accounting
+                          of finished jobs (default <tmp>/autoC1_local_<user>)
+
+Job ids are unique across processes through the spool folder, and finished
+jobs stay known to job_state and sacct_jobs in later processes. The cluster
+lives in the submitting process, so on exit that process waits for the jobs
+it still has queued or running (e.g., after dag_submit.submit_chain).
+
+    from local_cluster import LocalCluster
+    import slurm
+    cluster = slurm.set_backend(LocalCluster(queue_delay=0.1))
+    ...
+    cluster.wait_idle()
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import re
+import json
+import heapq
+import fcntl
+import atexit
+import signal
+import random
+import getpass
+import tempfile
+import threading
+from time import time, strftime, localtime
+from collections import deque
+from subprocess import Popen, STDOUT, CalledProcessError
+
+mock_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'mock')
+accounting_name = 'accounting.jsonl'
+counter_name = 'next_id'
+id_block = 100
+
+# job states reported, as Slurm names them
+PENDING   = 'PENDING'
+RUNNING   = 'RUNNING'
+COMPLETED = 'COMPLETED'
+FAILED    = 'FAILED'
+CANCELLED = 'CANCELLED'
+
+
+class LocalCluster(object):
+    """
+    Queue of local batch jobs. sbatch/state/sacct/scancel take and return
+    the text of the Slurm commands of the same names, for slurm.py.
+    """
+
+    def __init__(self, queue_delay=0., max_running=None, spool=None,
+                 mock=mock_folder):
+
+        if isinstance(queue_delay, (int, float)):
+            queue_delay = [queue_delay, queue_delay]
+        self.queue_delay = [float(d) for d in queue_delay]
+        if max_running is None:
+            max_running = 4*(os.cpu_count() or 1)
+        self.max_running = int(max_running)
+        if spool is None:
+            spool = os.path.join(tempfile.gettempdir(),'autoC1_local_'+getpass.getuser())
+        if not os.path.isdir(spool):
+            os.makedirs(spool, exist_ok=True)
+        self.spool = spool
+        self.mock = mock
+
+        self.jobs = {}              # job id -> job (array tasks as J_i)
+        self.arrays = {}            # array job id -> [task ids]
+        self._delayed = []          # heap of (eligible time, seq, job id)
+        self._ready = deque()       # job ids that may start
+        self._blocked = {}          # job id -> job ids waiting for it
+        self._limited = {}          # array job id -> tasks over its %M limit
+        self._done = deque()        # finished job ids to be handled
+        self._running = 0
+        self._active = 0            # jobs not finished
+        self._seq = 0
+        self._ids = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        atexit.register(self._at_exit)
+
+    @classmethod
+    def from_env(cls):
+        """
+        A LocalCluster configured by AUTOC1_QUEUE_DELAY, AUTOC1_MAX_RUNNING,
+        and AUTOC1_SPOOL
+        """
+
+        delay = os.environ.get('AUTOC1_QUEUE_DELAY','0')
+        delay = [float(d) for d in delay.split(':')]
+        max_running = os.environ.get('AUTOC1_MAX_RUNNING')
+        if max_running is not None:
+            max_running = int(max_running)
+        return cls(queue_delay=delay if len(delay) == 2 else delay[0],
+                   max_running=max_running,
+                   spool=os.environ.get('AUTOC1_SPOOL'))
+
+    def sbatch(self, submit_batch, folder='.'):
+        """
+        Queue the job of an sbatch command run in folder and return what
+        sbatch prints. A missing script raises CalledProcessError.
+        """
+
+        options, script = _parse_sbatch(submit_batch)
+        folder = os.path.abspath(folder)
+        path = os.path.join(folder, script)
+        if not os.path.isfile(path):
+            raise CalledProcessError(1, submit_batch,
+                                     output=b'sbatch: error: Unable to open file '
+                                     +script.encode())
+        jobid = self._new_id()
+        base = {'name':options.get('job-name', os.path.basename(script)),
+                'folder':folder,
+                'script':path,
+                'ntasks':int(options.get('ntasks', 1)),
+                'after':_dependencies(options.get('dependency','')),
+                'submit':time(),
+                'start':None,
+                'end':None,
+                'exit':None,
+                'state':PENDING,
+                'proc':None}
+
+        with self._cond:
+            head = self._delayed[0] if len(self._delayed) > 0 else None
+            if 'array' in options:
+                indices, limit = _array_indices(options['array'])
+                self.arrays[jobid] = []
+                for i in indices:
+                    job = dict(base, id=jobid+'_'+str(i), array=jobid,
+                               task=i, limit=limit)
+                    self._queue(job)
+                    self.arrays[jobid].append(job['id'])
+            else:
+                self._queue(dict(base, id=jobid, array=None, task=None,
+                                 limit=None))
+            self._start_thread()
+            # the scheduler only needs waking if this job is due first
+            if self._delayed[0] is not head:
+                self._cond.notify()
+        return 'Submitted batch job '+jobid+'\n'
+
+    def state(self, jobid):
+        """
+        Slurm state of a job or job array ('' if unknown), as squeue prints
+        it. An array is RUNNING or PENDING while any task is, then FAILED
+        or CANCELLED if any task was, else COMPLETED.
+        """
+
+        jobid = str(jobid)
+        with self._cond:
+            if jobid in self.arrays:
+                states = [self.jobs[t]['state'] for t in self.arrays[jobid]]
+            elif jobid in self.jobs:
+                states = [self.jobs[jobid]['state']]
+            else:
+                states = None
+        if states is None:
+            states = [r['State'] for r in self._accounting()
+                      if (r['JobID'] == jobid) or
+                      (r['JobID'].split('_')[0] == jobid)]
+        return _combine(states)
+
+    def sacct(self, fields, start=None, jobids=None):
+        """
+        sacct -n -P output of fields for the jobs (finished ones from the
+        accounting of every process, the others from this one) submitted
+        since start, or for jobids
+        """
+
+        records = dict((r['JobID'], r) for r in self._accounting())
+        with self._cond:
+            for job in self.jobs.values():
+                records[job['id']] = _record(job)
+        if jobids is not None:
+            jobids = set(str(j) for j in jobids)
+            records = dict((k, r) for k, r in records.items()
+                           if (k in jobids) or (k.split('_')[0] in jobids))
+        if start is not None:
+            records = dict((k, r) for k, r in records.items()
+                           if r['Submit'] >= start)
+        lines = ['|'.join(str(r.get(f,'')) for f in fields)
+                 for k, r in sorted(records.items(), key=lambda kr: _order(kr[0]))]
+        return ''.join(line+'\n' for line in lines)
+
+    def scancel(self, jobid):
+        """
+        Cancel a job, an array (all its tasks), or an array task J_i.
+        Running jobs get SIGTERM in their whole process group.
+        """
+
+        jobid = str(jobid)
+        with self._cond:
+            ids = self.arrays.get(jobid, [jobid] if jobid in self.jobs else [])
+            for i in ids:
+                job = self.jobs[i]
+                if job['state'] == PENDING:
+                    self._finish(job, CANCELLED)
+                elif job['state'] == RUNNING:
+                    # a job that is still starting is killed once it has
+                    job['cancel'] = True
+                    if job['proc'] is not None:
+                        _kill(job['proc'])
+            self._cond.notify()
+        return 0
+
+    def wait_idle(self, timeout=None):
+        """
+        Wait until every job has finished. Returns False on timeout.
+        """
+
+        end = None if timeout is None else time()+timeout
+        with self._cond:
+            while self._active > 0:
+                left = None if end is None else end-time()
+                if (left is not None) and (left <= 0.):
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def counts(self):
+        """
+        {state: number of jobs}
+        """
+        with self._cond:
+            out = {}
+            for job in self.jobs.values():
+                out[job['state']] = out.get(job['state'],0) + 1
+            return out
+
+    # -- scheduling, all under self._cond --
+
+    def _queue(self, job):
+        self.jobs[job['id']] = job
+        self._active += 1
+        lo, hi = self.queue_delay
+        delay = lo if hi <= lo else random.uniform(lo, hi)
+        self._seq += 1
+        heapq.heappush(self._delayed, (job['submit']+delay, self._seq, job['id']))
+
+    def _start_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._schedule,
+                                            name='local_cluster', daemon=True)
+            self._thread.start()
+
+    def _schedule(self):
+        with self._cond:
+            while True:
+                while len(self._done) > 0:
+                    self._release(self._done.popleft())
+                now = time()
+                while (len(self._delayed) > 0) and (self._delayed[0][0] <= now):
+                    jobid = heapq.heappop(self._delayed)[2]
+                    self._eligible(self.jobs[jobid])
+                self._start_ready()
+                wait = None
+                if len(self._delayed) > 0:
+                    wait = max(self._delayed[0][0] - time(), 0.)
+                if (len(self._done) == 0) and ((wait is None) or (wait > 0.)):
+                    self._cond.wait(wait)
+
+    def _eligible(self, job):
+        # queue delay is over: wait for the dependencies, or get ready
+        if job['state'] != PENDING:
+            return
+        waiting = []
+        for dep, kind in job['after']:
+            state = self._dep_state(dep)
+            if state in [None, PENDING, RUNNING]:
+                if state is not None:
+                    waiting.append(dep)
+            elif (kind == 'afterok') and (state != COMPLETED):
+                self._finish(job, CANCELLED)
+                return
+        if len(waiting) > 0:
+            job['waiting'] = set(waiting)
+            for dep in waiting:
+                self._blocked.setdefault(dep, []).append(job['id'])
+        else:
+            self._ready.append(job['id'])
+
+    def _dep_state(self, dep):
+        if dep in self.arrays:
+            return _combine([self.jobs[t]['state'] for t in self.arrays[dep]]) or None
+        if dep in self.jobs:
+            return self.jobs[dep]['state']
+        return _combine([r['State'] for r in self._accounting()
+                         if r['JobID'].split('_')[0] == dep]) or None
+
+    def _start_ready(self):
+        while (self._running < self.max_running) and (len(self._ready) > 0):
+            job = self.jobs[self._ready.popleft()]
+            if job['state'] != PENDING:
+                continue
+            if (job['limit'] is not None) and \
+               (self._array_running(job['array']) >= job['limit']):
+                self._limited.setdefault(job['array'], deque()).append(job['id'])
+                continue
+            self._start(job)
+
+    def _array_running(self, array):
+        return sum(1 for t in self.arrays[array] if self.jobs[t]['state'] == RUNNING)
+
+    def _start(self, job):
+        env = dict(os.environ)
+        if self.mock is not None:
+            env['PATH'] = self.mock+os.pathsep+env.get('PATH','')
+        env.update({'SLURM_JOB_ID':job['id'] if job['array'] is None else job['array'],
+                    'SLURM_JOB_NAME':job['name'],
+                    'SLURM_NTASKS':str(job['ntasks']),
+                    'SLURM_SUBMIT_DIR':job['folder']})
+        if job['array'] is None:
+            out = 'slurm-'+job['id']+'.out'
+        else:
+            env['SLURM_ARRAY_JOB_ID'] = job['array']
+            env['SLURM_ARRAY_TASK_ID'] = str(job['task'])
+            out = 'slurm-'+job['array']+'_'+str(job['task'])+'.out'
+
+        job['state'] = RUNNING
+        job['start'] = time()
+        self._running += 1
+        threading.Thread(target=self._run, args=(job, env, out),
+                         daemon=True).start()
+
+    def _run(self, job, env, out):
+        # start the job outside the lock, so sbatch is not held up by forks
+        try:
+            with open(os.path.join(job['folder'],out),'w') as h:
+                proc = Popen(_interpreter(job['script'])+[job['script']],
+                             cwd=job['folder'], env=env, stdout=h,
+                             stderr=STDOUT, start_new_session=True)
+        except OSError:
+            with self._cond:
+                self._running -= 1
+                self._finish(job, FAILED)
+            return
+        with self._cond:
+            job['proc'] = proc
+            cancel = job.get('cancel')
+        if cancel:
+            _kill(proc)
+
+        code = proc.wait()
+        with self._cond:
+            self._running -= 1
+            job['exit'] = code
+            if job.get('cancel'):
+                self._finish(job, CANCELLED)
+            else:
+                self._finish(job, COMPLETED if code == 0 else FAILED)
+
+    def _finish(self, job, state):
+        job['state'] = state
+        job['end'] = time()
+        self._active -= 1
+        job['proc'] = None
+        self._done.append(job['id'])
+        self._log(job)
+        self._cond.notify_all()
+
+    def _release(self, jobid):
+        # a job ended: its array may take another task, waiting jobs may go
+        job = self.jobs[jobid]
+        if job['array'] is not None:
+            limited = self._limited.get(job['array'])
+            if limited:
+                self._ready.appendleft(limited.popleft())
+        deps = [jobid]
+        if (job['array'] is not None) and \
+           (self._dep_state(job['array']) not in [PENDING, RUNNING]):
+            deps.append(job['array'])
+        for dep in deps:
+            for waiter in self._blocked.pop(dep, []):
+                w = self.jobs[waiter]
+                w['waiting'].discard(dep)
+                if (len(w['waiting']) == 0) and (w['state'] == PENDING):
+                    self._eligible(w)
+
+    # -- job ids and accounting shared through the spool folder --
+
+    def _new_id(self):
+        # ids are taken from the shared counter id_block at a time
+        if len(self._ids) == 0:
+            filename = os.path.join(self.spool, counter_name)
+            with open(filename,'a+') as h:
+                fcntl.flock(h, fcntl.LOCK_EX)
+                h.seek(0)
+                text = h.read().strip()
+                first = int(text) if text.isdigit() else 1000
+                h.seek(0)
+                h.truncate()
+                h.write(str(first+id_block))
+            self._ids = deque(range(first, first+id_block))
+        return str(self._ids.popleft())
+
+    def _log(self, job):
+        with open(os.path.join(self.spool, accounting_name),'a') as h:
+            h.write(json.dumps(_record(job))+'\n')
+
+    def _accounting(self):
+        filename = os.path.join(self.spool, accounting_name)
+        if not os.path.exists(filename):
+            return []
+        with open(filename,'r') as h:
+            return [json.loads(line) for line in h if line.strip() != '']
+
+    def _at_exit(self):
+        if self._active > 0:
+            print('Waiting for %d local jobs to finish'%self._active)
+            self.wait_idle()
+
+
+def _parse_sbatch(submit_batch):
+    # {option: value} and the script of an sbatch command
+    options = {}
+    args = list(submit_batch[1:])
+    short = {'-J':'job-name', '-n':'ntasks', '-a':'array', '-d':'dependency'}
+    while len(args) > 0:
+        arg = args.pop(0)
+        if arg.startswith('--'):
+            name, _, value = arg[2:].partition('=')
+            options[name] = value
+        elif arg.startswith('-'):
+            value = args.pop(0) if len(arg) == 2 else arg[2:]
+            options[short.get(arg[:2], arg[1:2])] = value
+        else:
+            return options, arg
+    raise CalledProcessError(1, submit_batch, output=b'sbatch: error: no batch script')
+
+
+def _dependencies(text):
+    # [(job id, 'afterok' or 'afterany'),...] from afterok:1:2,afterany:3
+    deps = []
+    for part in re.split('[,?]', text):
+        words = part.split(':')
+        if len(words) > 1:
+            deps += [(j, words[0]) for j in words[1:] if j != '']
+    return deps
+
+
+def _array_indices(text):
+    # task indices and %M limit of --array
+    limit = None
+    if '%' in text:
+        text, limit = text.split('%')
+        limit = int(limit)
+    indices = []
+    for part in text.split(','):
+        m = re.match(r'(\d+)(?:-(\d+)(?::(\d+))?)?$', part)
+        if m is None:
+            raise CalledProcessError(1, ['sbatch'], output=b'sbatch: error: invalid array '+text.encode())
+        first = int(m.group(1))
+        last = int(m.group(2)) if m.group(2) else first
+        step = int(m.group(3)) if m.group(3) else 1
+        indices += list(range(first, last+1, step))
+    return indices, limit
+
+
+def _interpreter(script):
+    with open(script,'r') as h:
+        first = h.readline()
+    if first.startswith('#!'):
+        return first[2:].split()
+    return ['/bin/sh']
+
+
+def _kill(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except OSError:
+        pass
+
+
+def _combine(states):
+    if len(states) == 0:
+        return ''
+    for state in [RUNNING, PENDING, FAILED, CANCELLED]:
+        if state in states:
+            return state
+    return COMPLETED
+
+
+def _record(job):
+    elapsed = 0
+    if job['start'] is not None:
+        elapsed = int(round((job['end'] or time()) - job['start']))
+    return {'JobID':job['id'],
+            'JobName':job['name'],
+            'WorkDir':job['folder'],
+            'State':job['state'],
+            'Submit':_time(job['submit']),
+            'Start':_time(job['start']),
+            'End':_time(job['end']),
+            'ElapsedRaw':elapsed,
+            'Elapsed':'%02d:%02d:%02d'%(elapsed//3600, elapsed//60%60, elapsed%60),
+            'NTasks':job['ntasks'],
+            'ExitCode':'' if job['exit'] is None else '%d:0'%max(job['exit'],0),
+            'MaxRSS':''}
+
+
+def _time(t):
+    if t is None:
+        return 'Unknown'
+    return strftime('%Y-%m-%dT%H:%M:%S', localtime(t))
+
+
+def _order(jobid):
+    parts = jobid.split('_')
+    return tuple(int(p) for p in parts if p.isdigit())
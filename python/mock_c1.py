@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+mock_c1
+
+Stand-in for m3dc1_2d and m3dc1_2d_complex (mock/m3dc1_2d), used with the
+local backend (local_cluster) to run the autoC1 chain without M3D-C1
+
+The run is read from C1input in the current folder and writes what autoC1
+looks for, on a small structured mesh:
+    iadapt = 1    - adapted0.smb (a copy of the uniform mesh)
+    real runs     - C1stdout with GS iterations and the final GS error,
+                    C1.h5 and time_000.h5 with an analytic equilibrium
+                    (psi = (R-R0)^2 + (Z/kappa)^2, linear den/te/ti/p in
+                    psi), and current.dat.out if there is a current.dat
+    complex runs  - C1.h5 with kinetic energy traces growing at rate
+                    gamma = growth*ntor, scaled down by rescale each time
+                    they exceed max_ke (if set, as in stability runs), and
+                    the n = ntor response psi (scaled by the total of
+                    |rmp_current.dat|) in time_001
+current.dat.out moves the currents of current.dat a fraction gain towards
+fixed target currents 1500*k (k = 1, 2, ...), so the uni_equil iteration
+converges like a contraction.
+
+Set in the environment of the jobs:
+    AUTOC1_MOCK_TIME - seconds each run takes (default 0)
+    AUTOC1_MOCK_FAIL - probability that a run fails without output (default 0)
+    AUTOC1_MOCK_GAIN - gain of the current.dat update (default 0.2)
+    AUTOC1_MOCK_GROWTH - growth rate per unit ntor (default 1e-3)
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import sys
+import random
+import shutil
+from time import sleep
+
+import numpy as np
+import h5py
+
+from namelist import read_namelist
+from current_iter import read_currents, write_currents
+
+# plasma of the analytic equilibrium and its mesh
+R0 = 1.7
+minor = 0.6
+kappa = 1.8
+rrange = [1.0, 2.4]
+zrange = [-1.2, 1.2]
+nr, nz = 16, 24
+growth = 1e-3
+rescale = 1e-4
+gs_iters = 8
+
+
+def main(argv=sys.argv):
+
+    program = os.path.basename(argv[0])
+    runtime = float(os.environ.get('AUTOC1_MOCK_TIME','0'))
+    fail = float(os.environ.get('AUTOC1_MOCK_FAIL','0'))
+    gain = float(os.environ.get('AUTOC1_MOCK_GAIN','0.2'))
+    rate = float(os.environ.get('AUTOC1_MOCK_GROWTH',str(growth)))
+
+    if not os.path.exists('C1input'):
+        print(program+': no C1input')
+        return 1
+    nl = read_namelist('C1input')
+
+    if (fail > 0.) and (random.random() < fail):
+        sleep(runtime)
+        print(program+': mock failure')
+        return 1
+
+    if _value(nl,'iadapt','0') == '1':
+        sleep(runtime)
+        return adapt(_value(nl,'mesh_filename','').strip("'\""))
+
+    ntor = int(_value(nl,'ntor','0'))
+    steps = gs_iters if _value(nl,'itime_independent','1') == '1' else 0
+    with open('C1stdout','w') as h:
+        for i in range(steps):
+            sleep(runtime/max(steps,1))
+            h.write(' GS iteration %3d   error %12.5E\n'%(i+1, 10.**(-i-1)))
+            h.flush()
+        if steps > 0:
+            h.write(' Final error in GS solution:  %12.5E\n'%10.**(-steps))
+        else:
+            sleep(runtime)
+
+    if program.endswith('_complex') or (ntor != 0):
+        write_linear('C1.h5', ntor, int(_value(nl,'ntimemax','100')),
+                     float(_value(nl,'dt','1.0')), growth=rate,
+                     max_ke=float(_value(nl,'max_ke','0')))
+    else:
+        write_equilibrium('C1.h5')
+    shutil.copy('C1.h5','time_000.h5')
+
+    if steps > 0 and os.path.exists('current.dat'):
+        x = read_currents('current.dat')
+        target = 1500.*np.arange(1, len(x)+1)
+        write_currents('current.dat.out', x + gain*(target - x),
+                       like='current.dat')
+    return 0
+
+
+def adapt(mesh):
+    """
+    Write adapted0.smb from the uniform mesh (its partition 0 file)
+    """
+
+    for name in [mesh[:-len('.smb')]+'0.smb', mesh]:
+        if name.endswith('.smb') and os.path.exists(name):
+            shutil.copyfile(name,'adapted0.smb')
+            return 0
+    print('m3dc1_2d: no mesh '+mesh)
+    return 1
+
+
+def elements():
+    """
+    Elements (a, b, c, theta, x, z, 0) of a structured triangular mesh
+    """
+
+    R = np.linspace(rrange[0], rrange[1], nr+1)
+    Z = np.linspace(zrange[0], zrange[1], nz+1)
+    i, j = [k.ravel() for k in np.meshgrid(np.arange(nr), np.arange(nz), indexing='ij')]
+    corners = [np.stack([R[i+di], Z[j+dj]], axis=1)
+               for di, dj in [(0,0),(1,0),(1,1),(0,1)]]
+    P1 = np.concatenate([corners[0], corners[0]])
+    P2 = np.concatenate([corners[1], corners[2]])
+    P3 = np.concatenate([corners[2], corners[3]])
+
+    L = np.linalg.norm(P2-P1, axis=1)
+    e = (P2-P1)/L[:,None]
+    b = np.sum((P3-P1)*e, axis=1)
+    c = e[:,0]*(P3-P1)[:,1] - e[:,1]*(P3-P1)[:,0]
+    theta = np.arctan2(e[:,1], e[:,0])
+    return np.stack([L-b, b, c, theta, P1[:,0], P1[:,1], np.zeros(len(L))], axis=1)
+
+
+def psi_coefs(el):
+    """
+    Quintic coefficients of psi = (R-R0)^2 + (Z/kappa)^2 in every element
+    """
+
+    b, theta, x, z = el[:,1], el[:,3], el[:,4], el[:,5]
+    co, sn = np.cos(theta), np.sin(theta)
+    q = 1./kappa**2
+    # R - R0 = u + co*xi - sn*eta, Z = v + sn*xi + co*eta
+    u = x + b*co - R0
+    v = z + b*sn
+    coefs = np.zeros((len(el), 20))
+    coefs[:,0] = u**2 + q*v**2
+    coefs[:,1] = 2.*u*co + 2.*q*v*sn
+    coefs[:,2] = -2.*u*sn + 2.*q*v*co
+    coefs[:,3] = co**2 + q*sn**2
+    coefs[:,4] = 2.*(q - 1.)*co*sn
+    coefs[:,5] = sn**2 + q*co**2
+    return coefs
+
+
+def write_equilibrium(filename):
+
+    el = elements()
+    psi = psi_coefs(el)
+    with h5py.File(filename,'w') as h5:
+        h5['time_000/mesh/elements'] = el
+        h5['time_000/fields/psi'] = psi
+        for name, center in [('den',3.),('te',3.),('ti',3.),('p',6.)]:
+            f = -psi/minor**2
+            f[:,0] += center
+            h5['time_000/fields/'+name] = f
+        _equil_scalars(h5)
+
+
+def write_linear(filename, ntor, ntimemax, dt, growth=growth, max_ke=0.):
+
+    el = elements()
+    scale = 1.
+    if os.path.exists('rmp_current.dat'):
+        scale = float(np.sum(np.abs(np.loadtxt('rmp_current.dat', ndmin=1))))
+    n = max(min(ntimemax, 1000), 10)
+    time = dt*np.arange(n)
+    energy = 1e-4*np.exp(2.*growth*ntor*time)
+    if max_ke > 0.:
+        # the fields are scaled down whenever the kinetic energy exceeds max_ke
+        for k in range(n):
+            if energy[k] > max_ke:
+                energy[k:] *= rescale
+    with h5py.File(filename,'w') as h5:
+        h5.attrs['ntor'] = ntor
+        h5['scalars/time'] = time
+        h5['scalars/E_KP'] = 0.5*energy
+        h5['scalars/E_KT'] = 0.3*energy
+        h5['scalars/E_K3'] = 0.2*energy
+        _equil_scalars(h5)
+        psi = psi_coefs(el)
+        for k in range(2):
+            group = 'time_%03d/'%k
+            h5[group+'mesh/elements'] = el
+            h5[group+'fields/psi'] = k*scale*ntor*psi
+            h5[group+'fields/psi_i'] = k*scale*psi
+
+
+def _value(nl, key, default):
+    if (key in nl) and (nl[key] != ''):
+        return nl[key]
+    return default
+
+
+def _equil_scalars(h5):
+    if 'scalars/psimin' in h5:
+        return
+    for name, value in [('psimin',0.),('psi_lcfs',minor**2),('xmag',R0),('zmag',0.)]:
+        h5['scalars/'+name] = np.array([value])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,18 @@
+import os
 from my_shutil import mv
-def move_iter(dst):
-    mv('*.h5',dst)
-    mv('C1ke',dst)
-    mv('C1stdout',dst)
-    mv('current.dat',dst)
-    mv('current.dat.out','current.dat')
+def move_iter(dst,folder='.'):
+    dst = folder+'/'+dst
+    mv(folder+'/*.h5',dst)
+    mv(folder+'/C1ke',dst)
+    mv(folder+'/C1stdout',dst)
+    mv(folder+'/current.dat',dst)
+    mv(folder+'/slurm-*.out',dst)
+    mv(folder+'/current.dat.out',folder+'/current.dat')
     return
+
+# Number of the next iter_<i> folder, after any left by earlier runs
+def next_iter(folder='.'):
+    i = 1
+    while os.path.isdir(folder+'/iter_'+str(i)):
+        i += 1
+    return i
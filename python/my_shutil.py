@@ -1,11 +1,16 @@
+import os
 import shutil
 import glob
+from artifact_store import materialize
 
-# Copy a file
+# Copy a file; dst is replaced rather than written into, since it may be
+# a read-only hard link into the artifact store
 def cp(src,dst):
     
     for file in glob.glob(src):
-        shutil.copyfile(file, dst)
+        tmp = dst+'.tmp%d'%os.getpid()
+        shutil.copyfile(file, tmp)
+        os.replace(tmp, dst)
     return
 
 # Move a file
@@ -14,3 +19,12 @@ def mv(src,dst):
     for file in glob.glob(src):
         shutil.move(file, dst)
     return
+
+# Link a read-only file through the artifact store (copy if store is None)
+def ln(src,dst,store=None):
+
+    if store is None:
+        return cp(src,dst)
+    for file in glob.glob(src):
+        materialize(file, dst, store)
+    return
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+namelist
+
+Parsed C1input namelist (&inputnl ... /) for writing many run folders
+
+A template such as C1input_base is read and indexed once (cached by file
+name and modification time). Each "key = value ! comment" line is found by
+key with a dict lookup, and a modified C1input is rendered in a single pass
+and written with one call. Lines are otherwise kept exactly as in the
+template, including comments, so the result is the same as copying the
+template and running mod_C1input on it:
+    - a changed line becomes "<key part>=  <value>" (its comment is dropped)
+    - a 'feedback' entry multiplies every value whose key contains feedback
+    - keys not in the template are appended before the closing ' /'
+Rendered text is cached per template and set of changes, together with
+the list of changes made (printed again when verbose), so folders with the
+same inputs (e.g., one per coil) only format it once.
+
+    from namelist import read_namelist
+    nl = read_namelist('C1input_base')
+    nl['ntimemax']                    # '100'
+    nl.write('n=3/C1input',{'ntor':'3','feedback':'2.0'})
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+
+# (absolute path) -> (mtime, size, Namelist)
+_cache = {}
+
+
+def read_namelist(filename):
+
+    filename = os.path.abspath(filename)
+    st = os.stat(filename)
+    cached = _cache.get(filename)
+    if (cached is None) or (cached[0] != st.st_mtime_ns) or (cached[1] != st.st_size):
+        with open(filename,'r') as f:
+            cached = (st.st_mtime_ns, st.st_size, Namelist(f.readlines()))
+        _cache[filename] = cached
+    return cached[2]
+
+
+def write_C1input(template, filename, changes=None, append=True, verbose=True):
+    """
+    Write the C1input file filename from the namelist template with changes
+    """
+
+    read_namelist(template).write(filename, changes, append=append,
+                                  verbose=verbose)
+    return
+
+
+class Namelist(object):
+    """
+    Lines of a namelist file, indexed by key.
+    keys      - keys in file order
+    nl[key]   - value string, without the comment
+    """
+
+    def __init__(self, lines):
+
+        self.lines = lines
+        self.keys = []
+        self._index = {}        # key -> line numbers
+        self._feedback = []     # line numbers with 'feedback' in the key
+        self._close = []        # line numbers of '/'
+        self._rendered = {}
+
+        for i, line in enumerate(lines):
+            if line.strip() == '/':
+                self._close.append(i)
+                continue
+            spl = line.split("=",1)
+            if len(spl) != 2:
+                continue
+            key = spl[0].strip()
+            if key not in self._index:
+                self._index[key] = []
+                self.keys.append(key)
+            self._index[key].append(i)
+            if 'feedback' in spl[0]:
+                self._feedback.append(i)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __getitem__(self, key):
+        line = self.lines[self._index[key][0]]
+        return line.split("=",1)[1].split('!',1)[0].strip()
+
+    def render(self, changes=None, append=True, verbose=True):
+        """
+        Return the text of the namelist with changes ({key:value}) applied
+        """
+
+        if changes is None:
+            return ''.join(self.lines)
+
+        try:
+            ckey = (tuple(sorted((k, str(v)) for k, v in changes.items())), append)
+        except TypeError:
+            ckey = None
+        if ckey not in self._rendered:
+            text, log = self._render(changes, append)
+            if ckey is None:
+                return _log(text, log, verbose)
+            self._rendered[ckey] = (text, log)
+        return _log(*self._rendered[ckey], verbose=verbose)
+
+    def _render(self, changes, append):
+        # text and the messages describing the changes
+
+        log = ['Modifying C1input file']
+
+        changes = dict(changes)
+        fb_fac = changes.pop('feedback', None)
+        if fb_fac is not None:
+            fb_fac = float(fb_fac)
+            log.append("\tMultiplying feedback values by " + str(fb_fac))
+
+        lines = list(self.lines)
+        appended = []
+        for key, val in changes.items():
+            if val is None:
+                continue
+            val = str(val).strip()
+            if key.strip() not in self._index:
+                appended.append((key, val))
+                continue
+            for i in self._index[key.strip()]:
+                spl = lines[i].split("=",1)
+                log.append("\tChanging " + spl[0].strip() + " from " + spl[1].strip() + " to " + val)
+                lines[i] = spl[0] + "=  " + val + "\n"
+
+        if fb_fac is not None:
+            for i in self._feedback:
+                spl = lines[i].split("=",1)
+                val = fb_fac*float(spl[1].strip())
+                lines[i] = spl[0] + "=  " + str(val) + "\n"
+
+        for i in self._close:
+            lines[i] = ''
+
+        if append:
+            for key, val in appended:
+                line = "\t"+str(key).strip()+"  =  "+val+"\n"
+                log.append("\tAppending " + line.strip())
+                lines.append('\n')
+                lines.append(line)
+            lines.append('\n')
+
+        lines.append(' /\n')
+
+        return ''.join(lines), log
+
+    def write(self, filename, changes=None, append=True, verbose=True):
+
+        text = self.render(changes, append=append, verbose=verbose)
+        with open(filename,'w') as f:
+            f.write(text)
+        return
+
+
+def _log(text, log, verbose=True):
+    if verbose:
+        for line in log:
+            print(line)
+    return text
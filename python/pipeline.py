@@ -0,0 +1,553 @@
+# -*- coding: utf-8 -*-
+"""
+pipeline
+
+Non-interactive asyncio driver for the autoC1 stage chain
+(setup -> efit -> uni_equil -> adapt -> calculations)
+
+Each stage is a coroutine working in an explicit run folder, and nothing
+calls os.chdir, so many shot/time slices can be driven from one process.
+The calcs list is the same as the non-interactive autoC1 one,
+[(option, ntor, nflu), ...] with option '1' (equilibrium), '2' (stability),
+or '3' (response), and all calculations are submitted once adapted0.smb
+exists, as one Slurm job array for runs with the same sbatch options.
+
+With max_equil_iter > 1, uni_equil jobs are repeated until the coil currents
+in current.dat converge to current_tol (see current_iter), extrapolating
+current.dat between jobs with accel ('anderson' or 'picard'). The last
+iteration is then scored against uni_efit/C1.h5 (equil_check), and mesh
+adaptation only goes ahead if it passes (unless equil_check=False).
+
+Progress is kept in autoC1_state.json in each working directory (see
+run_state): on a rerun, stages whose inputs are unchanged and that finished
+are skipped, jobs that were submitted are waited for rather than submitted
+again, and only calculations whose jobs failed are resubmitted, so a campaign
+can simply be driven again after an interruption. Use resume=False to start
+over.
+
+    from pipeline import run_pipelines
+    run_pipelines(['158103.03796','158103.04000'], machine='DIII-D',
+                  calcs=[('2','3','1'),('3','3','1')])
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import glob
+import asyncio
+from functools import partial
+
+import my_shutil as mysh
+from load_equil import load_equil
+from move_iter import move_iter, next_iter
+from stages import stage_options, stage_C1input, prep_C1input_base, prep_setup
+from stages import prep_run, prep_calc
+from stages import write_command, def_folder, free_folder
+from slurm import sbatch, scancel, job_state, PENDING, RUNNING, COMPLETED, FAILED
+from job_watch import await_for, found
+from gs_monitor import await_gs
+from current_iter import step
+from equil_check import check_equil, format_report
+from preflight import preflight, check_profiles
+from job_array import submit_runs
+from run_state import load_state, stage_key, stage_record, is_done, mark
+from run_state import SUBMITTED, DONE, FAILED as STAGE_FAILED
+
+stage_order = ['setup','efit','uni_equil','adapt','calculation']
+
+
+def run_pipelines(roots, **kwargs):
+    """
+    Drive the stage chain for every working directory in roots at once.
+    Returns {root:True/False} for whether each chain finished.
+    """
+
+    async def run_all():
+        return await asyncio.gather(*[run_pipeline(root, **kwargs)
+                                      for root in roots],
+                                    return_exceptions=True)
+
+    results = asyncio.run(run_all())
+
+    status = {}
+    for root, result in zip(roots, results):
+        if isinstance(result, Exception):
+            print('['+root+'] *** '+repr(result)+' ***')
+            result = False
+        status[root] = result
+    return status
+
+
+async def run_pipeline(root, task='all', machine='DIII-D', calcs=[],
+                       setup_folder='efit', adapted_mesh=None,
+                       C1input_mod=None, C1input_base='C1input_base',
+                       rot='eb', C1_version='1.9', mesh_type='rw',
+                       mesh_resolution='normal', adapt_coil_file=None,
+                       adapt_current_file=None, adapt_coil_delta=None,
+                       max_equil_iter=1, current_tol=1e-3, gs_tol=None,
+                       accel='anderson', equil_check=True, resume=True,
+                       cancel_gs=False, **options):
+
+    root = os.path.abspath(root)
+
+    if task == 'all':
+        task = 'setup'
+    if task not in stage_order:
+        _log(root, '*** Unknown task '+task+' ***')
+        return False
+
+    # everything is checked before any folder is made or job submitted
+    problems = preflight(root=root, task=task, machine=machine, calcs=calcs,
+                         setup_folder=setup_folder, adapted_mesh=adapted_mesh,
+                         mesh_type=mesh_type, mesh_resolution=mesh_resolution,
+                         C1input_mod=C1input_mod, C1input_base=C1input_base,
+                         adapt_coil_file=adapt_coil_file,
+                         adapt_current_file=adapt_current_file,
+                         adapt_coil_delta=adapt_coil_delta,
+                         max_equil_iter=max_equil_iter, verbose=False,
+                         **options)
+    if len(problems) > 0:
+        for p in problems:
+            _log(root, '*** '+p+' ***')
+        return False
+
+    opts = stage_options(machine=machine, root=root, mesh_type=mesh_type,
+                         adapt_coil_delta=adapt_coil_delta, **options)
+
+    run = {'root':root,
+           'machine':machine,
+           'opts':opts,
+           'setup_folder':os.path.join(root,setup_folder),
+           'uni_equil_folder':os.path.join(root,'uni_equil'),
+           'adapt_folder':None,
+           'adapted_mesh':adapted_mesh,
+           'C1input_mod':C1input_mod,
+           'C1input_base':os.path.join(root,C1input_base),
+           'rot':rot,
+           'C1_version':C1_version,
+           'mesh_type':mesh_type,
+           'mesh_resolution':mesh_resolution,
+           'adapt_coil_file':adapt_coil_file,
+           'adapt_current_file':adapt_current_file,
+           'adapt_coil_delta':adapt_coil_delta,
+           'max_equil_iter':max_equil_iter,
+           'current_tol':current_tol,
+           'gs_tol':gs_tol,
+           'cancel_gs':cancel_gs,
+           'accel':accel,
+           'equil_check':equil_check,
+           'state':load_state(root) if resume else {'stages':{}},
+           'key':''}
+
+    prep_C1input_base(run['C1input_base'],opts['template'],C1_version=C1_version)
+
+    stages = {'setup':_setup,
+              'efit':_efit,
+              'uni_equil':_uni_equil,
+              'adapt':_adapt}
+
+    for stage in stage_order[stage_order.index(task):-1]:
+        if (stage in ['efit','uni_equil']) and (adapted_mesh is not None):
+            continue
+        if not await stages[stage](run):
+            _log(root, '*** Stopped after failed '+stage+' stage ***')
+            return False
+
+    if run['adapt_folder'] is None:
+        run['adapt_folder'] = _last_folder(root, mesh_type, 'adapt')
+
+    return await _calculations(run, calcs)
+
+
+async def _setup(run):
+
+    folder = run['setup_folder']
+    key = _key(run, files=_setup_inputs(folder),
+               params=[run['machine'],run['mesh_type']])
+    if is_done(run['state'], 'setup', key, outputs=['geqdsk']):
+        _log(run['root'], 'Equilibrium files unchanged, skipping setup')
+        return _next(run, key)
+    _log(run['root'], 'Setting up equilibrium files in '+folder)
+
+    loop = asyncio.get_event_loop()
+    if not await loop.run_in_executor(None, prep_setup, folder,
+                                      run['machine'], run['mesh_type']):
+        return False
+    problems = check_profiles(folder)
+    if len(problems) > 0:
+        for p in problems:
+            _log(run['root'], '*** '+p+' ***')
+        return False
+    _mark(run, 'setup', key, DONE, folder=folder)
+    return _next(run, key)
+
+
+def _setup_inputs(folder):
+    # g-, p-, and a-files, but not the profile_* files made from them
+    return [f for f in glob.glob(folder+'/[gpa]*.*')
+            if not os.path.basename(f).startswith('profile')]
+
+
+async def _efit(run):
+
+    folder = os.path.join(run['root'],'uni_efit')
+    C1input = stage_C1input('efit',run['opts'],C1input_mod=run['C1input_mod'])
+    key = _stage_key(run, C1input)
+
+    # the EFIT run is only needed by later stages on AUG
+    record = stage_record(run['state'], 'efit', key, status=SUBMITTED)
+    if (run['machine'] not in ['AUG']) and \
+       await _job_waiting(record, folder, ['time_000.h5']):
+        _log(run['root'], 'EFIT equilibrium unchanged, skipping efit')
+        return _next(run, key)
+    if is_done(run['state'], 'efit', key, outputs=['time_000.h5']):
+        _log(run['root'], 'EFIT equilibrium unchanged, skipping efit')
+        return _next(run, key)
+    _log(run['root'], 'Calculating EFIT equilibrium in '+folder)
+
+    submit_batch = prep_run(folder,'efit',run['opts'],C1input=C1input,
+                            C1input_base=run['C1input_base'],
+                            equil_folder=run['setup_folder'])
+    jobid = await _submit(submit_batch, folder)
+    _mark(run, 'efit', key, SUBMITTED, folder=folder, jobid=jobid)
+
+    if run['machine'] in ['AUG']:
+        if await await_for('time_000.h5',folder=folder,jobid=jobid) != COMPLETED:
+            _log(run['root'], '*** EFIT job failed to produce time_000.h5 ***')
+            return False
+        mysh.cp(run['opts']['template']+'get_aug_currents.pro',
+                folder+'/get_aug_currents.pro')
+        await _run(['idl','-e','@get_aug_currents'], folder)
+        _mark(run, 'efit', key, DONE)
+
+    return _next(run, key)
+
+
+async def _uni_equil(run):
+
+    folder = run['uni_equil_folder']
+    C1input = stage_C1input('uni_equil',run['opts'],
+                            C1input_mod=run['C1input_mod'])
+    key = _stage_key(run, [C1input, run['max_equil_iter'], run['current_tol'],
+                           run['gs_tol'], run['accel']])
+
+    # without current.dat there are no currents to iterate on or keep
+    has_current = os.path.exists(os.path.join(run['setup_folder'],'current.dat'))
+    outputs = ['current.dat.good'] if has_current else []
+    if is_done(run['state'], 'uni_equil', key, outputs=outputs):
+        _log(run['root'], 'GS equilibrium unchanged, skipping uni_equil')
+        return _next(run, key)
+    iterating = has_current and (run['max_equil_iter'] > 1)
+
+    # iterations left by earlier runs are kept, numbering continues after them
+    i = first = next_iter(folder)
+    record = stage_record(run['state'], 'uni_equil', key, status=SUBMITTED)
+    if await _job_waiting(record, folder, ['time_000.h5']):
+        jobid = record['jobid']
+        with open(folder+'/submit_command','r') as h:
+            submit_batch = h.read().split()
+        _log(run['root'], 'Waiting for job '+jobid+' submitted earlier in '+folder)
+    else:
+        _log(run['root'], 'Calculating equilibrium with M3D-C1 GS solver in '+folder)
+        submit_batch = prep_run(folder,'uni_equil',run['opts'],C1input=C1input,
+                                C1input_base=run['C1input_base'],
+                                equil_folder=run['setup_folder'])
+        jobid = await _submit(submit_batch, folder)
+        _mark(run, 'uni_equil', key, SUBMITTED, folder=folder, jobid=jobid)
+
+    loop = asyncio.get_event_loop()
+    for n in range(run['max_equil_iter']):
+        if n > 0:
+            jobid = await _submit(submit_batch, folder)
+            _mark(run, 'uni_equil', key, SUBMITTED, jobid=jobid)
+
+        # with cancel_gs the job is cancelled as soon as the GS iteration
+        # stalls or diverges with a residual above gs_tol
+        state, monitor = await await_gs(folder=folder,jobid=jobid,verbose=False,
+                                        cancel=run['cancel_gs'],
+                                        tol=run['gs_tol'])
+        if state != COMPLETED:
+            _log(run['root'], '*** iter '+str(i)+' failed to produce time_000.h5 ***')
+            _log(run['root'], monitor.summary())
+            _mark(run, 'uni_equil', key, STAGE_FAILED)
+            return False
+        _log(run['root'], 'iter '+str(i)+' time_000.h5 created')
+        _log(run['root'], monitor.summary())
+
+        # move the iteration to iter_<i> and extrapolate the next current.dat
+        if not iterating:
+            await loop.run_in_executor(None, _file_iter, folder, i)
+            break
+        done, change = await loop.run_in_executor(None, partial(step, folder, i,
+                               monitor.final, tol=run['current_tol'],
+                               gs_tol=run['gs_tol'], method=run['accel'],
+                               first=first))
+        _log(run['root'], 'iter %d: relative change in currents %.3e'%(i,change))
+        if done or (n == run['max_equil_iter']-1):
+            break
+        i += 1
+
+    # unconverged currents are only good enough if the equilibrium matches
+    if iterating and not done:
+        _log(run['root'], '*** Currents not converged after iter '+str(i)+' ***')
+        if not run['equil_check']:
+            _mark(run, 'uni_equil', key, STAGE_FAILED)
+            return False
+
+    if run['equil_check']:
+        if not await _await_efit(run):
+            _mark(run, 'uni_equil', key, STAGE_FAILED)
+            return False
+        report = await loop.run_in_executor(None, _check_equil, run, folder+'/iter_'+str(i))
+        if not report['pass']:
+            _log(run['root'], '*** iter '+str(i)+' does not match EFIT, see '
+                 +folder+'/iter_'+str(i)+'/equil_check.txt ***')
+            _mark(run, 'uni_equil', key, STAGE_FAILED)
+            return False
+
+    mysh.cp(folder+'/iter_'+str(i)+'/current.dat',folder+'/current.dat.good')
+    _mark(run, 'uni_equil', key, DONE)
+
+    return _next(run, key)
+
+
+async def _adapt(run):
+
+    root = run['root']
+    opts = run['opts']
+
+    if run['adapted_mesh'] is not None:
+        files = [os.path.join(root,run['adapted_mesh'])]
+    else:
+        files = [opts['template']+'sfp_'+run['mesh_resolution'],
+                 run['uni_equil_folder']+'/current.dat.good']
+        if (run['adapt_coil_delta'] is not None) and (run['adapt_coil_delta'] > 0.):
+            files += [run['adapt_coil_file'],run['adapt_current_file']]
+    C1input = stage_C1input('adapt',opts,C1input_mod=run['C1input_mod'])
+    key = _stage_key(run, C1input, files=files)
+
+    record = stage_record(run['state'], 'adapt', key)
+    if is_done(run['state'], 'adapt', key, outputs=['adapted0.smb']):
+        run['adapt_folder'] = record['folder']
+        _log(root, 'Adapted mesh unchanged, using '+
+             os.path.relpath(record['folder'],root))
+        return _next(run, key)
+
+    # rerun an unfinished adaptation in its own folder, not a new rw<i>_adapt
+    if (record is not None) and os.path.isdir(record['folder']):
+        folder = record['folder']
+    else:
+        folder = os.path.join(root,free_folder(run['mesh_type'],'adapt',root=root,
+                                               output='adapted0.smb'))
+    if not os.path.isdir(folder):
+        os.mkdir(folder)
+    run['adapt_folder'] = folder
+
+    if run['adapted_mesh'] is not None:
+        _log(root, 'Adapting mesh to equilibrium in '+folder)
+        for f in opts['base_files']:
+            mysh.cp(f,folder+'/'+os.path.basename(f))
+        load_equil(run['setup_folder'],folder)
+        mysh.cp(run['setup_folder']+'/current.dat',folder+'/current.dat')
+        mysh.cp(os.path.join(root,run['adapted_mesh']),folder+'/adapted0.smb')
+        _log(root, 'Using provided adapted mesh')
+        _mark(run, 'adapt', key, DONE, folder=folder)
+        return _next(run, key)
+
+    if (record is not None) and (record['status'] == SUBMITTED) and \
+       await _job_waiting(record, folder, ['adapted0.smb','ts0-adapted0.smb']):
+        jobid = record['jobid']
+        _log(root, 'Waiting for job '+jobid+' submitted earlier in '+folder)
+    else:
+        _log(root, 'Adapting mesh to equilibrium in '+folder)
+        files = [(opts['template']+'sfp_'+run['mesh_resolution'],'sizefieldParam'),
+                 (run['uni_equil_folder']+'/current.dat.good','current.dat')]
+        if (run['adapt_coil_delta'] is not None) and (run['adapt_coil_delta'] > 0.):
+            files += [(run['adapt_coil_file'],'adapt_coil.dat'),
+                      (run['adapt_current_file'],'adapt_current.dat')]
+
+        submit_batch = prep_run(folder,'adapt',opts,C1input=C1input,
+                                C1input_base=run['C1input_base'],
+                                equil_folder=run['setup_folder'],files=files)
+        jobid = await _submit(submit_batch, folder)
+        _mark(run, 'adapt', key, SUBMITTED, folder=folder, jobid=jobid)
+
+    state = await await_for(['adapted0.smb','ts0-adapted0.smb'],
+                            folder=folder,jobid=jobid)
+    if state != COMPLETED:
+        _log(root, '*** Mesh adaptation failed to produce adapted0.smb ***')
+        _mark(run, 'adapt', key, STAGE_FAILED)
+        return False
+
+    if os.path.exists(folder+'/ts0-adapted0.smb'):
+        mysh.cp(folder+'/ts0-adapted0.smb',folder+'/adapted0.smb')
+    _log(root, 'Mesh adaptation complete')
+
+    if jobid is None:
+        with open(folder+'/job_id.txt','r') as f:
+            jobid = f.read().rstrip('\n')
+    scancel(jobid)
+    _mark(run, 'adapt', key, DONE, jobid=jobid)
+
+    return _next(run, key)
+
+
+async def _calculations(run, calcs):
+    # all calculations share the adapted mesh, so runs with the same sbatch
+    # options (e.g., every coil and ntor of the responses) go in one job array
+
+    runs = []
+    submitted = []
+    ok = True
+    for calc in calcs:
+        name = 'calc '+' '.join(str(c) for c in calc)
+        key = _key(run, params=[[str(c) for c in calc], run['C1input_mod'],
+                                run['rot'], run['C1_version']])
+
+        record = stage_record(run['state'], name, key)
+        if record is not None:
+            # only resubmit the runs whose jobs failed
+            calc_runs = [tuple(r) for r in record['runs']
+                         if not await _job_alive(record['jobids'].get(r[0]))]
+            if len(calc_runs) == 0:
+                _log(run['root'], 'Skipping '+name+', already submitted')
+                continue
+            _log(run['root'], 'Resubmitting '+str(len(calc_runs))+
+                 ' failed run(s) of '+name)
+        else:
+            calc_runs = prep_calc(calc, run['opts'], root=run['root'],
+                                  adapt_folder=run['adapt_folder'],
+                                  C1input_base=run['C1input_base'],
+                                  C1input_mod=run['C1input_mod'],
+                                  mesh_type=run['mesh_type'], rot=run['rot'],
+                                  C1_version=run['C1_version'])
+            if calc_runs is None:
+                ok = False
+                continue
+        runs += calc_runs
+        submitted.append((name, key, record, calc_runs))
+
+    if len(runs) == 0:
+        return ok
+
+    loop = asyncio.get_event_loop()
+    jobids = await loop.run_in_executor(None, submit_runs, runs, run['root'],
+                                        'm3dc1_calcs')
+    for folder, submit_batch in runs:
+        _log(run['root'], 'Job '+str(jobids[folder])+' submitted in '+
+             os.path.relpath(folder, run['root']))
+
+    for name, key, record, calc_runs in submitted:
+        if record is None:
+            record = {'runs':[list(r) for r in calc_runs], 'jobids':{}}
+        record['jobids'].update((f, jobids[f]) for f, _ in calc_runs)
+        _mark(run, name, key, SUBMITTED, runs=record['runs'],
+              jobids=record['jobids'])
+
+    return ok and all(jobid is not None for jobid in jobids.values())
+
+
+async def _submit(submit_batch, folder):
+    write_command(submit_batch, folder=folder)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, sbatch, submit_batch, folder)
+
+
+async def _run(args, folder, stdout=None):
+
+    try:
+        proc = await asyncio.create_subprocess_exec(*args, cwd=folder,
+                                                    stdout=stdout)
+    except OSError as e:
+        print('*** Could not run '+args[0]+': '+str(e)+' ***')
+        return -1
+    return await proc.wait()
+
+
+def _key(run, files=[], params=None):
+    return stage_key(run['key'], files=files, params=params)
+
+
+def _stage_key(run, C1input, files=[]):
+    # a run stage depends on C1input_base and the template files too
+    return _key(run, files=[run['C1input_base']]+run['opts']['base_files']+files,
+                params=C1input)
+
+
+def _next(run, key):
+    # later stages are keyed on this one
+    run['key'] = key
+    return True
+
+
+def _mark(run, stage, key, status, **info):
+    return mark(run['root'], run['state'], stage, key, status, **info)
+
+
+async def _job_waiting(record, folder, outputs):
+    # whether the job of a stage submitted earlier is still worth waiting
+    # for: it is queued or running, or it left its output; a failed stage
+    # or a job that ended without its output is submitted again
+    if (record is None) or (record.get('jobid') is None):
+        return False
+    if found(outputs, folder) is not None:
+        return True
+    loop = asyncio.get_event_loop()
+    state = await loop.run_in_executor(None, job_state, record['jobid'])
+    return state in [PENDING, RUNNING]
+
+
+async def _job_alive(jobid, unknown=True):
+    # whether a job submitted earlier has not failed; jobs that squeue and
+    # sacct no longer know about count as unknown
+    if jobid is None:
+        return False
+    loop = asyncio.get_event_loop()
+    state = await loop.run_in_executor(None, job_state, jobid)
+    if state is None:
+        return unknown
+    return state != FAILED
+
+
+async def _await_efit(run):
+    # outside AUG nothing else waits for the EFIT job, but it is scored against
+    record = run['state']['stages'].get('efit')
+    if (record is None) or (record.get('jobid') is None) or (record['status'] == DONE):
+        return True
+    folder = os.path.join(run['root'],'uni_efit')
+    if await await_for('time_000.h5',folder=folder,jobid=record['jobid']) != COMPLETED:
+        _log(run['root'], '*** EFIT job failed to produce time_000.h5 ***')
+        _mark(run, 'efit', record['key'], STAGE_FAILED)
+        return False
+    _mark(run, 'efit', record['key'], DONE)
+    return True
+
+
+def _file_iter(folder, i):
+    # iteration i to iter_<i>, as the interactive loop does
+    os.mkdir(folder+'/iter_'+str(i))
+    move_iter('iter_'+str(i)+'/', folder=folder)
+
+
+def _check_equil(run, folder):
+    # score folder/C1.h5 against the EFIT run; a file that cannot be read fails
+    try:
+        report = check_equil(folder, os.path.join(run['root'],'uni_efit'),
+                             verbose=False)
+    except (IOError, KeyError) as e:
+        _log(run['root'], '*** Could not check the equilibrium in '+folder+': '+str(e)+' ***')
+        return {'pass':False}
+    for line in format_report(report).split('\n'):
+        _log(run['root'], line)
+    return report
+
+
+def _last_folder(root, pre, post):
+    # Most recent existing <pre><i>_<post> folder, e.g. rw1_adapt
+    folder = def_folder(pre,post,root=root)
+    i = int(folder[len(pre):-len(post)-1])
+    return os.path.join(root,pre+str(max(i-1,1))+'_'+post)
+
+
+def _log(root, message):
+    print('['+os.path.basename(root)+'] '+message)
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+preflight
+
+Check the inputs of an autoC1 run before any folder is made or any job is
+queued, and report every problem at once
+
+Only files are looked at (nothing is written), so the checks take a small
+fraction of a second:
+    machine, arch  - known to the registry (machine.json, archs/<arch>.json)
+    mesh           - mesh_type has uniform meshes for the machine, and its
+                     template files, mesh_model, uniform_mesh or
+                     adapted_mesh exist
+    efit folder    - one g-file, an a-file where current.dat is made with
+                     a2cc, and profiles (setup task); geqdsk, current.dat
+                     (where a2cc makes it), and profiles that are not empty,
+                     not NaN, and not negative (later tasks)
+    uni_equil      - a current.dat to iterate on, if max_equil_iter > 1 or
+                     auto_iterate
+    C1input        - C1input_base (or its template) and C1input_mod keys
+    adapt          - adapt_coil_delta is a number, with both coil files
+                     when it is positive
+    calculations   - known options, integer ntor, nflu 1 or 2, coil files
+                     of the response runs
+    resources      - time_factor, and the walltime model file if given
+preflight() returns the list of problems, printed unless verbose=False;
+autoC1, pipeline, and dag_submit stop if it is not empty.
+
+    from preflight import preflight
+    problems = preflight(task='all', machine='DIII-D', calcs=[('3','3','1')])
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import re
+from glob import glob
+
+import numpy as np
+
+from registry import machine_info, has_arch, arch_slurm
+from stages import calc_options
+from resources import read_model
+
+stage_order = ['setup','efit','uni_equil','adapt','calculation']
+profiles = ['profile_ne','profile_te']
+identifier = re.compile(r'^[A-Za-z_]\w*$')
+
+
+def preflight(root='.', task='all', machine='DIII-D', calcs=[],
+              setup_folder='efit', adapted_mesh=None, uniform_mesh=None,
+              mesh_model=None, mesh_type='rw', mesh_resolution='normal',
+              C1input_mod=None, C1input_base='C1input_base',
+              adapt_coil_file=None, adapt_current_file=None,
+              adapt_coil_delta=None, C1arch=None, time_factor=1.0,
+              resources=False, OMFIT=False, max_equil_iter=1,
+              auto_iterate=False, verbose=True, **ignored):
+    """
+    Problems with the inputs of a run of task (and the tasks after it) in
+    root, as a list of messages
+    """
+
+    if task == 'all':
+        task = 'setup'
+    if task not in stage_order:
+        return _report(['Unknown task '+str(task)], verbose)
+    stages = stage_order[stage_order.index(task):]
+    if adapted_mesh is not None:
+        stages = [s for s in stages if s not in ['efit','uni_equil','adapt']]
+
+    problems = []
+    try:
+        info = machine_info(machine)
+    except (ValueError, EnvironmentError) as e:
+        return _report([str(e)], verbose)
+    template = os.path.join(os.environ.get('AUTOC1_HOME'),'templates',machine)
+
+    if C1arch is None:
+        C1arch = os.environ.get('AUTOC1_ARCH')
+    if C1arch is None:
+        problems.append('AUTOC1_ARCH is not set')
+    elif not has_arch(C1arch):
+        problems.append('Unknown architecture '+C1arch+' (no templates/archs/'
+                        +C1arch+'.json)')
+
+    problems += check_mesh(root, info, template, mesh_type, mesh_resolution,
+                           uniform_mesh, mesh_model, adapted_mesh, stages)
+
+    folder = os.path.join(root,setup_folder)
+    # only the setup task makes current.dat, and only with a2cc
+    a2cc = (mesh_type == 'rw') and info['a2cc']
+    if 'setup' in stages:
+        if not OMFIT:
+            problems += check_setup(folder, machine, info, mesh_type)
+        has_current = a2cc or OMFIT
+    else:
+        if len(set(stages) & set(['efit','uni_equil','adapt'])) > 0:
+            problems += check_equil_files(folder, current=a2cc)
+        has_current = os.path.exists(os.path.join(folder,'current.dat'))
+    if ('uni_equil' in stages) and (auto_iterate or (max_equil_iter > 1)) \
+       and not has_current:
+        problems.append('Iterating uni_equil (max_equil_iter > 1 or auto_iterate) '
+                        'needs current.dat in '+folder+', which setup only makes '
+                        'for rw meshes on machines with a2cc')
+
+    problems += check_C1input(root, template, C1input_base, C1input_mod)
+    if 'adapt' in stages:
+        problems += check_adapt(root, adapt_coil_delta, adapt_coil_file,
+                                adapt_current_file)
+    if 'calculation' in stages:
+        problems += check_calcs(calcs, info, template)
+    problems += check_resources(root, C1arch, time_factor, resources)
+
+    return _report(problems, verbose)
+
+
+def check_mesh(root, info, template, mesh_type, mesh_resolution,
+               uniform_mesh, mesh_model, adapted_mesh, stages):
+
+    problems = []
+    if not isinstance(mesh_type, str) or len(mesh_type) < 2:
+        return ['Improper mesh_type '+str(mesh_type)]
+    base = mesh_type[-2:]
+    if (base not in info['uni_smb']) or \
+       ((mesh_type != base) and (mesh_type[0] != 'c')):
+        return ['No uniform mesh for mesh_type '+mesh_type+' (known: '
+                +', '.join(sorted(info['uni_smb']))+')']
+
+    if mesh_type[0] == 'c':
+        if mesh_model is None:
+            problems.append('mesh_type '+mesh_type+' needs mesh_model')
+        else:
+            problems += _missing(root, [mesh_model])
+        if uniform_mesh is not None:
+            problems += _missing(root, [uniform_mesh])
+    else:
+        problems += _missing(template, [info['uni0_smb'][base],
+                                        info['uni_txt'][base]])
+    problems += _missing(template, ['batch_slurm','coil.dat'])
+
+    if adapted_mesh is not None:
+        problems += _missing(root, [adapted_mesh])
+    elif 'adapt' in stages:
+        problems += _missing(template, ['sfp_'+str(mesh_resolution)])
+    return problems
+
+
+def check_setup(folder, machine, info, mesh_type):
+    """
+    Files the setup task needs in the efit folder
+    """
+
+    if not os.path.isdir(folder):
+        return ['No efit folder '+folder]
+    problems = []
+    gfiles = glob(os.path.join(folder,'g*.*'))
+    if len(gfiles) != 1:
+        problems.append('%d g-files (g*.*) in %s, need exactly one'%(len(gfiles),folder))
+    if (mesh_type == 'rw') and info['a2cc']:
+        afiles = glob(os.path.join(folder,'a*.*'))
+        if len(afiles) != 1:
+            problems.append('%d a-files (a*.*) in %s, need exactly one for a2cc'
+                            %(len(afiles),folder))
+        elif os.path.getsize(afiles[0]) == 0:
+            problems.append(afiles[0]+' is empty')
+    if machine in ['DIII-D','NSTX-U']:
+        pfiles = [p for p in glob(os.path.join(folder,'p*.*'))
+                  if not os.path.basename(p).startswith('profile')]
+        if (len(pfiles) == 0) and \
+           (len(glob(os.path.join(folder,'m3dc1_profiles_*.txt'))) == 0):
+            problems.append('No p-file or m3dc1_profiles_*.txt in '+folder)
+    return problems
+
+
+def check_equil_files(folder, current=True):
+    """
+    Files the setup task made in the efit folder (current.dat if current),
+    with sane profiles
+    """
+
+    problems = []
+    for name in ['geqdsk']+(['current.dat'] if current else [])+profiles:
+        filename = os.path.join(folder,name)
+        if not os.path.exists(filename):
+            problems.append('No '+filename)
+        elif os.path.getsize(filename) == 0:
+            problems.append(filename+' is empty')
+    problems += check_profiles(folder)
+    return problems
+
+
+def check_profiles(folder, names=profiles):
+    """
+    Problems with the (possibly extended) profiles in folder: unreadable,
+    NaN, or negative values
+    """
+
+    problems = []
+    for name in names:
+        filename = os.path.join(folder,name)
+        if (not os.path.exists(filename)) or (os.path.getsize(filename) == 0):
+            continue
+        try:
+            prof = np.loadtxt(filename, ndmin=2)
+        except ValueError as e:
+            problems.append('Could not read '+filename+': '+str(e))
+            continue
+        if prof.shape[1] < 2:
+            problems.append(filename+' needs two columns (psi, value)')
+            continue
+        if not np.all(np.isfinite(prof[:,:2])):
+            problems.append(filename+' has NaN or infinite values')
+        elif prof[:,1].min() < 0.:
+            k = np.argmin(prof[:,1])
+            problems.append('%s goes negative (%.3g at psi = %.3g)'
+                            %(filename, prof[k,1], prof[k,0]))
+    return problems
+
+
+def check_C1input(root, template, C1input_base, C1input_mod):
+
+    problems = []
+    if not os.path.exists(os.path.join(root,C1input_base)):
+        problems += _missing(template, ['C1input_base'])
+    if C1input_mod is None:
+        return problems
+    if not isinstance(C1input_mod, dict):
+        return problems+['C1input_mod should be a dict {key:value}']
+    for key, value in C1input_mod.items():
+        if not identifier.match(str(key)):
+            problems.append('Improper C1input key '+repr(key))
+        if (value is None) or isinstance(value, (list, tuple, dict)):
+            problems.append('Improper value '+repr(value)+' for C1input key '+str(key))
+    return problems
+
+
+def check_adapt(root, adapt_coil_delta, adapt_coil_file, adapt_current_file):
+
+    if adapt_coil_delta is None:
+        return []
+    try:
+        delta = float(adapt_coil_delta)
+    except (TypeError, ValueError):
+        return ['adapt_coil_delta should be a number, not '+repr(adapt_coil_delta)]
+    if delta < 0.:
+        return ['adapt_coil_delta should not be negative']
+    if delta == 0.:
+        return []
+    problems = []
+    for name, f in [('adapt_coil_file',adapt_coil_file),
+                    ('adapt_current_file',adapt_current_file)]:
+        if f is None:
+            problems.append(name+' is needed with adapt_coil_delta > 0')
+        else:
+            problems += _missing(root, [f])
+    return problems
+
+
+def check_calcs(calcs, info, template):
+
+    problems = []
+    for calc in calcs:
+        if (not isinstance(calc, (list, tuple))) or (len(calc) not in [3,4]):
+            problems.append('Improper calc '+repr(calc)+', should be (option, ntor, nflu)')
+            continue
+        task = calc_options.get(str(calc[0]))
+        if task is None:
+            problems.append('Unknown calculation option '+repr(calc[0])+' in '+repr(calc))
+            continue
+        if task in ['exit','examine','equilibrium']:
+            continue
+        try:
+            int(str(calc[1]))
+        except ValueError:
+            problems.append('ntor should be an integer in '+repr(calc))
+        if str(calc[2]) not in ['1','2']:
+            problems.append('nflu should be 1 or 2 in '+repr(calc))
+        if task != 'response':
+            continue
+        if len(calc) == 4:
+            if not os.path.exists(str(calc[3])):
+                problems.append('No PROBE_G file '+str(calc[3]))
+            continue
+        if len(info['coils']) == 0:
+            problems.append('No coils defined for the response in '+repr(calc))
+        for coil in info['coils']:
+            problems += _missing(template, ['rmp_coil_'+coil+'.dat',
+                                            'rmp_current_'+coil+'.dat'])
+    # the same files are needed by every ntor
+    return sorted(set(problems), key=problems.index)
+
+
+def check_resources(root, C1arch, time_factor, resources):
+
+    problems = []
+    try:
+        if float(time_factor) <= 0.:
+            problems.append('time_factor should be positive')
+    except (TypeError, ValueError):
+        return ['time_factor should be a number, not '+repr(time_factor)]
+    if isinstance(resources, str) and (resources != ''):
+        filename = os.path.join(root,resources)
+        if not os.path.exists(filename):
+            problems.append('No resource model '+filename)
+        else:
+            try:
+                read_model(filename)
+            except ValueError as e:
+                problems.append('Could not read resource model '+filename+': '+str(e))
+    if (C1arch is not None) and has_arch(C1arch):
+        try:
+            arch_slurm(C1arch, time_factor=float(time_factor))
+        except (ValueError, KeyError, TypeError) as e:
+            problems.append('Could not make the sbatch options for '+C1arch+': '+str(e))
+    return problems
+
+
+def _missing(folder, names):
+    return ['No '+os.path.join(folder,f) for f in names
+            if not os.path.exists(os.path.join(folder,f))]
+
+
+def _report(problems, verbose):
+    if verbose and len(problems) > 0:
+        print('*** Problems found before submitting anything: ***')
+        for p in problems:
+            print('***   '+p)
+    return problems
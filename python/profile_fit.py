@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+"""
+profile_fit
+
+Fit the edge of a profile to the product of linear and tanh functions and
+extend it past the last data point. Used by extend_profile for the
+interactive version, and with no plotting for batch setup.
+
+fit_batch fits many profiles at once (e.g., ne and te for every time slice
+of a discharge) with a Levenberg-Marquardt iteration that is vectorized over
+all profiles and all starting points of a center/width grid, using the
+analytic Jacobians of lintanh and lintanh2. Nothing here needs matplotlib.
+
+    from profile_fit import fit_batch, extend_fit
+    fits = fit_batch([psi_ne,psi_te],[ne,te],minval=[1e-2,1e-4])
+    psi4, prof4, prof5 = extend_fit(psi_ne,ne,fits[0]['popt'],minval=1e-2,
+                                    psimax=1.1)
+
+auto_extend (and search_batch for many profiles) replaces the interactive
+retry loop: candidate minval/psimin/smooth values are fit in parallel and
+scored by fit residual, positivity, monotonicity, and the gradient jump at
+the edge.
+
+    auto_extend('profile_ne',minval=1e-2,psimax=1.1)
+
+Date created: Sun Oct 18 2026
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.optimize import curve_fit
+
+# Default multi-start grid for fit_batch
+centers = [0.96,0.97,0.98,0.99,1.0]
+widths  = [0.005,0.01,0.02,0.04]
+
+# Default candidates and score weights for search_batch
+psimins = [0.9,0.925,0.95,0.97]
+smooths = [None,0.98,0.99]
+score_weights = {'residual':1.,'kink':0.01,'negative':1e3,'rising':1.}
+
+def fit_profile(psi,prof,minval=0.,psimax=1.05,psimin=0.95,center=0.98,
+                width=0.01,smooth=None):
+    """
+    Fit lintanh to prof for psi > psimin and extend it to psimax, without
+    printing or plotting. Returns psi4, prof4 (extended profile), prof5
+    (fit over psi4), and popt = [center, 1/width, height, slope].
+    Raises ValueError for a bad psi range and RuntimeError if the fit fails.
+    """
+
+    if psimin > psi[-1] :
+        raise ValueError("psimin greater than last psi value defined")
+    if psimax < psi[-1] :
+        raise ValueError("psimax less than last psi value")
+
+    i = np.where(psi>psimin)
+    psi2  = psi[i]
+    prof2 = prof[i]
+
+    p0 = [center,1.0/width,prof2.max(),0.]
+    sigma = np.sqrt(prof2)
+    popt, pcov = curve_fit(lintanh,psi2,prof2-minval,p0=p0,sigma=sigma,
+                           jac=lintanh_jac)
+
+    psi4, prof4, prof5 = extend_fit(psi,prof,popt,minval=minval,
+                                    psimax=psimax,smooth=smooth)
+
+    return psi4, prof4, prof5, popt
+
+def extend_fit(psi,prof,popt,model='lintanh',minval=0.,psimax=1.05,
+               smooth=None):
+    """
+    Extend prof from psi[-1] to psimax with the fit popt. Returns psi4,
+    prof4 (extended profile), and prof5 (fit over psi4).
+    """
+
+    func = models[model][0]
+
+    h = psi[-1]-psi[-2]
+
+    psi3 = np.arange(psi[-1],psimax,h)
+
+    prof3 = func(psi3,*popt) + minval
+
+    psi4  = np.append(psi,psi3[1:])
+    prof4 = np.append(prof,prof3[1:])
+    prof5 = func(psi4,*popt) + minval
+
+    if smooth is not None:
+        # smooth profile between smooth and psi[-1]
+        imin, pmin = next((i,p) for i,p in enumerate(psi4) if p>smooth)
+        imax, pmax = next((i,p) for i,p in enumerate(psi4) if p>psi[-1])
+
+#        prmin = prof4[imin]
+#        prmax = prof4[imax]
+
+        for i in range(imin,imax):
+
+            # linear smooth
+            #prof4[i] = prmin + (psi4[i]-pmin)*(prmax-prmin)/(pmax-pmin)
+
+            # average smooth
+            prof4[i] = (psi4[i]-pmin)*prof5[i] +  (pmax-psi4[i])*prof4[i]
+            prof4[i] = prof4[i]/(pmax-pmin)
+
+    return psi4, prof4, prof5
+
+def fit_batch(psis,profs,model='lintanh',minval=0.,psimin=0.95,
+              centers=centers,widths=widths,maxiter=200,tol=1.49012e-8):
+    """
+    Fit many profiles at once, each from every (center, width) start.
+    psis and profs are lists of 1D arrays (lengths may differ); minval and
+    psimin may be scalars or one value per profile. model is 'lintanh' or
+    'lintanh2'. Returns one dict per profile with the best fit:
+        popt      - fit parameters (None if no start converged)
+        start     - (center, width) of the best start
+        cost      - weighted sum of squared residuals, sigma = sqrt(prof)
+        rms       - unweighted rms residual over the fitted points
+        npoints   - number of fitted points (psi > psimin)
+        nconverged- number of starts that converged
+        niter     - iterations used by the best start
+    """
+
+    func, jac = models[model]
+    nprof = len(profs)
+    minval = np.broadcast_to(np.asarray(minval,dtype=float),(nprof,))
+    psimin = np.broadcast_to(np.asarray(psimin,dtype=float),(nprof,))
+
+    # edge points of each profile, padded to a common length with zero weight
+    edges = []
+    for psi, prof, pm, mv in zip(psis,profs,psimin,minval):
+        i = np.where(np.asarray(psi)>pm)
+        edges.append((np.asarray(psi,dtype=float)[i],
+                      np.asarray(prof,dtype=float)[i]-mv))
+    npts = np.array([e[0].size for e in edges])
+    M = max(npts.max(),1)
+    x = np.ones((nprof,M))
+    y = np.zeros((nprof,M))
+    w = np.zeros((nprof,M))
+    for k, (psi2, prof2) in enumerate(edges):
+        n = psi2.size
+        if n == 0:
+            continue
+        x[k,:n] = psi2
+        x[k,n:] = psi2[-1]
+        y[k,:n] = prof2
+        sigma = np.sqrt(np.maximum(np.abs(prof2+minval[k]),
+                                   1e-12*max(np.abs(prof2).max(),1e-300)))
+        w[k,:n] = 1./sigma
+
+    # every profile from every start: problem index = k*nstart + s
+    grid = [(c,wd) for c in centers for wd in widths]
+    nstart = len(grid)
+    X = np.repeat(x,nstart,axis=0)
+    Y = np.repeat(y,nstart,axis=0)
+    W = np.repeat(w,nstart,axis=0)
+    height = np.repeat(np.abs(y).max(axis=1),nstart)
+    C = np.tile([g[0] for g in grid],nprof)
+    Wd = np.tile([g[1] for g in grid],nprof)
+    if model == 'lintanh':
+        p0 = np.column_stack((C,1./Wd,height,np.zeros_like(C)))
+    else:
+        p0 = np.column_stack((height,np.zeros_like(C),C+2.*Wd,C,Wd))
+
+    p, cost, niter, conv = _lm(func,jac,X,Y,W,p0,maxiter,tol)
+
+    fits = []
+    for k in range(nprof):
+        s = slice(k*nstart,(k+1)*nstart)
+        ok = conv[s] & np.isfinite(cost[s]) & (npts[k] > p0.shape[1])
+        fit = {'popt':None,
+               'start':None,
+               'cost':np.inf,
+               'rms':np.inf,
+               'npoints':int(npts[k]),
+               'nconverged':int(ok.sum()),
+               'niter':0}
+        if ok.any():
+            best = np.flatnonzero(ok)[np.argmin(cost[s][ok])]
+            j = k*nstart + best
+            n = npts[k]
+            res = func(x[k,:n],*p[j]) - y[k,:n]
+            fit.update({'popt':p[j].copy(),
+                        'start':grid[best],
+                        'cost':float(cost[j]),
+                        'rms':float(np.sqrt(np.mean(res**2))),
+                        'niter':int(niter[j])})
+        fits.append(fit)
+
+    return fits
+
+def search_batch(psis,profs,minvals,psimax=1.05,psimins=psimins,
+                 smooths=smooths,model='lintanh',max_workers=None):
+    """
+    Automatic replacement for retrying extend_profile by hand: every
+    profile is fit and extended for every combination of minval (from its
+    own list in minvals), psimin, and smooth, with the center/width grid
+    of fit_batch, and the candidate with the lowest score is picked.
+    Candidates are split across max_workers processes.
+    Returns one dict per profile with the best minval, psimin, smooth,
+    popt, score, and its parts (see score_extension), or with
+    popt None if no candidate could be fit.
+    """
+
+    cands = []
+    for k in range(len(profs)):
+        for mv in minvals[k]:
+            for pm in psimins:
+                for sm in smooths:
+                    cands.append((k,mv,pm,sm))
+
+    nchunk = max_workers or os.cpu_count() or 1
+    chunks = [cands[i::nchunk] for i in range(nchunk)]
+    chunks = [c for c in chunks if len(c) > 0]
+    args = [([psis[c[0]] for c in chunk],[profs[c[0]] for c in chunk],
+             chunk,psimax,model) for chunk in chunks]
+
+    if len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            scored = list(pool.map(_score_chunk,args))
+    else:
+        scored = [_score_chunk(a) for a in args]
+
+    best = [{'popt':None,'score':np.inf} for k in range(len(profs))]
+    for chunk in scored:
+        for cand in chunk:
+            k = cand['profile']
+            if cand['score'] < best[k]['score']:
+                best[k] = cand
+    return best
+
+def auto_extend(filename,minval=0.,psimax=1.05,psimins=psimins,
+                smooths=smooths,model='lintanh',max_workers=None):
+    """
+    Pick the profile extension automatically and write it to
+    filename+'.extpy', as extend_profile does. minval may be a list of
+    values to try; by default minval/10, minval, and 10*minval are tried.
+    Returns the best candidate (see search_batch), or None if no
+    candidate could be fit.
+    """
+
+    prof = np.loadtxt(filename)
+    if np.ndim(minval) == 0:
+        minval = [0.1*minval,minval,10.*minval]
+
+    best = search_batch([prof[:,0]],[prof[:,1]],[minval],psimax=psimax,
+                        psimins=psimins,smooths=smooths,model=model,
+                        max_workers=max_workers)[0]
+    if best['popt'] is None:
+        print("Could not fit "+filename+" with any parameters")
+        return None
+
+    print("Best extension of "+filename+": minval = "+str(best['minval'])+
+          ", psimin = "+str(best['psimin'])+", smooth = "+str(best['smooth'])+
+          "".join(", "+k+" = "+str(v) for k, v in fit_params(best['popt'],model)))
+    if best['negative'] > 0.:
+        print("Warning: minimum value is negative")
+
+    psi4, prof4, prof5 = extend_fit(prof[:,0],prof[:,1],best['popt'],
+                                    model=model,minval=best['minval'],
+                                    psimax=psimax,smooth=best['smooth'])
+    np.savetxt(filename+'.extpy',np.column_stack((psi4,prof4)),delimiter="    ",fmt='%1.6f')
+
+    return best
+
+def fit_params(popt,model='lintanh'):
+    """
+    [(name,value),...] of the fit parameters popt of model, with the
+    tanh width rather than its inverse for lintanh
+    """
+
+    if model == 'lintanh':
+        return [('center',popt[0]),('width',1./popt[1]),('height',popt[2]),
+                ('slope',popt[3])]
+    return list(zip(['y0','yinf','z','center','width'],popt))
+
+def score_extension(psi,prof,psi4,prof4,rms,psimin):
+    """
+    Score of an extended profile (lower is better) and its parts:
+    residual - rms fit residual relative to the edge height
+    kink     - jump in the gradient where the data meets the extension,
+               relative to the largest edge gradient
+    negative - how far the extension goes below zero, relative to the
+               edge height
+    rising   - largest increase of the extension with psi, relative to
+               the largest edge gradient
+    """
+
+    n = psi.size
+    height = np.abs(prof[psi>psimin]).max()
+    grad = np.diff(prof4)/np.diff(psi4)
+    edge = grad[np.flatnonzero(psi4[:-1]>psimin)]
+    scale = max(np.abs(edge).max(),1e-300) if edge.size > 0 else 1.
+
+    parts = {'residual':float(rms/height),
+             'kink':0.,
+             'negative':float(max(-prof4.min(),0.)/height),
+             'rising':0.}
+    if (n >= 2) and (psi4.size > n):
+        parts['kink'] = float(abs(grad[n-1] - grad[n-2])/scale)
+        parts['rising'] = float(max(grad[n-1:].max(),0.)/scale)
+
+    score = sum(score_weights[key]*parts[key] for key in parts)
+    return score, parts
+
+def _score_chunk(args):
+    # Fit and score one chunk of (profile, minval, psimin, smooth) candidates
+
+    psis, profs, chunk, psimax, model = args
+    fits = fit_batch(psis,profs,model=model,minval=[c[1] for c in chunk],
+                     psimin=[c[2] for c in chunk])
+
+    scored = []
+    for psi, prof, (k,mv,pm,sm), fit in zip(psis,profs,chunk,fits):
+        cand = {'profile':k,'minval':mv,'psimin':pm,'smooth':sm,
+                'popt':fit['popt'],'score':np.inf}
+        if (fit['popt'] is not None) and (pm <= psi[-1]) and (psimax >= psi[-1]):
+            psi4, prof4, prof5 = extend_fit(psi,prof,fit['popt'],model=model,
+                                            minval=mv,psimax=psimax,smooth=sm)
+            score, parts = score_extension(psi,prof,psi4,prof4,fit['rms'],pm)
+            if np.isfinite(score):
+                cand['score'] = score
+                cand.update(parts)
+        scored.append(cand)
+    return scored
+
+def _lm(func,jac,x,y,w,p0,maxiter,tol):
+    # Levenberg-Marquardt for N independent problems at once, with
+    # Nielsen's damping update; only unfinished problems are iterated
+    # x,y,w: (N,M)   p0: (N,k)
+
+    N, k = p0.shape
+    p = p0.copy()
+    niter = np.zeros(N,dtype=int)
+    conv = np.zeros(N,dtype=bool)
+    eye = np.eye(k)
+
+    def residual(p,i):
+        with np.errstate(all='ignore'):
+            r = w[i]*(func(x[i],*[p[:,j,None] for j in range(k)]) - y[i])
+            c = np.sum(r**2,axis=1)
+        c[~np.isfinite(c)] = np.inf
+        return r, c
+
+    r, cost = residual(p,np.arange(N))
+    D = np.zeros((N,k))
+    lam = np.full(N,-1.)
+    nu = np.full(N,2.)
+    i = np.flatnonzero(np.isfinite(cost))
+
+    for it in range(maxiter):
+        if i.size == 0:
+            break
+
+        with np.errstate(all='ignore'):
+            J = w[i,:,None]*jac(x[i],*[p[i,j,None] for j in range(k)])
+        J[~np.isfinite(J)] = 0.
+        JT = J.transpose(0,2,1)
+        g = np.matmul(JT,r[i,:,None])[:,:,0]
+        H = np.matmul(JT,J)
+        D[i] = np.maximum(D[i],np.maximum(np.einsum('nkk->nk',H),1e-30))
+        if it == 0:
+            lam[i] = 1e-3*D[i].max(axis=1)
+        A = H + lam[i,None,None]*D[i,:,None]*eye
+        try:
+            step = -np.linalg.solve(A,g[:,:,None])[:,:,0]
+        except np.linalg.LinAlgError:
+            step = -np.einsum('nkl,nl->nk',np.linalg.pinv(A),g)
+
+        pn = p[i] + step
+        rn, cn = residual(pn,i)
+
+        # gain ratio: actual over predicted decrease of the cost
+        predicted = np.einsum('nk,nk->n',step,lam[i,None]*D[i]*step - g)
+        with np.errstate(all='ignore'):
+            rho = (cost[i] - cn)/predicted
+        better = np.isfinite(cn) & (cn < cost[i]) & (predicted > 0.)
+
+        with np.errstate(all='ignore'):
+            flat = better & (cost[i] - cn <= tol*cost[i])
+        small = (np.abs(step) <= tol*(np.abs(p[i])+tol)).all(axis=1)
+
+        j = i[better]
+        p[j] = pn[better]
+        r[j] = rn[better]
+        cost[j] = cn[better]
+        lam[j] *= np.maximum(1./3.,1.-(2.*rho[better]-1.)**3)
+        nu[j] = 2.
+        j = i[~better]
+        lam[j] *= nu[j]
+        nu[j] *= 2.
+        niter[i] += 1
+
+        done = flat | small | (cost[i] == 0.)
+        conv[i[done]] = True
+        i = i[~done & (lam[i] < 1e30)]
+
+    return p, cost, niter, conv
+
+def lintanh(x,a,b,c,d):
+
+    t =  1.0 - np.tanh(b*(x-a))
+    s =  0.5*c*(1.0+d*(1.0-x))
+
+    return np.multiply(s,t)
+
+def lintanh_jac(x,a,b,c,d):
+    # derivatives of lintanh with respect to a, b, c, d
+
+    u = b*(x-a)
+    t = 1.0 - np.tanh(u)
+    sech2 = 1.0 - np.tanh(u)**2
+    s = 0.5*c*(1.0+d*(1.0-x))
+
+    return np.stack(np.broadcast_arrays(s*b*sech2,
+                                        -s*(x-a)*sech2,
+                                        0.5*(1.0+d*(1.0-x))*t,
+                                        0.5*c*(1.0-x)*t),axis=-1)
+
+def lintanh2(x,y0,yinf,z,c,w):
+
+    A = 1.0 - np.tanh((z-c)/w)
+    h = (y0 - yinf + 2.*yinf/A)/z
+
+    t = 0.5*(1.0 - np.tanh((x-c)/w))
+    s = y0 - yinf - h*x
+
+    y = np.multiply(s,t) + yinf
+
+#    y = y - 0.5*(y0 - yinf - 2.0*(y0-ymid)*c)
+
+    return y
+
+def lintanh2_jac(x,y0,yinf,z,c,w):
+    # derivatives of lintanh2 with respect to y0, yinf, z, c, w
+
+    v = (z-c)/w
+    A = 1.0 - np.tanh(v)
+    sv = 1.0 - np.tanh(v)**2
+    h = (y0 - yinf + 2.*yinf/A)/z
+
+    u = (x-c)/w
+    t = 0.5*(1.0 - np.tanh(u))
+    su = 1.0 - np.tanh(u)**2
+    s = y0 - yinf - h*x
+
+    dh_dA = -2.*yinf/(A**2*z)
+    dh_dy0 = 1./z
+    dh_dyinf = (-1. + 2./A)/z
+    dh_dz = -h/z - dh_dA*sv/w
+    dh_dc = dh_dA*sv/w
+    dh_dw = dh_dA*sv*v/w
+
+    dt_dc = 0.5*su/w
+    dt_dw = 0.5*su*u/w
+
+    return np.stack(np.broadcast_arrays((1. - x*dh_dy0)*t,
+                                        (-1. - x*dh_dyinf)*t + 1.,
+                                        -x*dh_dz*t,
+                                        -x*dh_dc*t + s*dt_dc,
+                                        -x*dh_dw*t + s*dt_dw),axis=-1)
+
+models = {'lintanh':(lintanh,lintanh_jac),
+          'lintanh2':(lintanh2,lintanh2_jac)}
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+registry
+
+Machines and architectures known to autoC1, read from declarative files
+in $AUTOC1_HOME/templates/ instead of being written out in stage_options
+
+    templates/<machine>/machine.json
+        iread_eqdsk, uni_smb, uni0_smb, uni_txt - {mesh type ('rw','fw'): value}
+        coils - names of the coil sets of the response task (rmp_*_<coil>.dat)
+        a2cc  - whether current.dat is made from the a-file with a2cc
+    templates/archs/<arch>.json
+        exec_command  - MPI launcher, followed by the number of tasks
+        partitions    - {'small','large','serial'}: partition or qos of the
+                        short runs, the long runs, and the serial adapt run
+                        (default: large). A partition may be a list of
+                        [name, largest time_factor] pairs, the last with null.
+        slurm_options - {stage: {'options':[...], 'time':[format, scale, min]}}
+                        with 'serial' and 'parallel' entries for adapt.
+                        {small}, {large}, {serial}, {repo}, {partition}
+                        and {time} in the options are filled in, {time} as
+                        format % max(scale*time_factor, min).
+
+Each file is read and validated once and kept until its modification time
+changes, so calling stage_options (autoC1, scans) many times only formats
+the Slurm options. Adding a machine or a cluster is a matter of adding its
+files.
+
+    from registry import machines, machine_info, arch_slurm
+    machines()                          # ['AUG', 'DIII-D', ...]
+    machine_info('KSTAR')['coils']      # ['tfec', 'mfec', 'bfec']
+    arch_slurm('saturn', time_factor=2.)['stability']
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import json
+from glob import glob
+
+machine_file = 'machine.json'
+arch_folder = 'archs'
+
+machine_keys = {'iread_eqdsk':dict, 'uni_smb':dict, 'uni0_smb':dict,
+                'uni_txt':dict, 'coils':list, 'a2cc':bool}
+arch_keys = {'exec_command':str, 'partitions':dict, 'slurm_options':dict}
+stages = ['efit','uni_equil','adapt','equilibrium','stability','response']
+
+# (path) -> (mtime, size, data)
+_cache = {}
+# (path, mtime, time_factor, partition, repo) -> formatted sbatch options
+_slurm = {}
+
+
+def templates(home=None):
+
+    if home is None:
+        home = os.environ.get('AUTOC1_HOME')
+    if home is None:
+        raise EnvironmentError('AUTOC1_HOME is not set')
+    return os.path.join(home,'templates')
+
+
+def machines(home=None):
+    """
+    Names of the machines with a machine.json
+    """
+    found = glob(os.path.join(templates(home),'*',machine_file))
+    return sorted(os.path.basename(os.path.dirname(f)) for f in found)
+
+
+def archs(home=None):
+    """
+    Names of the architectures with an archs/<arch>.json
+    """
+    found = glob(os.path.join(templates(home),arch_folder,'*.json'))
+    return sorted(os.path.basename(f)[:-len('.json')] for f in found)
+
+
+def machine_info(machine, home=None):
+    """
+    Validated contents of templates/<machine>/machine.json. Do not modify
+    the result, it is shared by every caller.
+    """
+
+    filename = os.path.join(templates(home),machine,machine_file)
+    if not os.path.exists(filename):
+        raise ValueError('Unknown machine '+str(machine)+' (no '+filename+')')
+    return _load(filename, validate_machine)
+
+
+def arch_info(arch, home=None):
+    """
+    Validated contents of templates/archs/<arch>.json
+    """
+
+    filename = os.path.join(templates(home),arch_folder,str(arch)+'.json')
+    if not os.path.exists(filename):
+        raise ValueError('Unknown architecture '+str(arch)+' (no '+filename+')')
+    return _load(filename, validate_arch)
+
+
+def arch_slurm(arch, time_factor=1.0, partition='batch', repo='atom',
+               home=None):
+    """
+    sbatch options of every stage on arch, as in stage_options:
+    {stage: [options]} with {False: [...], True: [...]} (serial,
+    parallel) for adapt
+    """
+
+    info = arch_info(arch, home)
+    # formatted once per set of arguments and version of the file
+    filename = os.path.join(templates(home),arch_folder,str(arch)+'.json')
+    key = (filename, _cache[filename][0], time_factor, partition, repo)
+    if key not in _slurm:
+        _slurm[key] = _arch_slurm(info, time_factor, partition, repo)
+    return dict((stage, dict((k, list(v)) for k, v in value.items())
+                        if isinstance(value, dict) else list(value))
+                for stage, value in _slurm[key].items())
+
+
+def has_arch(arch, home=None):
+    return os.path.exists(os.path.join(templates(home),arch_folder,str(arch)+'.json'))
+
+
+def mesh_machines(mesh_model, home=None):
+    """
+    Machines whose uniform mesh model (uni_txt) is mesh_model
+    """
+    return [m for m in machines(home)
+            if mesh_model in machine_info(m, home)['uni_txt'].values()]
+
+
+def validate_machine(data, filename):
+    """
+    Problems with the machine description data read from filename. Missing
+    template files are only warned about, since a machine may not support
+    every stage.
+    """
+
+    errors = _check_keys(data, machine_keys, filename)
+    if len(errors) > 0:
+        return errors
+    meshes = set(data['iread_eqdsk'])
+    for key in ['uni_smb','uni0_smb','uni_txt']:
+        if set(data[key]) != meshes:
+            errors.append(filename+': '+key+' has mesh types '+str(sorted(data[key]))
+                          +', not '+str(sorted(meshes)))
+
+    folder = os.path.dirname(filename)
+    needed = list(data['uni0_smb'].values()) + list(data['uni_txt'].values())
+    for coil in data['coils']:
+        needed += ['rmp_coil_'+coil+'.dat', 'rmp_current_'+coil+'.dat']
+    missing = [f for f in needed if not os.path.exists(os.path.join(folder,f))]
+    if len(missing) > 0:
+        print('*** '+folder+' is missing '+', '.join(missing)+' ***')
+    return errors
+
+
+def validate_arch(data, filename):
+
+    errors = _check_keys(data, arch_keys, filename)
+    if len(errors) > 0:
+        return errors
+    for name in ['small','large']:
+        if name not in data['partitions']:
+            errors.append(filename+': no '+name+' partition')
+    for stage in stages:
+        entry = data['slurm_options'].get(stage)
+        if entry is None:
+            errors.append(filename+': no slurm_options for '+stage)
+            continue
+        if stage == 'adapt':
+            entries = [entry.get('serial',{}), entry.get('parallel',{})]
+        else:
+            entries = [entry]
+        for e in entries:
+            if (not isinstance(e.get('options'), list)) or \
+               (len(e.get('time', [])) != 3):
+                errors.append(filename+': bad slurm_options for '+stage)
+    return errors
+
+
+def _load(filename, validate):
+    st = os.stat(filename)
+    cached = _cache.get(filename)
+    if (cached is None) or (cached[0] != st.st_mtime_ns) or (cached[1] != st.st_size):
+        with open(filename,'r') as h:
+            try:
+                data = json.load(h)
+            except ValueError as e:
+                raise ValueError(filename+': '+str(e))
+        errors = validate(data, filename)
+        if len(errors) > 0:
+            raise ValueError('\n'.join(errors))
+        cached = (st.st_mtime_ns, st.st_size, data)
+        _cache[filename] = cached
+    return cached[2]
+
+
+def _check_keys(data, keys, filename):
+    errors = []
+    for key, kind in keys.items():
+        if key not in data:
+            errors.append(filename+': missing '+key)
+        elif not isinstance(data[key], kind):
+            errors.append(filename+': '+key+' should be a '+kind.__name__)
+    return errors
+
+
+def _arch_slurm(info, time_factor, partition, repo):
+    fields = {'partition':partition, 'repo':repo}
+    parts = {}
+    for name, value in info['partitions'].items():
+        parts[name] = _partition(value, time_factor).format(**fields)
+    parts.setdefault('serial', parts['large'])
+    fields.update(parts)
+
+    slurm = {}
+    for stage, entry in info['slurm_options'].items():
+        if stage == 'adapt':
+            slurm[stage] = {False:_options(entry['serial'], fields, time_factor),
+                            True:_options(entry['parallel'], fields, time_factor)}
+        else:
+            slurm[stage] = _options(entry, fields, time_factor)
+    return slurm
+
+
+def _partition(value, time_factor):
+    # a fixed partition, or the first one allowing time_factor
+    if isinstance(value, str):
+        return value
+    for name, largest in value:
+        if (largest is None) or (time_factor <= largest):
+            return name
+    return value[-1][0]
+
+
+def _options(entry, fields, time_factor):
+    fmt, scale, minimum = entry['time']
+    time = fmt%max(scale*time_factor, minimum)
+    return [o.format(time=time, **fields) for o in entry['options']]
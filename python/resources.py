@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+resources
+
+Size the Slurm request of a run (nodes, ntasks, memory, walltime) from the
+number of mesh elements, instead of the fixed per-machine numbers in
+slurm_options
+
+The options in slurm_options are taken as right for a reference mesh of
+ref_elements elements. The load of a run is its element count (times
+fluid_factor for two-fluid runs), read from adapted0.smb for the
+calculations and estimated from the size field (sfp_low, sfp_normal,
+sfp_high) for the adapt stage, whose adapted mesh does not exist yet.
+The number of tasks then scales with the load in whole nodes, between one
+node and max_scale times the reference, and the walltime with the load per
+task. The efit and uni_equil stages run on the fixed uniform mesh in debug
+queues and keep their options.
+
+Every sized run also records its inputs, exit status, ntasks, and elapsed
+seconds in run_time.txt. calibrate() fits
+    time = a*(load/ntasks)**b*ntor**c
+to those for each arch and stage and writes the fit to a model file; with
+stage_options(resources=<model file>) the walltime then comes from the fit
+(times safety) wherever enough runs were recorded.
+
+    from resources import calibrate
+    calibrate(['158103.03796','158103.04000'])
+    stage_options(machine='DIII-D',resources='resource_model.txt')
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import glob
+import numpy as np
+
+from smb import smb_counts
+from slurm import time_seconds
+
+sized_tasks = ['adapt','equilibrium','stability','response']
+
+# elements of the adapted mesh the slurm_options were chosen for
+ref_elements = 30000
+# sfp_normal is assumed to give ref_elements, others scale as 1/size**2
+sfp_reference = 'sfp_normal'
+fluid_factor = {'1':1.0, '2':2.0}
+max_scale = 4
+safety = 2.0
+min_time = 600
+min_mem = 8000
+min_runs = 3
+
+
+def size_run(folder, task, opts, C1input=None):
+    """
+    Slurm options for a run prepared in folder, and the epilogue lines that
+    record its timing; they must come right after the run, as they keep its
+    exit status in $status. The options are None if opts['slurm_options']
+    should be used as they are.
+    """
+
+    slurm = stage_slurm(task, opts)
+    nelms = mesh_elements(folder, task, opts)
+    if C1input is None:
+        C1input = {}
+    ntor = str(C1input.get('ntor','0'))
+    nflu = '2' if str(C1input.get('db_fac','0.0')).strip() == '1.0' else '1'
+
+    timing = ('status=$?\n'
+              'echo "'+' '.join([task, opts['C1arch'], str(nelms), ntor, nflu])
+              +' $status $SLURM_NTASKS $SECONDS" > run_time.txt')
+
+    if (task not in sized_tasks) or (nelms is None):
+        return None, timing
+
+    load = nelms*fluid_factor[nflu]
+    model = read_model(opts['resources'])
+    fit = model.get((opts['C1arch'],task))
+    return scale_options(slurm, load, ntor=int(ntor), fit=fit), timing
+
+
+def stage_slurm(task, opts):
+
+    slurm = opts['slurm_options'][opts['C1arch']][task]
+    if task == 'adapt':
+        slurm = slurm[opts['parallel_adapt']]
+    return slurm
+
+
+def mesh_elements(folder, task, opts):
+    """
+    Number of 2D elements the run in folder works on, or None if unknown
+    """
+
+    if task == 'adapt':
+        return adapt_elements(folder+'/sizefieldParam',
+                              opts['template']+sfp_reference)
+    if task in ['efit','uni_equil']:
+        smb = [f for f in opts['base_files'] if f.endswith('.smb')]
+        if len(smb) == 0:
+            return None
+        filename = folder+'/'+os.path.basename(smb[0])
+    else:
+        filename = folder+'/adapted0.smb'
+    if not os.path.exists(filename):
+        return None
+    counts = smb_counts(filename)
+    return counts['triangle'] + counts['quad']
+
+
+def adapt_elements(sfp, reference):
+    """
+    Estimate the elements of the mesh adapted with size field sfp,
+    taking reference to give ref_elements
+    """
+
+    if not (os.path.exists(sfp) and os.path.exists(reference)):
+        return None
+    h = _sfp_size(sfp)
+    h0 = _sfp_size(reference)
+    return int(ref_elements*(h0/h)**2)
+
+
+def _sfp_size(filename):
+    # smallest element size in the plasma, the fourth value of the first line
+    with open(filename,'r') as h:
+        return float(h.readline().split()[3])
+
+
+def scale_options(slurm, load, ntor=0, fit=None):
+    """
+    Copy of the slurm options list with ntasks, nodes, mem (or
+    mem-per-cpu), and time scaled for load elements
+    """
+
+    options = dict(_split(o) for o in slurm)
+    ntasks0 = int(options.get('--ntasks','1'))
+    nodes0 = int(options.get('--nodes','1'))
+    per_node = int(options.get('--tasks-per-node',
+                               max(ntasks0//nodes0,1)))
+    time0 = time_seconds(options['--time'])
+    if time0 is None:
+        raise ValueError('Improper --time '+options['--time'])
+    scale = load/ref_elements
+
+    if ntasks0 == 1:
+        # serial adapt: only memory and time grow with the mesh
+        ntasks = 1
+        for key in ['--mem','--mem-per-cpu']:
+            if key in options:
+                mem0 = int(options[key])
+                mem = min(max_scale*mem0, max(min_mem, mem0*scale))
+                options[key] = str(int(mem))
+    else:
+        nodes = int(np.ceil(ntasks0*scale/per_node))
+        nodes = min(max(nodes,1), max_scale*nodes0)
+        ntasks = nodes*per_node
+        options['--ntasks'] = str(ntasks)
+        if '--nodes' in options:
+            options['--nodes'] = str(nodes)
+
+    if fit is None:
+        time = time0*scale*ntasks0/ntasks
+        time = min(max(time, time0/max_scale), time0*max_scale)
+    else:
+        a, b, c = fit
+        time = safety*a*(load/ntasks)**b*max(ntor,1)**c
+    options['--time'] = _hms(max(time, min_time))
+
+    keys = [_split(o)[0] for o in slurm]
+    return [k if options[k] is None else k+'='+options[k] for k in keys]
+
+
+def calibrate(roots, filename='resource_model.txt'):
+    """
+    Fit the walltime model to the run_time.txt files of successful runs
+    under the folders in roots and write it to filename.
+    Returns {(arch,task):(a,b,c)}.
+    """
+
+    runs = {}
+    for root in roots:
+        for f in glob.glob(os.path.join(root,'**','run_time.txt'),
+                           recursive=True):
+            run = read_run_time(f)
+            if (run is None) or (run['status'] != 0) or (run['nelms'] == 0):
+                continue
+            key = (run['arch'], run['task'])
+            runs.setdefault(key,[]).append(run)
+
+    model = {}
+    for key in sorted(runs):
+        fit = fit_runs(runs[key])
+        if fit is None:
+            print('Only '+str(len(runs[key]))+' '+key[1]+' runs on '+key[0]+
+                  ', not fitting')
+            continue
+        model[key] = fit
+        print('%s %s: time = %.4g*(load/ntasks)**%.3f*ntor**%.3f from %d runs'
+              %(key + fit + (len(runs[key]),)))
+
+    with open(filename,'w') as h:
+        h.write('# arch task a b c\n')
+        for (arch, task), (a, b, c) in sorted(model.items()):
+            h.write('%s %s %.6e %.6f %.6f\n'%(arch, task, a, b, c))
+    return model
+
+
+def fit_runs(runs):
+    """
+    Least-squares fit of log(time) = log(a) + b*log(load/ntasks)
+    + c*log(ntor), with c = 0 unless ntor varies. None if too few runs.
+    """
+
+    if len(runs) < min_runs:
+        return None
+    load = np.array([r['nelms']*fluid_factor[r['nflu']]/r['ntasks'] for r in runs])
+    ntor = np.array([max(r['ntor'],1) for r in runs], dtype=float)
+    time = np.array([max(r['seconds'],1) for r in runs], dtype=float)
+
+    cols = [np.ones(len(runs)), np.log(load)]
+    if len(set(ntor)) > 1:
+        cols.append(np.log(ntor))
+    A = np.column_stack(cols)
+    coef = np.linalg.lstsq(A, np.log(time), rcond=None)[0]
+    if len(coef) == 2:
+        coef = np.append(coef, 0.)
+    return (float(np.exp(coef[0])), float(coef[1]), float(coef[2]))
+
+
+def read_run_time(filename):
+
+    with open(filename,'r') as h:
+        words = h.read().split()
+    if len(words) != 8:
+        return None
+    try:
+        return {'task':words[0], 'arch':words[1], 'nelms':int(words[2]),
+                'ntor':int(words[3]), 'nflu':words[4], 'status':int(words[5]),
+                'ntasks':int(words[6]), 'seconds':float(words[7])}
+    except ValueError:
+        return None
+
+
+# (path) -> (mtime, model)
+_models = {}
+
+def read_model(filename):
+    """
+    {(arch,task):(a,b,c)} from a model file written by calibrate,
+    or {} if filename is not a file
+    """
+
+    if not isinstance(filename,str) or not os.path.exists(filename):
+        return {}
+    mtime = os.stat(filename).st_mtime_ns
+    if _models.get(filename,(None,))[0] != mtime:
+        model = {}
+        with open(filename,'r') as h:
+            for line in h:
+                words = line.split()
+                if (len(words) != 5) or line.startswith('#'):
+                    continue
+                model[(words[0],words[1])] = tuple(float(w) for w in words[2:])
+        _models[filename] = (mtime, model)
+    return _models[filename][1]
+
+
+def _split(option):
+    if '=' in option:
+        key, val = option.split('=',1)
+        return key, val
+    return option, None
+
+
+def _hms(seconds):
+    seconds = int(np.ceil(seconds/60.))*60
+    return '%d:%02d:00'%(seconds//3600, (seconds%3600)//60)
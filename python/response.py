@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+response
+
+Combine the per-coil linear response runs of one ntor into a single
+dataset, and superpose any set of coil currents and phasings from it
+without running M3D-C1 again
+
+The response task runs one job per coil set (n=<ntor>/<rot><i>_<nflu>f_<coil>,
+e.g. eb1_1f_iu and eb1_1f_il, or tfec/mfec/bfec on KSTAR), each driven by the
+unit currents in rmp_current_<coil>.dat. Since the response is linear, the
+response to currents I_c in each coil set is the sum over c of I_c times the
+response of coil set c. collect_response() reads the fields of the last time
+slice of every coil's C1.h5 in a process pool (one worker per coil) and
+stores them in n=<ntor>/<rot>_<nflu>f_response.h5 as
+    fields/<name>   - complex (ncoils, nelms, ncoefs), chunked by coil and
+                      element block, compressed, single precision by default
+    mesh/elements   - the elements of the (shared) adapted mesh
+    unit_currents/<coil> - rmp_current.dat of each coil run
+with the coil names and ntor as attributes. superpose() then reads it one
+element block at a time and returns
+    sum_c currents[c] * fields[c]
+for the requested fields. A coil set shifted toroidally by phi (degrees)
+has the response multiplied by exp(-i ntor phi), see coil_phasing().
+
+    from response import collect_response, superpose, coil_phasing
+    filename = collect_response('n=3')
+    scan = [coil_phasing(3, {'iu':0.,'il':dphi}) for dphi in range(0,360,30)]
+    psis = [r['psi'] for r in superpose(filename, scan, fields=['psi'])]
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import re
+import sys
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import h5py
+
+from growth_rate import run_ntor
+
+# run folders of the same ntor that are not coil responses
+not_coils = ['stab','probeg','response']
+block_size = 16384
+
+
+def collect_response(parent, rot='eb', nflu='1', coils=None, fields=None,
+                     filename=None, dtype=np.complex64, max_workers=None,
+                     compression='gzip'):
+    """
+    Read the response fields of every coil run in parent (e.g. 'n=3') in
+    parallel and write them to one dataset (default:
+    parent/<rot>_<nflu>f_response.h5). Returns its name, or None if no
+    coil run was found.
+    """
+
+    folders = coil_folders(parent, rot=rot, nflu=nflu, coils=coils)
+    if len(folders) == 0:
+        print('*** No '+rot+'*_'+str(nflu)+'f_<coil> response runs with C1.h5 in '+parent+' ***')
+        return None
+    if filename is None:
+        filename = os.path.join(parent, rot+'_'+str(nflu)+'f_response.h5')
+
+    names = list(folders.keys())
+    n = len(names)
+    with ProcessPoolExecutor(max_workers=max_workers or n) as pool:
+        results = list(pool.map(read_response, [folders[c] for c in names],
+                                [fields]*n, [dtype]*n))
+
+    elements = results[0]['elements']
+    for c, r in zip(names, results):
+        if not np.array_equal(r['elements'], elements):
+            raise ValueError('Response run for '+c+' is on a different mesh')
+    common = [f for f in results[0]['fields']
+              if all(f in r['fields'] for r in results)]
+
+    tmp = filename+'.tmp%d'%os.getpid()
+    with h5py.File(tmp,'w') as h5:
+        h5.attrs['coils'] = np.array(names, dtype='S')
+        h5.attrs['ntor'] = results[0]['ntor']
+        h5.attrs['folders'] = np.array([os.path.relpath(folders[c], parent)
+                                        for c in names], dtype='S')
+        h5.create_dataset('mesh/elements', data=elements)
+        for c, r in zip(names, results):
+            h5.create_dataset('unit_currents/'+c, data=r['currents'])
+        for name in common:
+            ncoefs = results[0]['fields'][name].shape[1]
+            chunks = (1, min(block_size, len(elements)), ncoefs)
+            dset = h5.create_dataset('fields/'+name,
+                                     shape=(n, len(elements), ncoefs),
+                                     dtype=dtype, chunks=chunks,
+                                     compression=compression)
+            for k, r in enumerate(results):
+                dset[k] = r['fields'][name]
+    os.replace(tmp, filename)
+    print('>>> Response of '+', '.join(names)+' written to '+filename)
+    return filename
+
+
+def coil_folders(parent, rot='eb', nflu='1', coils=None):
+    """
+    {coil:folder} of the latest response run of each coil in parent that
+    has a C1.h5
+    """
+
+    found = {}
+    pattern = re.compile(re.escape(rot)+r'(\d+)_'+str(nflu)+r'f_(\w+)$')
+    for folder in glob(os.path.join(parent, rot+'*_'+str(nflu)+'f_*')):
+        m = pattern.match(os.path.basename(folder))
+        if (m is None) or (m.group(2) in not_coils):
+            continue
+        coil = m.group(2)
+        if (coils is not None) and (coil not in coils):
+            continue
+        if not os.path.exists(os.path.join(folder,'C1.h5')):
+            continue
+        i = int(m.group(1))
+        if (coil not in found) or (i > found[coil][0]):
+            found[coil] = (i, folder)
+    order = coils if coils is not None else sorted(found)
+    return dict((c, found[c][1]) for c in order if c in found)
+
+
+def read_response(folder, fields=None, dtype=np.complex64):
+    """
+    Complex coefficients of fields (default: all) in the last time slice of
+    folder/C1.h5, with its mesh elements, ntor, and unit coil currents
+    """
+
+    with h5py.File(os.path.join(folder,'C1.h5'),'r') as h5:
+        slices = sorted(k for k in h5.keys() if re.match(r'time_\d+$', k))
+        group = h5[slices[-1]]
+        ntor = h5.attrs.get('ntor')
+        if ntor is None:
+            ntor = run_ntor(folder)
+        elements = group['mesh/elements'][()]
+        out = {}
+        for name in group['fields']:
+            if name.endswith('_i'):
+                continue
+            if (fields is not None) and (name not in fields):
+                continue
+            value = group['fields/'+name][()].astype(dtype)
+            if name+'_i' in group['fields']:
+                value += 1j*group['fields/'+name+'_i'][()]
+            out[name] = value
+
+    currents = os.path.join(folder,'rmp_current.dat')
+    if os.path.exists(currents):
+        currents = np.loadtxt(currents, ndmin=1)
+    else:
+        currents = np.zeros(0)
+    return {'fields':out, 'elements':elements, 'ntor':int(ntor),
+            'currents':currents}
+
+
+def superpose(filename, currents, fields=None, block=block_size):
+    """
+    {field: sum over coils c of currents[c]*response of c} for the coil
+    currents {coil:complex amplitude, in units of the unit currents};
+    coils not in currents are left out. For a list of such dicts (e.g. a
+    phasing scan) a list of results is returned, reading the dataset once.
+    """
+
+    scan = not isinstance(currents, dict)
+    if not scan:
+        currents = [currents]
+
+    with h5py.File(filename,'r') as h5:
+        names = [c.decode() for c in h5.attrs['coils']]
+        for cur in currents:
+            unknown = [c for c in cur if c not in names]
+            if len(unknown) > 0:
+                raise KeyError('No response for coil(s) '+', '.join(unknown)+' in '+filename)
+        # (ncases, ncoils)
+        weights = np.array([[cur.get(c, 0.) for c in names] for cur in currents],
+                           dtype=complex)
+        use = np.nonzero(np.any(weights != 0., axis=0))[0]
+        if fields is None:
+            fields = list(h5['fields'].keys())
+
+        out = [{} for cur in currents]
+        for name in fields:
+            dset = h5['fields/'+name]
+            totals = np.zeros((len(currents),)+dset.shape[1:], dtype=complex)
+            for start in range(0, dset.shape[1], block):
+                stop = start+block
+                for k in use:
+                    part = dset[k,start:stop]
+                    totals[:,start:stop] += weights[:,k,None,None]*part
+            for i in range(len(currents)):
+                out[i][name] = totals[i]
+    return out if scan else out[0]
+
+
+def coil_phasing(ntor, phases, amplitudes=None):
+    """
+    {coil:complex current} for coil sets shifted toroidally by phases
+    {coil:degrees} with amplitudes {coil:amplitude} (default 1)
+    """
+
+    currents = {}
+    for coil, phi in phases.items():
+        a = 1. if amplitudes is None else amplitudes.get(coil, 1.)
+        currents[coil] = a*np.exp(-1j*ntor*np.radians(phi))
+    return currents
+
+
+def response_info(filename):
+    """
+    (coils, ntor, fields) of a response dataset
+    """
+
+    with h5py.File(filename,'r') as h5:
+        return ([c.decode() for c in h5.attrs['coils']], int(h5.attrs['ntor']),
+                list(h5['fields'].keys()))
+
+
+if __name__ == '__main__':
+
+    for parent in sys.argv[1:]:
+        collect_response(parent)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+run_state
+
+Persisted state of the stage chain of a working directory, so a rerun picks
+up where the last one stopped
+
+The state is kept in <working directory>/autoC1_state.json. Each stage has a
+key: the sha1 of the key of the stage before it, the contents of its input
+files (g-, p-, a-files, C1input_base, template files, ...), and its
+parameters (C1input changes, mesh resolution, ...). A stage is recorded with
+its key, folder, job ids, and status:
+    'submitted' - its job(s) were submitted and may still be running
+    'done'      - its outputs were produced
+    'failed'    - its job failed or did not produce its outputs
+A stage with an unchanged key that is done (and whose outputs still exist)
+is skipped, a submitted one is waited for instead of being submitted again,
+and a failed one is rerun in the same folder. Changing any input changes
+the key of that stage and of every stage after it.
+
+    from run_state import load_state, stage_key
+    state = load_state('158103.03796')
+    key = stage_key(parent, files=['efit/geqdsk'], params={'ntor':'3'})
+    if is_done(state, 'adapt', key): ...
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import json
+import glob
+import hashlib
+from time import strftime
+
+from artifact_store import file_hash
+
+state_name = 'autoC1_state.json'
+
+SUBMITTED = 'submitted'
+DONE      = 'done'
+FAILED    = 'failed'
+
+
+def load_state(root):
+
+    filename = os.path.join(root,state_name)
+    if not os.path.exists(filename):
+        return {'stages':{}}
+    with open(filename,'r') as h:
+        try:
+            return json.load(h)
+        except ValueError:
+            print('*** Could not read '+filename+', starting over ***')
+            return {'stages':{}}
+
+
+def save_state(root, state):
+
+    # write then rename, so an interrupted save never leaves half a file
+    filename = os.path.join(root,state_name)
+    with open(filename+'.tmp','w') as h:
+        json.dump(state, h, indent=1, sort_keys=True)
+    os.replace(filename+'.tmp', filename)
+    return
+
+
+def stage_key(parent, files=[], params=None):
+    """
+    sha1 of the parent key, the contents of files (globs allowed), and
+    params. Missing files are part of the key as missing.
+    """
+
+    h = hashlib.sha1()
+    h.update(str(parent).encode())
+    for pattern in files:
+        found = sorted(glob.glob(pattern))
+        if len(found) == 0:
+            h.update(('missing:'+os.path.basename(pattern)).encode())
+        for f in found:
+            h.update((os.path.basename(f)+':'+file_hash(f)).encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def stage_record(state, stage, key, status=None):
+    """
+    Record of stage if it was last run with the same key (and has status,
+    if given), otherwise None
+    """
+
+    record = state['stages'].get(stage)
+    if (record is None) or (record.get('key') != key):
+        return None
+    if (status is not None) and (record.get('status') != status):
+        return None
+    return record
+
+
+def is_done(state, stage, key, outputs=[]):
+
+    record = stage_record(state, stage, key)
+    if (record is None) or (record['status'] != DONE):
+        return False
+    folder = record.get('folder') or '.'
+    return all(os.path.exists(os.path.join(folder,f)) for f in outputs)
+
+
+def mark(root, state, stage, key, status, **info):
+    """
+    Record stage as having status with key (plus folder, jobids, ...)
+    and save the state
+    """
+
+    record = state['stages'].get(stage)
+    if (record is None) or (record.get('key') != key):
+        record = {}
+    record.update(info)
+    record.update({'key':key, 'status':status, 'time':strftime('%Y-%m-%dT%H:%M:%S')})
+    state['stages'][stage] = record
+    save_state(root, state)
+    return record
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+scan
+
+Parameter scans of equilibrium or stability calculations on an existing
+adapted mesh, submitted as a single Slurm job array
+
+The grid maps C1input keys (and 'ntor') to lists of values. With
+mode='product' every combination is run; with mode='zip' the lists are
+stepped through together. All run folders are created in one go under a
+new scan<i>_<task>/ folder as case_0000, case_0001, ..., the overrides of
+each case are listed in scan_cases.txt there, and one sbatch --array call
+submits all cases with the same sbatch options (usually all of them).
+The grid, C1input_mod, and adapted mesh are checked with preflight first.
+
+    from scan import scan
+    scan({'ntor':[1,2,3,4],'db_fac':['0.0','1.0']},task='stability')
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import itertools
+
+from stages import stage_options, stage_C1input, prep_C1input_base, prep_run
+from stages import def_folder, calc_options
+from job_array import submit_runs
+from preflight import preflight
+
+scan_tasks = ['equilibrium','stability']
+
+
+def scan(grid, root='.', task='stability', mode='product', machine='DIII-D',
+         adapt_folder=None, C1input_base='C1input_base', C1input_mod=None,
+         ntor=None, nflu='1', mesh_type='rw', C1_version='1.9', submit=True,
+         max_running=None, **options):
+    """
+    Create one run folder per case of grid and submit them as a job array.
+    adapt_folder defaults to the most recent <mesh_type><i>_adapt folder.
+    ntor is used for cases that do not set it themselves.
+    Returns (folders, jobids) with jobids {folder:jobid}, which is empty if
+    nothing was submitted.
+    """
+
+    root = os.path.abspath(root)
+
+    if task not in scan_tasks:
+        print('*** Scans are only set up for '+', '.join(scan_tasks)+' ***')
+        return [], {}
+
+    cases = scan_cases(grid, mode=mode)
+    if cases is None:
+        return [], {}
+    if (task == 'stability') and (ntor is None) and ('ntor' not in grid):
+        print('*** Stability scans need ntor ***')
+        return [], {}
+
+    if adapt_folder is None:
+        adapt_folder = def_folder(mesh_type,'adapt',root=root)
+        i = int(adapt_folder[len(mesh_type):-len('_adapt')])
+        adapt_folder = mesh_type+str(max(i-1,1))+'_adapt'
+    adapt_folder = os.path.join(root,adapt_folder)
+
+    mods = [_case_mod(C1input_mod, case, ntor) for case in cases]
+    option = [o for o in calc_options if calc_options[o] == task][0]
+    calcs = [(option, '0' if n is None else n, str(nflu)) for mod, n in mods]
+    keys = {}
+    for mod, n in mods:
+        keys.update(mod)
+    problems = preflight(root=root, task='calculation', machine=machine,
+                         calcs=calcs, mesh_type=mesh_type,
+                         adapted_mesh=adapt_folder+'/adapted0.smb',
+                         C1input_mod=keys, C1input_base=C1input_base,
+                         **options)
+    if len(problems) > 0:
+        return [], {}
+
+    opts = stage_options(machine=machine, root=root, mesh_type=mesh_type,
+                         **options)
+
+    C1input_base = os.path.join(root,C1input_base)
+    prep_C1input_base(C1input_base,opts['template'],C1_version=C1_version)
+
+    files = [(adapt_folder+'/adapted0.smb','adapted0.smb')]
+
+    scan_folder = os.path.join(root,def_folder('scan',task,root=root))
+    os.mkdir(scan_folder)
+    print('Creating '+str(len(cases))+' run folders in '+scan_folder)
+
+    runs = []
+    for i, (mod, case_ntor) in enumerate(mods):
+        C1input = stage_C1input(task,opts,C1input_mod=mod,ntor=case_ntor,
+                                nflu=str(nflu),C1_version=C1_version)
+        folder = os.path.join(scan_folder,'case_%04d'%i)
+        submit_batch = prep_run(folder,task,opts,C1input=C1input,
+                                C1input_base=C1input_base,
+                                equil_folder=adapt_folder,files=files,
+                                verbose=False)
+        runs.append((folder, submit_batch))
+
+    folders = [folder for folder, submit_batch in runs]
+    write_cases(cases, folders, scan_folder+'/scan_cases.txt')
+
+    if not submit:
+        return folders, {}
+
+    # cases only share an array if their sbatch options agree, which they
+    # need not with a resource model (e.g. more time for higher ntor)
+    jobids = submit_runs(runs, root=scan_folder, name='scan',
+                         max_running=max_running)
+    return folders, jobids
+
+
+def _case_mod(C1input_mod, case, ntor):
+    # C1input overrides and ntor of one case
+    mod = dict(C1input_mod or {})
+    mod.update(case)
+    case_ntor = mod.pop('ntor',ntor)
+    if case_ntor is not None:
+        case_ntor = str(case_ntor)
+    return mod, case_ntor
+
+
+def scan_cases(grid, mode='product'):
+    """
+    List of {key:value} overrides, one per case, or None if grid is improper
+    """
+
+    keys = list(grid.keys())
+    values = [list(grid[key]) for key in keys]
+
+    if mode == 'product':
+        combos = itertools.product(*values)
+    elif mode == 'zip':
+        if len(set(len(v) for v in values)) > 1:
+            print('*** All lists must have the same length for mode=zip ***')
+            return None
+        combos = zip(*values)
+    else:
+        print('*** Unknown scan mode '+mode+' ***')
+        return None
+
+    return [dict(zip(keys, [str(v) for v in combo])) for combo in combos]
+
+
+def write_cases(cases, folders, filename):
+
+    keys = []
+    for case in cases:
+        keys += [key for key in case if key not in keys]
+
+    with open(filename,'w') as h:
+        h.write('%-12s '%'folder' + ' '.join('%-16s'%key for key in keys) + '\n')
+        for case, folder in zip(cases, folders):
+            h.write('%-12s '%os.path.basename(folder) +
+                    ' '.join('%-16s'%case.get(key,'-') for key in keys) + '\n')
+    return
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+slurm
+
+Wrappers around the Slurm commands used by autoC1 (sbatch, squeue, sacct,
+scancel), so submission and job-state queries all go through one place
+
+The commands go to an execution backend chosen by set_backend(), or on first
+use by AUTOC1_BACKEND:
+    'slurm' - the Slurm commands [DEFAULT]
+    'local' - a local_cluster.LocalCluster in this process, which runs the
+              batch jobs as local subprocesses (with the mocks in mock/)
+A backend object has sbatch(submit_batch, folder), state(jobid),
+sacct(fields, start, jobids), and scancel(jobid) returning what the Slurm
+commands print. time_seconds() converts Slurm times (e.g. 1-00:00:00) to
+seconds.
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import re
+from subprocess import call, check_output, CalledProcessError, DEVNULL
+
+PENDING   = 'PENDING'
+RUNNING   = 'RUNNING'
+FAILED    = 'FAILED'
+COMPLETED = 'COMPLETED'
+
+# Map the many Slurm job states onto the four autoC1 cares about
+slurm_states = {'PENDING':PENDING,
+                'CONFIGURING':PENDING,
+                'REQUEUED':PENDING,
+                'RESV_DEL_HOLD':PENDING,
+                'REQUEUE_HOLD':PENDING,
+                'SUSPENDED':PENDING,
+                'RUNNING':RUNNING,
+                'COMPLETING':RUNNING,
+                'STAGE_OUT':RUNNING,
+                'SIGNALING':RUNNING,
+                'COMPLETED':COMPLETED,
+                'FAILED':FAILED,
+                'CANCELLED':FAILED,
+                'TIMEOUT':FAILED,
+                'NODE_FAIL':FAILED,
+                'OUT_OF_MEMORY':FAILED,
+                'BOOT_FAIL':FAILED,
+                'DEADLINE':FAILED,
+                'PREEMPTED':FAILED,
+                'REVOKED':FAILED}
+
+backends = ['slurm','local']
+_unset = object()
+_backend = _unset
+
+
+def set_backend(backend='slurm'):
+    """
+    Send submissions and job queries to backend: a name in backends or a
+    backend object. Returns the backend object (None for Slurm).
+    """
+
+    global _backend
+    if backend == 'slurm':
+        backend = None
+    elif backend == 'local':
+        from local_cluster import LocalCluster
+        backend = LocalCluster.from_env()
+    elif isinstance(backend, str):
+        raise ValueError('Unknown backend '+backend+' (known: '+', '.join(backends)+')')
+    _backend = backend
+    return backend
+
+
+def get_backend():
+
+    if _backend is _unset:
+        set_backend(os.environ.get('AUTOC1_BACKEND','slurm'))
+    return _backend
+
+
+def sbatch(submit_batch, folder='.'):
+    """
+    Submit a batch job and return its job id as a string
+    (None if the id could not be read from the sbatch output)
+    """
+
+    backend = get_backend()
+    try:
+        if backend is None:
+            out = check_output(submit_batch, cwd=folder).decode()
+        else:
+            out = backend.sbatch(submit_batch, folder=folder)
+    except CalledProcessError as e:
+        print('*** sbatch failed with exit code '+str(e.returncode)+' ***')
+        return None
+    print(out.rstrip('\n'))
+
+    m = re.search(r'Submitted batch job (\d+)', out)
+    if m is None:
+        return None
+    return m.group(1)
+
+
+def job_state(jobid):
+    """
+    Return PENDING, RUNNING, FAILED, or COMPLETED for a job id,
+    or None if neither squeue nor sacct know about it
+    """
+
+    if jobid is None:
+        return None
+    backend = get_backend()
+    if backend is not None:
+        return _parse_state(backend.state(jobid))
+
+    # squeue only knows about jobs that are queued or running
+    try:
+        out = check_output(['squeue','-h','-j',str(jobid),'-o','%T'],
+                           stderr=DEVNULL).decode()
+    except (CalledProcessError, OSError):
+        out = ''
+    state = _parse_state(out)
+    if state is not None:
+        return state
+
+    # sacct remembers finished jobs
+    try:
+        out = check_output(['sacct','-n','-X','-P','-j',str(jobid),
+                            '-o','State'],
+                           stderr=DEVNULL).decode()
+    except (CalledProcessError, OSError):
+        out = ''
+    return _parse_state(out)
+
+
+def sacct_jobs(fields, start=None, jobids=None):
+    """
+    Accounting records (every job step) as [{field:value},...] for the
+    user's jobs since start (e.g., '2026-10-01T00:00:00') or for jobids
+    """
+
+    args = ['sacct','-n','-P','-o',','.join(fields)]
+    if jobids is not None:
+        args += ['-j',','.join(str(j) for j in jobids)]
+    if start is not None:
+        args += ['-S',start]
+    backend = get_backend()
+    try:
+        if backend is None:
+            out = check_output(args, stderr=DEVNULL).decode()
+        else:
+            out = backend.sacct(fields, start=start, jobids=jobids)
+    except (CalledProcessError, OSError):
+        print('*** Could not run sacct ***')
+        return []
+
+    jobs = []
+    for line in out.splitlines():
+        values = line.split('|')
+        if len(values) == len(fields):
+            jobs.append(dict(zip(fields, values)))
+    return jobs
+
+
+def scancel(jobid):
+
+    if jobid is None:
+        return
+    backend = get_backend()
+    if backend is None:
+        call(['scancel',str(jobid)])
+    else:
+        backend.scancel(jobid)
+    return
+
+
+def time_seconds(time):
+    """
+    Seconds in a Slurm time (--time, sacct Elapsed/Timelimit): minutes,
+    MM:SS, HH:MM:SS, D-HH, D-HH:MM, or D-HH:MM:SS. None if it is not one.
+    """
+
+    if time is None:
+        return None
+    days = '0'
+    time = str(time).strip()
+    with_days = '-' in time
+    if with_days:
+        days, time = time.split('-',1)
+    try:
+        days = int(days)
+        parts = [int(p) for p in time.split(':')]
+    except ValueError:
+        return None
+    if len(parts) > 3:
+        return None
+    if with_days:
+        # hours[:minutes[:seconds]] after the days
+        parts = parts + [0]*(3-len(parts))
+    elif len(parts) == 1:
+        parts = [0, parts[0], 0]
+    else:
+        parts = [0]*(3-len(parts)) + parts
+    return 86400*days + 3600*parts[0] + 60*parts[1] + parts[2]
+
+
+def _parse_state(out):
+
+    for line in out.splitlines():
+        words = line.split()
+        if len(words) == 0:
+            continue
+        # sacct reports e.g. 'CANCELLED by 1234'
+        state = words[0].rstrip('+')
+        if state in slurm_states:
+            return slurm_states[state]
+    return None
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+smb
+
+Read SCOREC/PUMI .smb mesh files (e.g., the uniform meshes in templates/ and
+adapted0.smb) without loading them into memory
+
+The file is memory-mapped and the blocks are numpy views into it (big-endian,
+read-only), so only the pages that are actually used are read from disk:
+    header   - magic, version, dim, number of parts, then entity counts
+    conn     - downward adjacency of each entity type (edge->vertices,
+               triangle->edges, ...), 0-based
+    points   - (nvert,3) vertex coordinates (R,Z,0 for M3D-C1 meshes)
+    params   - (nvert,2) parametric coordinates on the model
+    class    - (model dimension, model tag) of every entity
+followed by remote copies, tags and matches, which are not read.
+Only the 48-byte header is needed for the entity counts (smb_counts).
+
+    from smb import read_smb
+    mesh = read_smb('rw1_adapt/adapted0.smb')
+    mesh.nelms                  # number of 2D elements
+    mesh.points[:,:2]           # (R,Z) of the vertices
+    mesh.triangles              # (ntri,3) vertex ids
+    mesh.size_summary()         # min/median/mean/max element size
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+import numpy as np
+
+# entity types in file order, with the number of downward adjacencies
+smb_types = ['vertex','edge','triangle','quad','hex','prism','pyramid','tet']
+smb_degree = {'edge':2, 'triangle':3, 'quad':4, 'hex':6, 'prism':5,
+              'pyramid':5, 'tet':4}
+smb_version = 6
+header_size = 48
+
+
+def smb_counts(filename):
+    """
+    {type:count} of the entities in filename, reading only its header
+    """
+
+    header = np.fromfile(filename, dtype='>u4', count=header_size//4)
+    if len(header) < header_size//4:
+        raise ValueError(filename+' is too short to be a .smb file')
+    return dict(zip(smb_types, [int(n) for n in header[4:]]))
+
+
+def read_smb(filename):
+
+    return Smb(filename)
+
+
+class Smb(object):
+    """
+    Memory-mapped .smb mesh.
+    counts          - {type:count} of entities
+    nverts, nedges  - number of vertices and edges
+    nelms           - number of elements of the mesh dimension
+    points, params  - (nverts,3) and (nverts,2) coordinate views
+    conn[type]      - (n,degree) downward adjacency view
+    classes[type]   - (n,2) (model dimension, model tag) view
+    """
+
+    def __init__(self, filename):
+
+        self.filename = filename
+        self._map = np.memmap(filename, dtype='u1', mode='r')
+
+        header = self._view('>u4', 0, (header_size//4,))
+        magic, self.version, self.dim, self.nparts = [int(h) for h in header[:4]]
+        if (magic != 0) or (self.version > smb_version) or (self.dim not in [2,3]):
+            raise ValueError(filename+' is not a .smb file (magic %d, version %d)'
+                             %(magic, self.version))
+        self.counts = dict(zip(smb_types, [int(n) for n in header[4:]]))
+
+        offset = header_size
+        self.conn = {}
+        for t in smb_types[1:]:
+            n = self.counts[t]
+            self.conn[t] = self._view('>u4', offset, (n, smb_degree[t]))
+            offset += 4*n*smb_degree[t]
+
+        nv = self.counts['vertex']
+        self.points = self._view('>f8', offset, (nv,3))
+        offset += 24*nv
+        self.params = self._view('>f8', offset, (nv,2))
+        offset += 16*nv
+
+        self.classes = {}
+        for t in smb_types:
+            n = self.counts[t]
+            self.classes[t] = self._view('>u4', offset, (n,2))
+            offset += 8*n
+
+        self._sizes = None
+
+    def _view(self, dtype, offset, shape):
+
+        count = int(np.prod(shape))
+        nbytes = count*np.dtype(dtype).itemsize
+        if offset + nbytes > len(self._map):
+            raise ValueError(self.filename+' is truncated')
+        return np.ndarray(shape, dtype=dtype, buffer=self._map, offset=offset)
+
+    @property
+    def nverts(self):
+        return self.counts['vertex']
+
+    @property
+    def nedges(self):
+        return self.counts['edge']
+
+    @property
+    def nelms(self):
+        if self.dim == 2:
+            return self.counts['triangle'] + self.counts['quad']
+        return sum(self.counts[t] for t in ['hex','prism','pyramid','tet'])
+
+    @property
+    def edges(self):
+        return self.conn['edge']
+
+    @property
+    def triangles(self):
+        """
+        (ntri,3) vertex ids of the triangles, from their edges
+        """
+
+        tri = self.conn['triangle']
+        e0 = self.edges[tri[:,0]]
+        e1 = self.edges[tri[:,1]]
+        v2 = np.where((e1[:,0] == e0[:,0]) | (e1[:,0] == e0[:,1]),
+                      e1[:,1], e1[:,0])
+        return np.column_stack((e0, v2)).astype(np.int64)
+
+    @property
+    def boundary(self):
+        """
+        Vertex ids classified on model vertices or edges (the walls)
+        """
+
+        return np.nonzero(self.classes['vertex'][:,0] < self.dim)[0]
+
+    def edge_lengths(self):
+
+        x = self.points[:,:2]
+        e = self.edges
+        return np.hypot(*(x[e[:,1]] - x[e[:,0]]).T)
+
+    def areas(self):
+
+        x = self.points[:,:2]
+        t = self.triangles
+        a = x[t[:,1]] - x[t[:,0]]
+        b = x[t[:,2]] - x[t[:,0]]
+        return 0.5*np.abs(a[:,0]*b[:,1] - a[:,1]*b[:,0])
+
+    def sizes(self):
+        """
+        Size of each triangle: mean length of its three edges
+        """
+
+        if self._sizes is None:
+            lengths = self.edge_lengths()
+            self._sizes = lengths[self.conn['triangle']].mean(axis=1)
+        return self._sizes
+
+    def size_distribution(self, bins=20, log=True):
+        """
+        Histogram (counts, bin_edges) of the triangle sizes, with
+        logarithmically spaced bins if log
+        """
+
+        h = self.sizes()
+        if log:
+            bins = np.geomspace(h.min(), h.max(), bins+1)
+        return np.histogram(h, bins=bins)
+
+    def size_summary(self):
+
+        h = self.sizes()
+        return {'nverts':self.nverts, 'nelms':self.nelms,
+                'min':h.min(), 'median':np.median(h), 'mean':h.mean(),
+                'max':h.max()}
+
+    def __repr__(self):
+        return ('<Smb %s: %d vertices, %d edges, %d elements>'
+                %(os.path.basename(self.filename), self.nverts, self.nedges,
+                  self.nelms))
@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+"""
+stages
+
+Options, folder preparation, and submission for the autoC1 stages
+(efit, uni_equil, adapt, equilibrium, stability, response), written so
+that every path is explicit and nothing depends on the current directory
+
+Date created: Sun Oct 18 2026
+"""
+
+import os
+from subprocess import call
+
+import my_shutil as mysh
+from load_equil import load_equil
+from extract_profiles import extract_profiles
+from namelist import write_C1input
+from sedpy import sedpy
+from artifact_store import store_name
+from resources import size_run, stage_slurm
+from registry import machine_info, has_arch, arch_info, arch_slurm
+
+# (path) -> (mtime, text) of batch_slurm templates
+_batch_templates = {}
+
+def stage_options(machine='DIII-D', root='.', mesh_type='rw',
+                  uniform_mesh=None, mesh_model=None, parallel_adapt=False,
+                  saturn_partition='batch', nersc_repo='atom', time_factor=1.0,
+                  adapt_coil_delta=None, C1arch=None, store=True,
+                  resources=False):
+
+    if C1arch is None:
+        C1arch = os.environ.get('AUTOC1_ARCH')
+
+    template = os.environ.get('AUTOC1_HOME')+'/templates/'+ machine + '/'
+    root = os.path.abspath(root)
+
+    # per-machine data from templates/<machine>/machine.json, copied
+    # since some of it is changed below
+    info = machine_info(machine)
+    iread_eqdsks = {machine:dict(info['iread_eqdsk'])}
+    idevices     = {'rw':'-1','fw':'1'}
+    icsubtracts  = {'rw':'1','fw':'0'}
+    imulti_regions = {'rw':'1','fw':'0'}
+
+    uni_smb  = {machine:dict(info['uni_smb'])}
+    uni0_smb = {machine:dict(info['uni0_smb'])}
+    uni_txt  = {machine:dict(info['uni_txt'])}
+    if mesh_type[0] == 'c':
+        uni_txt[machine].update({mesh_type:mesh_model})
+        if uniform_mesh is not None:
+            uni0_smb[machine].update({mesh_type:uniform_mesh})
+            uni_mesh = uniform_mesh[:-5]+'.smb'
+            uni_smb[machine].update({mesh_type:uni_mesh})
+        else:
+            uni0_smb[machine].update({mesh_type: uni0_smb[machine][mesh_type[-2:]]})
+            uni_smb[machine].update({mesh_type:uni_smb[machine][mesh_type[-2:]]})
+        
+
+    coils = {machine:list(info['coils'])}
+
+    C1input_options = {'efit':{'ntimemax':'0',
+                               'ntimepr':'1',
+                               'iread_eqdsk':'1',
+                               'irmp':'0',
+                               'extsubtract':'0',
+                               'max_ke':'0',
+                               'itime_independent':'1',
+                               'idevice':'4',
+                               'eps':'0',
+                               'db_fac':'0.0',
+                               'mesh_filename':"'part.smb'",
+                               'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
+                               'icsubtract':'0',
+                               'imulti_region':imulti_regions[mesh_type[-2:]],
+                               'igs':'0',
+                               'ntor':'0'},
+                       'uni_equil':{'ntimemax':'0',
+                                    'ntimepr':'1',
+                                    'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
+                                    'irmp':'0',
+                                    'extsubtract':'0',
+                                    'max_ke':'0',
+                                    'itime_independent':'1',
+                                    'idevice':idevices[mesh_type[-2:]],
+                                    'eps':'0',
+                                    'db_fac':'0.0',
+                                    'mesh_filename':"'part.smb'",
+                                    'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
+                                    'icsubtract':icsubtracts[mesh_type[-2:]],
+                                    'imulti_region':imulti_regions[mesh_type[-2:]],
+                                    'ntor':'0'},
+                       'adapt':{'ntimemax':'0',
+                                'ntimepr':'1',
+                                'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
+                                'irmp':'0',
+                                'extsubtract':'0',
+                                'iadapt':'1',
+                                'adapt_smooth':'0.02',
+                                'max_ke':'0',
+                                'itime_independent':'1',
+                                'idevice':idevices[mesh_type[-2:]],
+                                'eps':'0',
+                                'db_fac':'0.0',
+                                'mesh_filename':"'%s'"%uni_smb[machine][mesh_type],
+                                'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
+                                'icsubtract':icsubtracts[mesh_type[-2:]],
+                                'imulti_region':imulti_regions[mesh_type[-2:]],
+                                'ntor':'0'},
+                       'equilibrium':{'ntimemax':'0',
+                                      'ntimepr':'1',
+                                      'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
+                                      'irmp':'0',
+                                      'extsubtract':'0',
+                                      'max_ke':'0',
+                                      'itime_independent':'1',
+                                      'idevice':idevices[mesh_type[-2:]],
+                                      'eps':'0',
+                                      'db_fac':'0.0',
+                                      'mesh_filename':"'part.smb'",
+                                      'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
+                                      'icsubtract':icsubtracts[mesh_type[-2:]],
+                                      'imulti_region':imulti_regions[mesh_type[-2:]],
+                                      'ntor':'0'},
+                       'stability':{'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
+                                    'irmp':'0',
+                                    'extsubtract':'0',
+                                    'max_ke':'1',
+                                    'itime_independent':'0',
+                                    'idevice':idevices[mesh_type[-2:]],
+                                    'eps':'1e-8',
+                                    'mesh_filename':"'part.smb'",
+                                    'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
+                                    'icsubtract':icsubtracts[mesh_type[-2:]],
+                                    'imulti_region':imulti_regions[mesh_type[-2:]]},
+                       'response':{'ntimemax':'1',
+                                   'ntimepr':'1',
+                                   'iread_eqdsk':iread_eqdsks[machine][mesh_type[-2:]],
+                                   'irmp':'1',
+                                   'extsubtract':'1',
+                                   'max_ke':'0',
+                                   'itime_independent':'1',
+                                   'idevice':idevices[mesh_type[-2:]],
+                                   'eps':'0',
+                                   'mesh_filename':"'part.smb'",
+                                   'mesh_model':"'%s'"%uni_txt[machine][mesh_type],
+                                   'icsubtract':icsubtracts[mesh_type[-2:]],
+                                   'imulti_region':imulti_regions[mesh_type[-2:]]}}
+
+    if adapt_coil_delta is not None:
+        C1input_options['adapt']['adapt_coil_delta'] = adapt_coil_delta
+
+    # Setup batch file and slurm command
+    bash_commands = {'efit':'part_mesh.sh '+uni_smb[machine][mesh_type]+' $SLURM_NTASKS',
+                     'uni_equil':'part_mesh.sh '+uni_smb[machine][mesh_type]+' $SLURM_NTASKS',
+                     'adapt':'echo $SLURM_JOB_ID > job_id.txt',
+                     'equilibrium':'part_mesh.sh adapted.smb $SLURM_NTASKS',
+                     'stability':'part_mesh.sh adapted.smb $SLURM_NTASKS',
+                     'response':'part_mesh.sh adapted.smb $SLURM_NTASKS'}
+    if parallel_adapt:
+        bash_commands['adapt'] += '\n'+'part_mesh.sh '+uni_smb[machine][mesh_type]+' $SLURM_NTASKS'
+
+    real_ea    = '$SLURM_NTASKS m3dc1_2d -pc_factor_mat_solver_type mumps -mat_mumps_icntl_14 200 >& C1stdout'
+    complex_ea = '$SLURM_NTASKS m3dc1_2d_complex -pc_factor_mat_solver_type mumps -mat_mumps_icntl_14 200 >& C1stdout'
+    adapt_ea = {False:'1 m3dc1_2d -pc_factor_mat_solver_type mumps -mat_mumps_icntl_14 200 >& C1stdout',
+                True: real_ea}
+    exec_args = {'efit':real_ea,
+                 'uni_equil':real_ea,
+                 'adapt':adapt_ea[parallel_adapt],
+                 'equilibrium':real_ea,
+                 'stability':complex_ea,
+                 'response':complex_ea}
+
+    # sbatch options and MPI launcher from templates/archs/<C1arch>.json
+    slurm_options = {}
+    exec_commands = {}
+    if (C1arch is not None) and has_arch(C1arch):
+        slurm_options[C1arch] = arch_slurm(C1arch, time_factor=time_factor,
+                                           partition=saturn_partition,
+                                           repo=nersc_repo)
+        exec_commands[C1arch] = arch_info(C1arch)['exec_command']
+
+    base_files = [template+'batch_slurm', template+'coil.dat']
+    if mesh_type[0] == 'c':
+        base_files += [root + '/' + uni_txt[machine][mesh_type]]
+        if mesh_type in uni0_smb[machine]:
+            base_files += [root + '/' + uni0_smb[machine][mesh_type]]
+    else:
+        base_files += [template + uni0_smb[machine][mesh_type]]
+        base_files += [template + uni_txt[machine][mesh_type]]
+
+    # read-only inputs are linked from a content-addressed store
+    if store:
+        store = os.path.join(root,store_name)
+    else:
+        store = None
+
+    # size runs from their mesh (True) and a calibrated walltime model (file)
+    if resources is True:
+        resources = ''
+    elif resources is False:
+        resources = None
+    elif resources is not None:
+        resources = os.path.join(root,resources)
+
+    return {'machine':machine,
+            'template':template,
+            'store':store,
+            'C1arch':C1arch,
+            'parallel_adapt':parallel_adapt,
+            'coils':coils,
+            'uni_smb':uni_smb,
+            'uni0_smb':uni0_smb,
+            'uni_txt':uni_txt,
+            'C1input_options':C1input_options,
+            'bash_commands':bash_commands,
+            'exec_commands':exec_commands,
+            'exec_args':exec_args,
+            'slurm_options':slurm_options,
+            'resources':resources,
+            'base_files':base_files}
+
+
+calc_options = {'0':'exit',
+                '1':'equilibrium',
+                '2':'stability',
+                '3':'response',
+                '4':'examine'}
+
+
+def prep_C1input_base(C1input_base, template, C1_version='1.9'):
+
+    if not os.path.exists(C1input_base):
+        mysh.cp(template+'/C1input_base',C1input_base)
+        try:
+            if float(C1_version) < 1.9:
+                # before version 1.9, z_ion was called zeff
+                sedpy('z_ion','zeff',C1input_base)
+        except ValueError:
+            # devel versions should have z_ion
+            pass
+    return
+
+
+def prep_setup(folder, machine='DIII-D', mesh_type='rw'):
+    """
+    Non-interactive part of the setup stage: geqdsk, profiles, and
+    current.dat in the efit folder. Returns False if a step failed.
+    """
+
+    mysh.cp(folder+'/g*.*',folder+'/geqdsk')
+
+    extract_profiles(machine=machine,folder=folder)
+
+    if (mesh_type=='rw') and machine_info(machine)['a2cc']:
+        mysh.cp(folder+'/a*.*',folder+'/a0.0')
+        with open(folder+'/current.dat','w') as fc:
+            try:
+                ret = call(['a2cc','a0.0'],cwd=folder,stdout=fc)
+            except OSError:
+                print('*** Could not run a2cc ***')
+                ret = -1
+        os.remove(folder+'/a0.0')
+        if ret != 0:
+            return False
+
+    return True
+
+
+def prep_calc(calc, opts, root='.', adapt_folder='rw1_adapt',
+              C1input_base='C1input_base', C1input_mod=None, mesh_type='rw',
+              rot='eb', C1_version='1.9', prologue=None):
+    """
+    Create the run folder(s) for one non-interactive calculation,
+    (option, ntor, nflu) or (option, ntor, nflu, PROBE_G file).
+    Returns [(folder, submit_batch),...], or None if calc is improper.
+    Folder names and adapt_folder are relative to root.
+    """
+
+    if len(calc) == 3:
+        option, ntor, nflu = calc
+        extra = None
+    elif len(calc) == 4:
+        option, ntor, nflu, extra = calc
+    else:
+        print("*** Improper calc length ***")
+        print("Skipping ", calc)
+        return None
+
+    task = calc_options.get(str(option))
+    if task is None:
+        print('*** Unknown calculation option '+str(option)+' ***')
+        return None
+    if task in ['exit','examine']:
+        return []
+
+    adapt_folder = os.path.join(root,adapt_folder)
+    files = [(adapt_folder+'/adapted0.smb','adapted0.smb')]
+
+    if task == 'equilibrium':
+        C1input = stage_C1input(task,opts,C1input_mod=C1input_mod)
+        folders = [(def_folder(mesh_type,'equil',root=root),None,files)]
+        parent = root
+    else:
+        ntor = str(ntor)
+        nflu = str(nflu)
+        C1input = stage_C1input(task,opts,C1input_mod=C1input_mod,
+                                ntor=ntor,nflu=nflu,C1_version=C1_version)
+        parent = os.path.join(root,'n='+ntor)
+        if not os.path.isdir(parent):
+            os.mkdir(parent)
+
+        if task == 'stability':
+            folders = [(def_folder(rot,nflu+'f_stab',root=parent),None,files)]
+        elif extra is None:
+            # Using M3D-C1 window pane model
+            folders = []
+            for coil in opts['coils'][opts['machine']]:
+                coil_files = files + [(opts['template']+'rmp_coil_'+coil+'.dat',
+                                       'rmp_coil.dat'),
+                                      (opts['template']+'rmp_current_'+coil+'.dat',
+                                       'rmp_current.dat')]
+                folders += [(def_folder(rot,nflu+'f_'+coil,root=parent),
+                             'm3dc1_'+coil,coil_files)]
+        else:
+            # assuming extra is the PROBE_G filename
+            C1input.update({'irmp':'0',
+                            'iread_ext_field':'1',
+                            'extsubtract':'1'})
+            folders = [(def_folder(rot,nflu+'f_probeg',root=parent),
+                        'm3dc1_probeg',files)]
+
+    runs = []
+    for name, job_name, run_files in folders:
+        folder = os.path.join(parent,name)
+        submit_batch = prep_run(folder,task,opts,C1input=C1input,
+                                C1input_base=C1input_base,
+                                equil_folder=adapt_folder,files=run_files,
+                                job_name=job_name,prologue=prologue)
+        if extra is not None:
+            os.symlink('../../'+extra,folder+'/error_field')
+        runs.append((folder,submit_batch))
+
+    return runs
+
+
+def prep_run(folder, task, opts, C1input=None, C1input_base='C1input_base',
+             equil_folder='efit', files=[], job_name=None, prologue=None,
+             epilogue=None, verbose=True):
+    """
+    Create a run folder for a stage, fill it with the template, equilibrium,
+    and extra files ([(src,dst_name),...]), and modify C1input and
+    batch_slurm. Shell lines in prologue/epilogue are added before the
+    stage's BASH_COMMAND and at the end of batch_slurm.
+    Returns the sbatch command for the folder.
+    """
+
+    if not os.path.isdir(folder):
+        os.mkdir(folder)
+
+    # batch_slurm and C1input are written below, so they must be real files
+    store = opts['store']
+    batch_template = None
+    for f in opts['base_files']:
+        if os.path.basename(f) == 'batch_slurm':
+            batch_template = f
+        else:
+            mysh.ln(f,folder+'/'+os.path.basename(f),store)
+    load_equil(equil_folder,folder,store=store)
+    for src, dst in files:
+        mysh.ln(src,folder+'/'+dst,store)
+
+    write_C1input(C1input_base,folder+'/C1input',C1input,verbose=verbose)
+
+    slurm = None
+    if opts['resources'] is not None:
+        # the timing goes first, so it sees the run's own exit status and
+        # any epilogue still decides how the job ends
+        slurm, timing = size_run(folder,task,opts,C1input=C1input)
+        if epilogue is None:
+            epilogue = timing+'\nexit $status'
+        else:
+            epilogue = timing+'\n'+epilogue
+
+    bash_command = opts['bash_commands'][task]
+    if prologue is not None:
+        bash_command = prologue+'\n'+bash_command
+    exec_command = opts['exec_commands'][opts['C1arch']]+opts['exec_args'][task]
+    write_batch(batch_template,folder+'/batch_slurm',
+                {'BASH_COMMAND':bash_command,'EXEC_COMMAND':exec_command},
+                epilogue=epilogue)
+
+    return submit_command(task, opts, job_name=job_name, slurm=slurm)
+
+
+def write_batch(template, filename, replacements, epilogue=None):
+    """
+    Write the batch script filename from template, replacing each
+    placeholder in replacements ({'BASH_COMMAND':...}) in one pass
+    """
+
+    template = os.path.abspath(template)
+    mtime = os.stat(template).st_mtime_ns
+    if _batch_templates.get(template,(None,))[0] != mtime:
+        with open(template,'r') as h:
+            _batch_templates[template] = (mtime, h.read())
+    text = _batch_templates[template][1]
+
+    for key in replacements:
+        text = text.replace(key,replacements[key])
+    if epilogue is not None:
+        text += epilogue+'\n'
+
+    with open(filename,'w') as h:
+        h.write(text)
+    return
+
+
+def submit_command(task, opts, job_name=None, slurm=None):
+
+    if slurm is None:
+        slurm = stage_slurm(task, opts)
+    submit_batch = ['sbatch']+slurm
+    if job_name is not None:
+        submit_batch += ['--job-name='+job_name]
+    return submit_batch+['batch_slurm']
+
+
+def stage_C1input(task, opts, C1input_mod=None, ntor=None, nflu=None,
+                  C1_version='1.9'):
+
+    C1input = dict(opts['C1input_options'][task])
+    if ntor is not None:
+        C1input.update({'ntor':ntor})
+    if nflu == '1':
+        C1input.update({'db_fac':'0.0'})
+    elif nflu == '2':
+        C1input.update({'db_fac':'1.0'})
+        try:
+            if float(C1_version) > 1.7:
+                C1input.update({'igs_extend_diamag':'1'})
+        except ValueError:
+            C1input.update({'igs_extend_diamag':'1'})
+    if C1input_mod is not None:
+        C1input.update(C1input_mod)
+    return C1input
+
+
+def write_command(submit_batch, folder='.'):
+
+    with open(folder+"/submit_command","w") as h:
+        h.write(' '.join(submit_batch))
+        h.write('\n')
+    return
+
+
+def def_folder(pre,post,root='.'):
+
+    i = 1
+
+    while True:
+
+        folder = pre+str(i)+'_'+post
+
+        if os.path.isdir(os.path.join(root,folder)):
+            i += 1
+        else:
+            break
+
+    return folder
+
+
+def free_folder(pre, post, root='.', output=None):
+    """
+    Like def_folder, but reuse the last <pre><i>_<post> folder if it does
+    not contain output, i.e. an earlier attempt that did not finish
+    """
+
+    folder = def_folder(pre,post,root=root)
+    i = int(folder[len(pre):-len(post)-1])
+    if (i > 1) and (output is not None):
+        last = pre+str(i-1)+'_'+post
+        if not os.path.exists(os.path.join(root,last,output)):
+            return last
+    return folder
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Rerunning the pipeline after a failed stage, on the local backend with the
+mock M3D-C1 (no Slurm needed)
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import glob
+import json
+import shutil
+
+import pytest
+
+home = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(home,'python'))
+
+import slurm
+import pipeline
+from local_cluster import LocalCluster
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+
+    monkeypatch.setenv('AUTOC1_HOME', home)
+    monkeypatch.setenv('AUTOC1_ARCH', 'saturn')
+    monkeypatch.setenv('PATH', os.path.join(home,'mock')+os.pathsep+os.environ['PATH'])
+    monkeypatch.setenv('AUTOC1_MOCK_TIME', '0')
+    monkeypatch.setenv('AUTOC1_MOCK_FAIL', '0')
+
+    previous = slurm.get_backend()
+    cluster = slurm.set_backend(LocalCluster(spool=str(tmp_path/'spool')))
+    folder = tmp_path/'shot'
+    os.makedirs(str(folder/'efit'))
+    for f in glob.glob(os.path.join(home,'templates','DIII-D','efit','*158103.03796')):
+        shutil.copy(f, str(folder/'efit'))
+    yield str(folder)
+    cluster.wait_idle()
+    slurm.set_backend(previous)
+
+
+def stages(root):
+    with open(os.path.join(root,'autoC1_state.json'),'r') as h:
+        return dict((k, v['status']) for k, v in json.load(h)['stages'].items())
+
+
+def test_rerun_after_failed_equil_check(root, monkeypatch):
+
+    # the first check fails after its job completed and was filed in iter_1
+    check = pipeline._check_equil
+    monkeypatch.setattr(pipeline, '_check_equil', lambda run, folder: {'pass':False})
+    assert not pipeline.run_pipelines([root])[root]
+    assert stages(root)['uni_equil'] == 'failed'
+    assert os.path.isdir(os.path.join(root,'uni_equil','iter_1'))
+
+    # the rerun submits a new uni_equil job instead of waiting for the old one
+    monkeypatch.setattr(pipeline, '_check_equil', check)
+    assert pipeline.run_pipelines([root])[root]
+    assert stages(root)['uni_equil'] == 'done'
+    assert stages(root)['adapt'] == 'done'
+    assert os.path.exists(os.path.join(root,'uni_equil','iter_2','time_000.h5'))
+    assert os.path.exists(os.path.join(root,'rw1_adapt','adapted0.smb'))
+
+
+def test_fw_mesh_without_current_dat(root):
+
+    # only rw meshes get a current.dat from a2cc, so there is nothing to iterate
+    assert not pipeline.run_pipelines([root], mesh_type='fw', max_equil_iter=3)[root]
+    assert not os.path.exists(os.path.join(root,'uni_equil'))
+
+    assert pipeline.run_pipelines([root], mesh_type='fw')[root]
+    assert not os.path.exists(os.path.join(root,'efit','current.dat'))
+    assert stages(root)['uni_equil'] == 'done'
+    assert os.path.exists(os.path.join(root,'uni_equil','iter_1','time_000.h5'))
+    assert os.path.exists(os.path.join(root,'fw1_adapt','adapted0.smb'))